@@ -1,9 +1,10 @@
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_login import LoginManager
 from flask_session import Session
 from flask_wtf.csrf import CSRFProtect
 from .config import Config
 from .services.sirope_service import SiropeService
+from .services.fragment_cache import FragmentCacheService
 from .auth.user_model import User
 from .utils.filters import format_date, format_datetime
 from .utils.helpers import get_user, format_points, format_currency
@@ -28,11 +29,6 @@ def create_app(config_class=Config):
     app.config['WTF_CSRF_ENABLED'] = True
     app.config['WTF_CSRF_SECRET_KEY'] = app.config['SECRET_KEY']
     
-    # Ruta para servir archivos estáticos
-    @app.route('/static/<path:filename>')
-    def static_files(filename):
-        return send_from_directory(app.static_folder, filename)
-    
     # Inicializar Redis y Flask-Session
     try:
         # Crear el cliente Redis
@@ -68,6 +64,7 @@ def create_app(config_class=Config):
     app.jinja_env.globals['format_currency'] = format_currency
     app.jinja_env.globals['now'] = datetime.utcnow
     app.jinja_env.globals['csrf_token'] = lambda: csrf._get_token()
+    app.jinja_env.globals['render_card'] = FragmentCacheService().render_card
 
     # Registrar blueprints
     from .auth.routes import bp as auth_bp
@@ -88,10 +85,9 @@ def create_app(config_class=Config):
     from .social.routes import bp as social_bp
     app.register_blueprint(social_bp, url_prefix='/social')
 
-    # Ruta para servir archivos subidos
-    @app.route('/uploads/<path:filename>')
-    def uploaded_file(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Registrar comandos de mantenimiento
+    from .commands import register_commands
+    register_commands(app)
 
     @login_manager.user_loader
     def load_user(user_id):
@@ -108,10 +104,6 @@ def create_app(config_class=Config):
                 # Asegurar que el usuario tenga todos los atributos necesarios
                 if not hasattr(user, 'artworks'):
                     user.artworks = []
-                if not hasattr(user, 'followers'):
-                    user.followers = []
-                if not hasattr(user, 'following'):
-                    user.following = []
                 if not hasattr(user, 'points'):
                     user.points = 0
                 if not hasattr(user, 'created_at'):
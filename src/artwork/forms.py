@@ -2,7 +2,7 @@ from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, TextAreaField, SubmitField, IntegerField
 from wtforms.validators import Optional
-from ..utils.form_validators import CustomDataRequired, CustomLength, CustomNumberRange
+from ..utils.form_validators import CustomDataRequired, CustomLength, CustomNumberRange, CustomImageFile
 
 class ArtworkForm(FlaskForm):
     """
@@ -22,13 +22,14 @@ class ArtworkForm(FlaskForm):
         
     Note:
         Las etiquetas son opcionales pero tienen límite de longitud
-        Solo acepta formatos de imagen específicos
+        Solo acepta formatos de imagen específicos, comprobados por su cabecera
     """
     title = StringField('Título', validators=[CustomDataRequired(), CustomLength(max=100)])
     description = TextAreaField('Descripción', validators=[CustomDataRequired(), CustomLength(max=500)])
     image = FileField('Imagen', validators=[
         FileRequired(),
-        FileAllowed(['jpg', 'jpeg', 'png', 'gif'], 'Solo se permiten imágenes.')
+        FileAllowed(['jpg', 'jpeg', 'png', 'gif'], 'Solo se permiten imágenes.'),
+        CustomImageFile()
     ])
     tags = StringField('Etiquetas', validators=[Optional(), CustomLength(max=200)])
     submit = SubmitField('Publicar Artwork')
@@ -56,7 +57,8 @@ class EditArtworkForm(FlaskForm):
     title = StringField('Título', validators=[CustomDataRequired(), CustomLength(max=100)])
     description = TextAreaField('Descripción', validators=[CustomDataRequired(), CustomLength(max=500)])
     image = FileField('Imagen', validators=[
-        FileAllowed(['jpg', 'jpeg', 'png', 'gif'], 'Solo se permiten imágenes.')
+        FileAllowed(['jpg', 'jpeg', 'png', 'gif'], 'Solo se permiten imágenes.'),
+        CustomImageFile()
     ])
     tags = StringField('Etiquetas', validators=[Optional(), CustomLength(max=200)])
     submit = SubmitField('Guardar Cambios')
@@ -23,13 +23,18 @@ class Artwork:
         views (int): Contador de visualizaciones
         points_received (int): Puntos recibidos por donaciones
         donors (list): Lista de IDs de usuarios que donaron puntos
+        thumbnails (dict): Miniaturas por ancho ('320' -> {'webp': archivo, 'jpeg': archivo})
+        width (int): Ancho en píxeles de la imagen original
+        height (int): Alto en píxeles de la imagen original
+        dominant_colors (list): Colores dominantes ('#rrggbb') de más a menos frecuente
+        placeholder (str): Data URI LQIP que se muestra mientras carga la imagen
         
     Note:
         Los IDs se manejan en formato string y se limpian de caracteres especiales
         para mantener consistencia en la base de datos
     """
     
-    def __init__(self, title, description, image_path, author_id, tags=None):
+    def __init__(self, title, description, image_path, author_id, tags=None, width=None, height=None):
         """
         Inicializa una nueva obra de arte con los atributos básicos
         
@@ -39,12 +44,14 @@ class Artwork:
             image_path (str): Ruta al archivo de imagen
             author_id (str): ID del usuario creador
             tags (str|list, optional): Etiquetas separadas por comas o lista
+            width (int, optional): Ancho de la imagen leído de su cabecera
+            height (int, optional): Alto de la imagen leído de su cabecera
         """
         self.title = title
         self.description = description
         self.image_path = image_path
         self.author_id = str(author_id).split('@')[-1] if '@' in str(author_id) else str(author_id)
-        self.tags = tags.split(',') if tags and isinstance(tags, str) else []
+        self.tags = self.normalize_tags(tags)
         self.created_at = datetime.utcnow()
         self.updated_at = self.created_at
         self.likes = []
@@ -52,8 +59,95 @@ class Artwork:
         self.views = 0
         self.points_received = 0
         self.donors = []
+        self.thumbnails = {}
+        self.width = width
+        self.height = height
+        self.dominant_colors = []
+        self.placeholder = None
         self._id = None
 
+    @property
+    def aspect_ratio(self):
+        """Relación ancho/alto de la imagen o None si no se conocen sus dimensiones"""
+        width = getattr(self, 'width', None)
+        height = getattr(self, 'height', None)
+        if not width or not height:
+            return None
+        return width / height
+
+    def placeholder_style(self):
+        """
+        Obtiene el estilo CSS de fondo que se ve mientras carga la imagen
+
+        Returns:
+            str: Declaración background con el color dominante y el LQIP, o '' si no hay metadatos
+        """
+        colors = getattr(self, 'dominant_colors', None) or []
+        placeholder = getattr(self, 'placeholder', None)
+        layers = []
+        if placeholder:
+            layers.append(f"url('{placeholder}') center / cover no-repeat")
+        if colors:
+            layers.append(colors[0])
+        return f"background: {' '.join(layers)};" if layers else ''
+
+    def thumbnail(self, width, image_format='jpeg'):
+        """
+        Obtiene la miniatura más pequeña que cubre un ancho
+
+        Args:
+            width (int): Ancho mínimo deseado en píxeles
+            image_format (str): 'webp' o 'jpeg'
+
+        Returns:
+            str|None: Nombre del archivo o None si no hay miniaturas
+
+        Note:
+            Si ninguna miniatura alcanza el ancho se devuelve la mayor
+        """
+        thumbnails = getattr(self, 'thumbnails', None) or {}
+        widths = sorted(int(size) for size in thumbnails)
+        if not widths:
+            return None
+        chosen = next((size for size in widths if size >= width), widths[-1])
+        return thumbnails[str(chosen)].get(image_format)
+
+    @staticmethod
+    def normalize_tag(tag):
+        """
+        Normaliza una etiqueta para indexarla y compararla
+
+        Args:
+            tag (str): Etiqueta original
+
+        Returns:
+            str: Etiqueta en minúsculas, sin '#' inicial y con los espacios colapsados
+        """
+        return ' '.join(str(tag).strip().lstrip('#').lower().split())
+
+    @classmethod
+    def normalize_tags(cls, tags):
+        """
+        Normaliza una lista de etiquetas eliminando vacías y duplicadas
+
+        Args:
+            tags (str|list): Etiquetas separadas por comas o lista
+
+        Returns:
+            list: Etiquetas normalizadas en su orden original
+        """
+        if not tags:
+            return []
+        if isinstance(tags, str):
+            tags = tags.split(',')
+
+        normalized = []
+        for tag in tags:
+            clean_tag = cls.normalize_tag(tag)
+            if clean_tag and clean_tag not in normalized:
+                normalized.append(clean_tag)
+        return normalized
+
     @property
     def id(self):
         """
@@ -212,16 +306,53 @@ class Artwork:
             return True
         return False
 
-    def increment_views(self):
+    @property
+    def views(self):
         """
-        Incrementa el contador de visualizaciones
-        
+        Número de visualizaciones
+
         Note:
-            Asegura la existencia del atributo views antes de modificar
+            El contador vivo es el índice de vistas de RankingService, que se
+            incrementa atómicamente sin reescribir el objeto; el valor guardado
+            en el objeto solo se usa si el índice no lo tiene
+            Importa dependencias de forma dinámica para evitar ciclos
         """
-        if not hasattr(self, 'views'):
-            self.views = 0
-        self.views += 1
+        stored = self.__dict__.get('views', 0) or 0
+        if not self.id:
+            return stored
+        from ..services.ranking_service import RankingService
+        live = RankingService().view_count(self.id)
+        return stored if live is None else live
+
+    @views.setter
+    def views(self, value):
+        self.__dict__['views'] = value
+
+    def restore_derivatives(self) -> bool:
+        """
+        Reaplica las miniaturas y metadatos si faltan pero la imagen ya se procesó
+
+        Returns:
+            bool: True si se han reaplicado (solo en memoria, hasta el próximo guardado)
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+            Cubre el caso de una petición que guardó una copia del artwork
+            cargada antes de que terminara el procesado de su imagen
+        """
+        try:
+            if not self.__dict__.get('image_path') or self.__dict__.get('thumbnails'):
+                return False
+            from ..services.storage_service import ImageStorageService
+            result = ImageStorageService().derivatives(self.image_path)
+            if not result:
+                return False
+            self.__dict__.update(result)
+            self._derivatives_restored = True
+            return True
+        except Exception as e:
+            logger.error(f"Error al reaplicar los derivados del artwork {self.__dict__.get('_id')}: {e}")
+            return False
 
     def to_dict(self):
         # Asegurar que todos los atributos necesarios existan
@@ -251,12 +382,19 @@ class Artwork:
             'comments_count': len(self.comments),
             'views': self.views,
             'points_received': self.points_received,
-            'donors_count': len(self.donors)
+            'donors_count': len(self.donors),
+            'thumbnails': getattr(self, 'thumbnails', {}),
+            'width': getattr(self, 'width', None),
+            'height': getattr(self, 'height', None),
+            'aspect_ratio': self.aspect_ratio,
+            'dominant_colors': getattr(self, 'dominant_colors', []),
+            'placeholder': getattr(self, 'placeholder', None)
         }
 
     def __getstate__(self):
         """Método especial para la serialización"""
         state = self.__dict__.copy()
+        state.pop('_derivatives_restored', None)
         # Asegurar que todos los campos necesarios existan
         state.setdefault('_id', None)
         state.setdefault('title', '')
@@ -269,6 +407,11 @@ class Artwork:
         state.setdefault('views', 0)
         state.setdefault('points_received', 0)
         state.setdefault('donors', [])
+        state.setdefault('thumbnails', {})
+        state.setdefault('width', None)
+        state.setdefault('height', None)
+        state.setdefault('dominant_colors', [])
+        state.setdefault('placeholder', None)
         
         # Convertir datetime a string ISO
         if 'created_at' in state:
@@ -291,6 +434,12 @@ class Artwork:
         state.setdefault('views', 0)
         state.setdefault('points_received', 0)
         state.setdefault('donors', [])
+        state.setdefault('thumbnails', {})
+        state.setdefault('width', None)
+        state.setdefault('height', None)
+        state.setdefault('dominant_colors', [])
+        state.setdefault('placeholder', None)
+        state['tags'] = self.normalize_tags(state['tags'])
         
         # Convertir strings ISO a datetime
         try:
@@ -309,6 +458,7 @@ class Artwork:
             state['updated_at'] = datetime.utcnow()
             
         self.__dict__.update(state)
+        self.restore_derivatives()
 
     def __str__(self):
         return f"Artwork(title={self.title}, id={self.id}, _id={self._id})" 
\ No newline at end of file
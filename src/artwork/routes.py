@@ -1,12 +1,22 @@
 import os
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
+from markupsafe import Markup, escape
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from .forms import ArtworkForm, EditArtworkForm, GivePointsForm
 from .model import Artwork
 from ..points.model import PointsTransaction
 from ..services.sirope_service import SiropeService
+from ..services.ranking_service import RankingService
+from ..services.tag_service import TagIndexService
+from ..services.similarity_service import SimilarityService
+from ..services.suggestion_service import SuggestionService
+from ..services.trending_service import TrendingService
+from ..services.fragment_cache import FragmentCacheService
+from ..services.image_worker import ImageProcessingService
+from ..services.storage_service import ImageStorageService
 from ..utils.helpers import save_image, get_artwork, sync_user_artworks, sync_user_points
+from ..utils.http_cache import version_etag, is_not_modified, not_modified, with_validators
 from ..auth.user_model import User
 from ..comment.model import Comment
 from ..comment.forms import CommentForm
@@ -15,6 +25,14 @@ from datetime import datetime
 
 bp = Blueprint('artwork', __name__)
 sirope = SiropeService()
+ranking = RankingService()
+tag_index = TagIndexService()
+similarity = SimilarityService()
+suggestions = SuggestionService()
+trending = TrendingService()
+fragment_cache = FragmentCacheService()
+images = ImageProcessingService()
+storage = ImageStorageService()
 logger = logging.getLogger(__name__)
 
 # Registrar funciones de ayuda para las plantillas
@@ -60,9 +78,92 @@ def format_points(points):
     except (ValueError, TypeError):
         return "0"
 
+@bp.app_template_global()
+def thumbnail_url(artwork, width=640, image_format='jpeg'):
+    """
+    Obtiene la URL de la miniatura adecuada para un ancho
+
+    Args:
+        artwork (Artwork): Artwork a mostrar
+        width (int): Ancho mínimo en píxeles
+        image_format (str): 'webp' o 'jpeg'
+
+    Returns:
+        str: URL de la miniatura o del original si no tiene miniaturas
+    """
+    filename = artwork.thumbnail(width, image_format) or artwork.image_path
+    return url_for('main.uploaded_file', filename=filename)
+
+@bp.app_template_global()
+def artwork_picture(artwork, sizes='100vw', css_class='', width=640, lazy=True, style=''):
+    """
+    Genera un elemento <picture> con las miniaturas WebP y JPEG del artwork
+
+    Args:
+        artwork (Artwork): Artwork a mostrar
+        sizes (str): Atributo sizes con el ancho de presentación de la imagen
+        css_class (str): Clases CSS de la etiqueta <img>
+        width (int): Ancho de la imagen de respaldo para navegadores sin srcset
+        lazy (bool): Si se aplaza la carga hasta que la imagen sea visible
+        style (str): Estilos en línea de la etiqueta <img>
+
+    Returns:
+        Markup: HTML del elemento
+
+    Note:
+        El navegador elige el tamaño según sizes y la densidad de pantalla;
+        sin miniaturas se usa el original.
+        Con las dimensiones conocidas se emiten width/height para reservar el
+        espacio, y las imágenes diferidas muestran de fondo el color dominante
+        y el placeholder LQIP hasta que cargan
+    """
+    thumbnails = getattr(artwork, 'thumbnails', None) or {}
+    extra = ' loading="lazy"' if lazy else ''
+    if getattr(artwork, 'width', None) and getattr(artwork, 'height', None):
+        extra += f' width="{int(artwork.width)}" height="{int(artwork.height)}"'
+    if lazy:
+        style = artwork.placeholder_style() + style
+    if style:
+        extra += f' style="{escape(style)}"'
+    img = (f'<img src="{escape(thumbnail_url(artwork, width))}" class="{escape(css_class)}" '
+           f'alt="{escape(artwork.title)}"{extra}')
+    if not thumbnails:
+        return Markup(img + '>')
+
+    def srcset(image_format):
+        return ', '.join(
+            f"{url_for('main.uploaded_file', filename=variants[image_format])} {size}w"
+            for size, variants in sorted(thumbnails.items(), key=lambda item: int(item[0]))
+            if variants.get(image_format)
+        )
+
+    return Markup(
+        f'<picture>'
+        f'<source type="image/webp" srcset="{escape(srcset("webp"))}" sizes="{escape(sizes)}">'
+        f'{img} srcset="{escape(srcset("jpeg"))}" sizes="{escape(sizes)}">'
+        f'</picture>'
+    )
+
 # Registrar get_artwork como función global de plantilla
 bp.add_app_template_global(get_artwork, 'get_artwork')
 
+def queue_image_processing(artwork):
+    """
+    Encola la generación de miniaturas y metadatos de la imagen de un artwork
+
+    Args:
+        artwork (Artwork): Artwork ya guardado con su imagen original
+
+    Note:
+        La petición no espera al procesado; hasta que termine, las
+        plantillas muestran la imagen original
+    """
+    images.submit(artwork.id,
+                  artwork.image_path,
+                  current_app.config['ARTWORK_IMAGES_FOLDER'],
+                  current_app.config['THUMBNAIL_SIZES'],
+                  current_app.config['THUMBNAIL_QUALITY'])
+
 @bp.route('/create', methods=['GET', 'POST'])
 @login_required
 def create():
@@ -105,12 +206,16 @@ def create():
             # Limpiar el ID del usuario para el artwork
             clean_user_id = str(user.id).split('@')[-1] if '@' in str(user.id) else str(user.id)
             
+            # Dimensiones leídas de la cabecera por el validador del formulario
+            header = getattr(form.image, 'image_header', None)
             artwork = Artwork(
                 title=form.title.data,
                 description=form.description.data,
                 image_path=filename,
                 author_id=clean_user_id,
-                tags=form.tags.data
+                tags=form.tags.data,
+                width=header.width if header else None,
+                height=header.height if header else None
             )
             
             logger.info(f"Guardando artwork con autor_id: {clean_user_id}")
@@ -121,6 +226,10 @@ def create():
                 raise Exception("Error al guardar el artwork")
             
             logger.info(f"Artwork guardado con ID: {artwork.id}")
+            ranking.index_artwork(artwork)
+            tag_index.index_artwork(artwork)
+            similarity.update_artwork(artwork)
+            queue_image_processing(artwork)
             
             # Sincronizar los artworks del usuario
             if not hasattr(user, 'artworks'):
@@ -143,8 +252,14 @@ def create():
             if 'artwork' in locals() and artwork and artwork.id:
                 try:
                     sirope.force_delete(artwork)
+                    ranking.remove_artwork(artwork.id)
+                    tag_index.remove_artwork(artwork.id)
+                    similarity.remove_artwork(artwork.id)
                 except Exception as del_e:
                     logger.error(f"Error al eliminar artwork inconsistente: {del_e}")
+            # Liberar la referencia a la imagen subida
+            if 'filename' in locals() and filename:
+                storage.release(filename, current_app.config['ARTWORK_IMAGES_FOLDER'])
             flash('Error al crear el artwork. Por favor, inténtalo de nuevo.')
             return redirect(url_for('artwork.create'))
             
@@ -171,6 +286,10 @@ def view(artwork_id):
     Note:
         Accesible sin autenticación pero con funcionalidad limitada
         Incrementa el contador de vistas
+        La visualización se contabiliza antes de consultar la caché de
+        páginas anónimas, para no perder las visitas servidas desde ella
+        Responde 304 si el cliente ya tiene la versión actual, antes de
+        cargar comentarios y artworks similares
     """
     logger.info(f"Intentando cargar artwork con ID: {artwork_id}")
     
@@ -190,22 +309,38 @@ def view(artwork_id):
         flash('Error al cargar el autor del artwork.')
         return redirect(url_for('main.index'))
 
+    # Contabilizar la visualización en el índice de vistas (ZINCRBY atómico, sin
+    # reescribir el artwork); no invalida los fragmentos cacheados, se refrescan al expirar
+    etag = None
+    if request.method == 'GET':
+        ranking.increment_views(artwork.id)
+        # Las visitas del autor no cuentan para tendencias; el resto, una vez por usuario o IP y ventana
+        if not (current_user.is_authenticated and str(current_user.id) == str(artwork.author_id)):
+            viewer = str(current_user.id).split('@')[-1] if current_user.is_authenticated else request.remote_addr
+            trending.record(artwork.id, 'view', actor=viewer)
+
+        # Validación HTTP con las versiones del artwork, su autor y sus comentarios. Sin
+        # Last-Modified: updated_at no cambia con los comentarios ni con el autor y
+        # If-Modified-Since daría 304 con la página antigua
+        comment_keys = [sirope.version_key(Comment, comment_id) for comment_id in getattr(artwork, 'comments', [])]
+        etag = version_etag(artwork, author, *comment_keys, extra=(artwork.updated_at,))
+        if etag and is_not_modified(etag):
+            return not_modified(etag)
+
+        cached_page = fragment_cache.get_page()
+        if cached_page is not None:
+            return with_validators(cached_page, etag) if etag else cached_page
+
     # Limpiar ID del autor para comparaciones consistentes
     clean_author_id = str(artwork.author_id).split('@')[-1] if '@' in str(artwork.author_id) else str(artwork.author_id)
     
-    # Obtener todos los artworks para buscar similares
-    all_artworks = sirope.find_all(Artwork)
-    artworks = []
-    for art in all_artworks:
-        if art and art.id and art.id != artwork_id:  # Excluir la obra actual
-            verified_art = get_artwork(art.id)
-            if verified_art and hasattr(verified_art, 'tags') and verified_art.tags:
-                # Verificar si tiene etiquetas en común
-                if any(tag.strip() in artwork.tags for tag in verified_art.tags):
-                    artworks.append(verified_art)
-    
-    # Ordenar por número de likes sin limitar la cantidad
-    artworks = sorted(artworks, key=lambda x: len(x.likes) if hasattr(x, 'likes') else 0, reverse=True)
+    # Obtener los artworks más similares precalculados; si el artwork aún no
+    # tiene firma se calcula ahora, y si no hay vecinos se usan los que
+    # comparten etiquetas ordenados por likes
+    if not similarity.has_signature(artwork.id):
+        similarity.update_artwork(artwork)
+    similar_ids = similarity.similar_ids(artwork.id, limit=4) or ranking.related(artwork, limit=4)
+    artworks = sirope.find_many_by_ids(similar_ids, Artwork)
 
     # Inicializar variables para usuario autenticado
     comment_form = None
@@ -256,7 +391,10 @@ def view(artwork_id):
         comments = sirope.find_many_by_ids(artwork.comments, Comment)
         comments = sorted(comments, key=lambda x: x.created_at, reverse=True)
 
-    return render_template('artwork/view.html',
+    # Dependencias de la página cacheada, consultadas en un único HMGET
+    fragment_cache.depend(artwork, author, *artworks, *comments)
+
+    body = render_template('artwork/view.html',
                          artwork=artwork,
                          author=author,
                          similar_artworks=artworks,
@@ -264,6 +402,8 @@ def view(artwork_id):
                          comments=comments,
                          points_form=points_form,
                          has_donated=has_donated)
+    fragment_cache.store_page(body)
+    return with_validators(body, etag) if etag else body
 
 @bp.route('/<artwork_id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -281,15 +421,37 @@ def edit(artwork_id):
         artwork.title = form.title.data
         artwork.description = form.description.data
         # Actualizar etiquetas
-        artwork.tags = form.tags.data.split(',') if form.tags.data else []
+        artwork.tags = Artwork.normalize_tags(form.tags.data)
+        artwork.updated_at = datetime.utcnow()
+        image_replaced = False
         if form.image.data:
-            if artwork.image_path:
-                old_image_path = os.path.join(current_app.config['ARTWORK_IMAGES_FOLDER'], artwork.image_path)
-                if os.path.exists(old_image_path):
-                    os.remove(old_image_path)
-            filename = save_image(form.image.data, current_app.config['ARTWORK_IMAGES_FOLDER'])
-            artwork.image_path = filename
+            upload_folder = current_app.config['ARTWORK_IMAGES_FOLDER']
+            # Guardar primero la nueva imagen: si falla, el artwork conserva la anterior
+            filename = save_image(form.image.data, upload_folder)
+            if filename is None:
+                flash('Error al guardar la imagen. Por favor, inténtalo de nuevo.')
+                return render_template('artwork/edit.html', title='Editar Artwork', form=form, artwork=artwork)
+            previous_path, previous_thumbnails = artwork.image_path, artwork.thumbnails
+            image_replaced = filename != previous_path
+            if image_replaced:
+                artwork.image_path = filename
+                # Los derivados de la imagen anterior dejan de ser válidos hasta que el worker la procese
+                artwork.thumbnails = {}
+                artwork.dominant_colors = []
+                artwork.placeholder = None
+                header = getattr(form.image, 'image_header', None)
+                artwork.width = header.width if header else None
+                artwork.height = header.height if header else None
         sirope.save(artwork)
+        if form.image.data:
+            # Liberar la imagen anterior (se borra con sus miniaturas si nadie más la usa);
+            # si se ha vuelto a subir la misma, solo se deshace la referencia extra
+            storage.release(previous_path, upload_folder, previous_thumbnails if image_replaced else None)
+        if image_replaced:
+            queue_image_processing(artwork)
+        ranking.index_artwork(artwork)
+        tag_index.index_artwork(artwork)
+        similarity.update_artwork(artwork)
         flash('Tu artwork ha sido actualizado.')
         return redirect(url_for('artwork.view', artwork_id=artwork_id))
     elif request.method == 'GET':
@@ -337,14 +499,9 @@ def delete(artwork_id):
             flash('Error: No se pudo encontrar el autor del artwork.')
             return redirect(url_for('main.index'))
             
-        # 1. Eliminar la imagen del sistema de archivos
+        # 1. Liberar la imagen; se borra con sus miniaturas si ningún otro artwork la usa
         if artwork.image_path:
-            try:
-                image_path = os.path.join(current_app.config['ARTWORK_IMAGES_FOLDER'], artwork.image_path)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-            except Exception as e:
-                logger.error(f"Error al eliminar imagen del artwork: {e}")
+            storage.release(artwork.image_path, current_app.config['ARTWORK_IMAGES_FOLDER'], artwork.thumbnails)
                 
         # 2. Eliminar comentarios asociados silenciosamente
         if hasattr(artwork, 'comments'):
@@ -364,8 +521,11 @@ def delete(artwork_id):
             except Exception as e:
                 logger.error(f"Error al eliminar artwork de la lista del autor: {e}")
 
-        # 4. Eliminar el artwork
+        # 4. Eliminar el artwork y sus entradas en los índices
         sirope.delete(artwork)
+        ranking.remove_artwork(artwork_id)
+        tag_index.remove_artwork(artwork_id)
+        similarity.remove_artwork(artwork_id)
         
         flash('Artwork eliminado correctamente.')
         return redirect(url_for('main.index'))
@@ -468,6 +628,8 @@ def give_points(artwork_id):
                     
                     if not all([saved_donor, saved_author, saved_artwork]):
                         raise Exception("Error al guardar los cambios")
+                    ranking.update_score('points', artwork.id, artwork.points_received)
+                    trending.record(artwork.id, 'donation', points)
                     
                     # Actualizar la sesión del usuario actual
                     from flask_login import login_user
@@ -496,6 +658,40 @@ def give_points(artwork_id):
     
     return redirect(url_for('artwork.view', artwork_id=artwork_id))
 
+@bp.route('/<artwork_id>/like', methods=['GET'])
+def like_status(artwork_id):
+    """
+    Devuelve el número de likes y si el usuario actual ha dado like
+
+    Args:
+        artwork_id (str): ID del artwork
+
+    Returns:
+        Response: JSON con liked y likes_count, o 304 si no ha cambiado
+
+    Note:
+        El ETag depende de la versión del artwork, que cambia con cada like
+    """
+    artwork = sirope.find_by_id(artwork_id, Artwork)
+    if not artwork:
+        return jsonify({'error': 'Artwork no encontrado'}), 404
+
+    etag = version_etag(artwork)
+    if etag and is_not_modified(etag):
+        return not_modified(etag)
+
+    liked = False
+    if current_user.is_authenticated:
+        clean_user_id = str(current_user.id).split('@')[-1] if '@' in str(current_user.id) else str(current_user.id)
+        clean_likes = [str(like_id).split('@')[-1] if '@' in str(like_id) else str(like_id) for like_id in getattr(artwork, 'likes', [])]
+        liked = clean_user_id in clean_likes
+
+    response = jsonify({
+        'liked': liked,
+        'likes_count': len(getattr(artwork, 'likes', []))
+    })
+    return with_validators(response, etag) if etag else response
+
 @bp.route('/<artwork_id>/like', methods=['POST'])
 @login_required
 def toggle_like(artwork_id):
@@ -520,11 +716,19 @@ def toggle_like(artwork_id):
             liked = True
 
         sirope.save(artwork)
-        return jsonify({
+        ranking.update_score('likes', artwork.id, len(artwork.likes))
+        similarity.mark_pending(artwork.id)
+        suggestions.record_like(clean_user_id, artwork.tags, liked)
+        if liked:
+            trending.record(artwork.id, 'like', actor=clean_user_id)
+        response = jsonify({
             'success': True,
             'liked': liked,
             'likes_count': len(artwork.likes)
         })
+        # ETag del nuevo estado, para revalidar después con GET
+        etag = version_etag(artwork)
+        return with_validators(response, etag) if etag else response
     except Exception as e:
         logger.error(f"Error al procesar like: {str(e)}")
         return jsonify({'error': 'Error al procesar la acción'}), 500 
\ No newline at end of file
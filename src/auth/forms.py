@@ -4,7 +4,7 @@ from wtforms.validators import ValidationError
 from flask_wtf.file import FileField, FileAllowed
 from .user_model import User
 from ..services.sirope_service import SiropeService
-from ..utils.form_validators import CustomDataRequired, CustomEmail, CustomLength, CustomEqualTo
+from ..utils.form_validators import CustomDataRequired, CustomEmail, CustomLength, CustomEqualTo, CustomImageFile
 
 class LoginForm(FlaskForm):
     """
@@ -52,7 +52,8 @@ class RegistrationForm(FlaskForm):
     password = PasswordField('Contraseña', validators=[CustomDataRequired(), CustomLength(min=6)])
     password2 = PasswordField('Repetir Contraseña', validators=[CustomDataRequired(), CustomEqualTo('password')])
     profile_picture = FileField('Imagen de Perfil', validators=[
-        FileAllowed(['jpg', 'jpeg', 'png'], 'Solo se permiten imágenes (jpg, jpeg, png)')
+        FileAllowed(['jpg', 'jpeg', 'png'], 'Solo se permiten imágenes (jpg, jpeg, png)'),
+        CustomImageFile(formats=('png', 'jpeg'))
     ])
     submit = SubmitField('Registrarse')
 
@@ -91,7 +92,8 @@ class ProfileForm(FlaskForm):
     email = StringField('Email', validators=[CustomDataRequired(), CustomEmail(), CustomLength(max=120)])
     bio = TextAreaField('Biografía', validators=[CustomLength(max=500)])
     profile_picture = FileField('Imagen de Perfil', validators=[
-        FileAllowed(['jpg', 'jpeg', 'png'], 'Solo se permiten imágenes (jpg, jpeg, png)')
+        FileAllowed(['jpg', 'jpeg', 'png'], 'Solo se permiten imágenes (jpg, jpeg, png)'),
+        CustomImageFile(formats=('png', 'jpeg'))
     ])
     submit = SubmitField('Actualizar Perfil')
 
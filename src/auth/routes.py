@@ -1,26 +1,28 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.urls import url_parse
-from werkzeug.utils import secure_filename
 import os
-import time
 from .forms import LoginForm, RegistrationForm, ProfileForm, RequestPasswordResetForm, DirectPasswordResetForm
 from .user_model import User
 from ..services.sirope_service import SiropeService
+from ..services.avatar_service import AvatarService
+from ..services.username_service import UsernameIndexService
 from ..artwork.model import Artwork
 from ..comment.model import Comment
 from ..social.models import Message
 from ..points.model import PointsTransaction
 from ..utils.helpers import get_artwork, sync_user_artworks, sync_user_points
+from ..utils.http_cache import version_etag, is_not_modified, not_modified, with_validators
 import logging
 from werkzeug.security import generate_password_hash
 from datetime import datetime
-from PIL import Image
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('auth', __name__)
 sirope = SiropeService()
+avatars = AvatarService()
+usernames = UsernameIndexService()
 
 # Configuración para subida de imágenes
 UPLOAD_FOLDER = os.path.join('src', 'static', 'uploads', 'profile_pictures')
@@ -36,75 +38,39 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def save_profile_picture(file):
+    """
+    Genera los avatares de una imagen de perfil subida
+
+    Args:
+        file (FileStorage): Imagen subida
+
+    Returns:
+        dict|None: Avatares por lado ('48' -> ruta relativa) o None si falla
+
+    Note:
+        La imagen original no se conserva, solo los recortes cuadrados
+    """
     if file and allowed_file(file.filename):
-        try:
-            filename = secure_filename(file.filename)
-            # Crear un nombre único para el archivo
-            base, ext = os.path.splitext(filename)
-            unique_filename = f"{base}_{str(int(time.time()))}{ext}"
-            
-            # Usar la ruta correcta para las imágenes de perfil
-            profile_pictures_folder = os.path.join(current_app.root_path, 'static', 'uploads', 'profile_pictures')
-            os.makedirs(profile_pictures_folder, exist_ok=True)
-            
-            # Asegurarse de que el archivo se guarde con la extensión correcta
-            if ext.lower() not in ['.jpg', '.jpeg', '.png']:
-                logger.error(f"Extensión de archivo no permitida: {ext}")
-                return None
-            
-            # Guardar temporalmente el archivo
-            temp_path = os.path.join(profile_pictures_folder, 'temp_' + unique_filename)
-            file.save(temp_path)
-            
-            try:
-                # Abrir y procesar la imagen con Pillow
-                with Image.open(temp_path) as img:
-                    # Convertir a RGB si es necesario
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    
-                    # Obtener dimensiones
-                    width, height = img.size
-                    
-                    # Determinar el tamaño del cuadrado
-                    size = min(width, height)
-                    
-                    # Calcular coordenadas para el recorte
-                    left = (width - size) // 2
-                    top = (height - size) // 2
-                    right = left + size
-                    bottom = top + size
-                    
-                    # Recortar la imagen en un cuadrado
-                    img = img.crop((left, top, right, bottom))
-                    
-                    # Redimensionar a un tamaño estándar (400x400)
-                    img = img.resize((400, 400), Image.Resampling.LANCZOS)
-                    
-                    # Guardar la imagen procesada
-                    file_path = os.path.join(profile_pictures_folder, unique_filename)
-                    img.save(file_path, 'JPEG', quality=85)
-                
-                # Eliminar el archivo temporal
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                
-                logger.info(f"Imagen de perfil guardada y procesada en: {file_path}")
-                
-                # Devolver la ruta relativa para acceder desde la web
-                return unique_filename
-                
-            finally:
-                # Asegurarse de que el archivo temporal se elimine incluso si hay errores
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                    
-        except Exception as e:
-            logger.error(f"Error al guardar la imagen: {e}")
-            return None
-            
+        return avatars.create(file, current_app.config['PROFILE_PICTURES_FOLDER'])
     return None
 
+@bp.app_template_global()
+def avatar_url(user, size=48):
+    """
+    Obtiene la URL del avatar de un usuario, o de la imagen por defecto
+
+    Args:
+        user (User): Usuario
+        size (int): Lado en píxeles CSS con el que se muestra
+
+    Returns:
+        str: URL de la imagen
+    """
+    filename = avatars.pick(user, size, current_app.config['PROFILE_PICTURES_FOLDER'])
+    if filename:
+        return url_for('main.profile_picture', filename=filename)
+    return url_for('static', filename='img/default.jpg')
+
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -182,15 +148,14 @@ def register():
             )
             
             # Inicializar listas
-            user.following = []
-            user.followers = []
             user.artworks = []
             
             # Manejar la imagen de perfil si se proporcionó una
             if form.profile_picture.data:
-                profile_picture_path = save_profile_picture(form.profile_picture.data)
-                if profile_picture_path:
-                    user.profile_picture = profile_picture_path
+                new_avatars = save_profile_picture(form.profile_picture.data)
+                if new_avatars:
+                    user.avatars = new_avatars
+                    user.profile_picture = new_avatars[max(new_avatars, key=int)]
             
             # Guardar usuario
             user = sirope.save(user)
@@ -198,17 +163,9 @@ def register():
                 logger.error("Error: Usuario guardado sin ID")
                 flash('Error al crear el usuario. Por favor, inténtalo de nuevo.')
                 return render_template('auth/register.html', title='Registro', form=form)
-            
-            # Verificar que las listas se guardaron correctamente
-            user = sirope.find_by_id(user.id, User)
-            if not hasattr(user, 'following') or not hasattr(user, 'followers'):
-                logger.error(f"Error: Usuario {user.id} guardado sin listas de following/followers")
-                flash('Error al crear el usuario. Por favor, inténtalo de nuevo.')
-                return render_template('auth/register.html', title='Registro', form=form)
+            usernames.index_user(user)
             
             logger.info(f"Nuevo usuario registrado: {user.username} (ID: {user.id})")
-            logger.info(f"Estado de following: {user.following}")
-            logger.info(f"Estado de followers: {user.followers}")
             
             flash('¡Registro completado con éxito!')
             return redirect(url_for('auth.login'))
@@ -247,20 +204,13 @@ def profile():
             if form.profile_picture.data:
                 try:
                     # Procesar y guardar la nueva imagen
-                    new_filename = save_profile_picture(form.profile_picture.data)
-                    if new_filename:
-                        # Eliminar la imagen anterior si existe
-                        if user.profile_picture:
-                            old_file = os.path.join(current_app.root_path, 'static', 'uploads', 'profile_pictures', user.profile_picture)
-                            try:
-                                if os.path.exists(old_file):
-                                    os.remove(old_file)
-                                    logger.info(f"Imagen anterior eliminada: {old_file}")
-                            except Exception as e:
-                                logger.warning(f"No se pudo eliminar la imagen anterior: {str(e)}")
-                        
-                        user.profile_picture = new_filename
-                        logger.info(f"Nueva imagen de perfil guardada: {new_filename}")
+                    new_avatars = save_profile_picture(form.profile_picture.data)
+                    if new_avatars:
+                        # Eliminar la imagen anterior y sus avatares
+                        avatars.delete(user, current_app.config['PROFILE_PICTURES_FOLDER'])
+                        user.avatars = new_avatars
+                        user.profile_picture = new_avatars[max(new_avatars, key=int)]
+                        logger.info(f"Nueva imagen de perfil guardada: {user.profile_picture}")
                     else:
                         raise Exception("Error al procesar la imagen de perfil")
                         
@@ -271,6 +221,7 @@ def profile():
             
             # Guardar el usuario actualizado
             user = sirope.save(user)
+            usernames.index_user(user)
             
             # Actualizar la sesión con el usuario actualizado
             login_user(user)
@@ -336,9 +287,19 @@ def user_profile(username):
     
     logger.info(f"Usuario encontrado: {user.username} (ID: {user.id})")
     
-    # Asegurar que el usuario tenga todos los atributos necesarios
+    # Asegurar que el usuario tenga todos los atributos necesarios; completar
+    # atributos no cambia el contenido, así que no invalida las validaciones HTTP
     user.ensure_attributes()
-    sirope.save(user)
+    sirope.save(user, invalidate=False)
+
+    # Validación HTTP antes de cargar artworks, seguidores y seguidos
+    follower_ids = user.followers
+    following_ids = user.following
+    related_keys = [sirope.version_key(Artwork, art_id) for art_id in user.artworks]
+    related_keys += [sirope.version_key(User, user_id) for user_id in follower_ids + following_ids]
+    etag = version_etag(user, *related_keys)
+    if etag and is_not_modified(etag):
+        return not_modified(etag)
     
     # Si el usuario está autenticado, obtener una copia fresca del usuario actual
     current_user_fresh = None
@@ -346,7 +307,7 @@ def user_profile(username):
         current_user_fresh = sirope.find_by_id(current_user.id, User)
         if current_user_fresh:
             current_user_fresh.ensure_attributes()
-            sirope.save(current_user_fresh)
+            sirope.save(current_user_fresh, invalidate=False)
     
     # Obtener artworks del usuario
     artworks = []
@@ -371,31 +332,32 @@ def user_profile(username):
     followers = []
     following = []
     
-    for follower_id in user.followers:
+    for follower_id in follower_ids:
         follower = sirope.find_by_id(follower_id, User)
         if follower:
             follower.ensure_attributes()
-            sirope.save(follower)
+            sirope.save(follower, invalidate=False)
             followers.append(follower)
     
-    for following_id in user.following:
+    for following_id in following_ids:
         followed = sirope.find_by_id(following_id, User)
         if followed:
             followed.ensure_attributes()
-            sirope.save(followed)
+            sirope.save(followed, invalidate=False)
             following.append(followed)
     
     # Ordenar seguidores y seguidos por nombre de usuario
     followers.sort(key=lambda x: x.username.lower())
     following.sort(key=lambda x: x.username.lower())
     
-    return render_template('auth/user_profile.html',
+    body = render_template('auth/user_profile.html',
                          user=user,
                          artworks=artworks,
                          followers=followers,
                          following=following,
                          sort_by=sort_by,
                          sort_order=sort_order)
+    return with_validators(body, etag) if etag else body
 
 @bp.route('/reset_password_request', methods=['GET', 'POST'])
 def reset_password_request():
@@ -18,15 +18,18 @@ class User(UserMixin):
         password_hash (str): Hash de la contraseña del usuario
         points (int): Puntos disponibles para donar
         profile_picture (str): Ruta a la imagen de perfil
+        avatars (dict): Avatares cuadrados por lado ('48' -> ruta relativa)
         bio (str): Descripción del perfil
         created_at (datetime): Fecha de creación de la cuenta
         artworks (list): Lista de IDs de artworks creados
-        following (list): Lista de IDs de usuarios seguidos
-        followers (list): Lista de IDs de usuarios seguidores
+        following (list): IDs de usuarios seguidos (grafo de seguimiento en Redis)
+        followers (list): IDs de usuarios seguidores (grafo de seguimiento en Redis)
         
     Note:
         Hereda de UserMixin para proporcionar la implementación por defecto
-        de propiedades y métodos requeridos por Flask-Login
+        de propiedades y métodos requeridos por Flask-Login.
+        Las relaciones de seguimiento no se guardan en el objeto: viven en
+        FollowGraphService y se consultan bajo demanda
     """
     
     def __init__(self, username=None, email=None, password=None):
@@ -46,11 +49,10 @@ class User(UserMixin):
             self.set_password(password)
         self.points = 0
         self.profile_picture = None
+        self.avatars = {}
         self.bio = ""
         self.created_at = datetime.utcnow()
         self.artworks = []
-        self.following = []  # Lista de IDs de usuarios que sigue
-        self.followers = []  # Lista de IDs de usuarios que lo siguen
 
     def get_id(self):
         """
@@ -139,131 +141,88 @@ class User(UserMixin):
         from src.config import Config
         return self.points * Config.POINTS_TO_CURRENCY_RATE
 
+    @staticmethod
+    def _follow_graph():
+        """
+        Obtiene el servicio del grafo de seguimiento
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+        """
+        from ..services.follow_service import FollowGraphService
+        return FollowGraphService()
+
+    @property
+    def following(self):
+        """IDs de los usuarios que sigue este usuario"""
+        if not self._id:
+            return []
+        return self._follow_graph().following_ids(self._id)
+
+    @property
+    def followers(self):
+        """IDs de los usuarios que siguen a este usuario"""
+        if not self._id:
+            return []
+        return self._follow_graph().follower_ids(self._id)
+
+    @property
+    def followers_count(self):
+        """Número de seguidores (SCARD, sin cargar la lista)"""
+        if not self._id:
+            return 0
+        return self._follow_graph().counts(self._id)[0]
+
+    @property
+    def following_count(self):
+        """Número de usuarios seguidos (SCARD, sin cargar la lista)"""
+        if not self._id:
+            return 0
+        return self._follow_graph().counts(self._id)[1]
+
     def follow(self, user):
         """Sigue a un usuario"""
-        if not user or not user.id:
+        if not user or not user.id or not self.id:
             return False
-            
-        # Asegurar que ambos usuarios tengan las listas necesarias
-        if not hasattr(self, 'following'):
-            self.following = []
-        if not hasattr(user, 'followers'):
-            user.followers = []
-            
-        # Convertir IDs a string y asegurar que sean numéricos
         try:
-            from ..services.sirope_service import SiropeService
-            sirope_service = SiropeService()
-            str_user_id = str(user.id)
-            str_self_id = str(self.id)
-            
-            # Verificar que los IDs sean válidos
-            if not str_user_id or not str_self_id:
-                logger.error("IDs inválidos al intentar seguir")
-                return False
-                
-            # Verificar que no se intente seguirse a sí mismo
-            if str_user_id == str_self_id:
-                return False
-                
-            # Añadir las relaciones si no existen
-            if str_user_id not in self.following:
-                self.following.append(str_user_id)
-                if str_self_id not in user.followers:
-                    user.followers.append(str_self_id)
-                return True
-            return False
-            
+            return self._follow_graph().follow(self.id, user.id)
         except Exception as e:
             logger.error(f"Error al seguir usuario: {e}")
             return False
 
     def unfollow(self, user):
         """Deja de seguir a un usuario"""
-        if not user or not user.id:
+        if not user or not user.id or not self.id:
             return False
-            
-        # Asegurar que ambos usuarios tengan las listas necesarias
-        if not hasattr(self, 'following'):
-            self.following = []
-        if not hasattr(user, 'followers'):
-            user.followers = []
-            
-        # Convertir IDs a string
         try:
-            str_user_id = str(user.id)
-            str_self_id = str(self.id)
-            
-            # Verificar que los IDs sean válidos
-            if not str_user_id or not str_self_id:
-                logger.error("IDs inválidos al intentar dejar de seguir")
-                return False
-                
-            # Verificar que no se intente dejar de seguirse a sí mismo
-            if str_user_id == str_self_id:
-                return False
-                
-            # Eliminar las relaciones si existen
-            if str_user_id in self.following:
-                self.following.remove(str_user_id)
-                if str_self_id in user.followers:
-                    user.followers.remove(str_self_id)
-                return True
-            return False
-            
+            return self._follow_graph().unfollow(self.id, user.id)
         except Exception as e:
             logger.error(f"Error al dejar de seguir usuario: {e}")
             return False
 
     def add_follower(self, user):
         """Añade un seguidor"""
-        if not user or not user.id:
+        if not user or not user.id or not self.id:
             return False
-        if not hasattr(self, 'followers'):
-            self.followers = []
-        if str(user.id) not in self.followers:
-            self.followers.append(str(user.id))
-            return True
-        return False
+        return self._follow_graph().follow(user.id, self.id)
 
     def remove_follower(self, user):
         """Elimina un seguidor"""
-        if not user or not user.id:
+        if not user or not user.id or not self.id:
             return False
-        if not hasattr(self, 'followers'):
-            self.followers = []
-        if str(user.id) in self.followers:
-            self.followers.remove(str(user.id))
-            return True
-        return False
+        return self._follow_graph().unfollow(user.id, self.id)
 
     def is_following(self, user):
         """Verifica si este usuario sigue al usuario dado"""
-        if not user or not user.id:
-            return False
-        if not hasattr(self, 'following'):
-            self.following = []
-            
-        try:
-            str_user_id = str(user.id)
-            return str_user_id in self.following
-        except Exception as e:
-            logger.error(f"Error al verificar si sigue al usuario: {e}")
+        if not user or not user.id or not self.id:
             return False
+        return self._follow_graph().is_following(self.id, user.id)
 
     def is_followed_by(self, user):
         """Verifica si este usuario es seguido por el usuario dado"""
-        if not user or not user.id:
-            return False
-        if not hasattr(self, 'followers'):
-            self.followers = []
-            
-        try:
-            str_user_id = str(user.id)
-            return str_user_id in self.followers
-        except Exception as e:
-            logger.error(f"Error al verificar si es seguido por el usuario: {e}")
+        if not user or not user.id or not self.id:
             return False
+        return self._follow_graph().is_following(user.id, self.id)
 
     def ensure_attributes(self):
         """
@@ -280,10 +239,6 @@ class User(UserMixin):
         """
         if not hasattr(self, 'artworks'):
             self.artworks = []
-        if not hasattr(self, 'followers'):
-            self.followers = []
-        if not hasattr(self, 'following'):
-            self.following = []
         if not hasattr(self, 'points'):
             self.points = 0
         if not hasattr(self, 'created_at'):
@@ -292,6 +247,8 @@ class User(UserMixin):
             self.bio = ""
         if not hasattr(self, 'profile_picture'):
             self.profile_picture = None
+        if not hasattr(self, 'avatars'):
+            self.avatars = {}
         return self
 
     def to_dict(self):
@@ -302,11 +259,10 @@ class User(UserMixin):
             'password_hash': self.password_hash,
             'points': self.points,
             'profile_picture': self.profile_picture,
+            'avatars': getattr(self, 'avatars', {}),
             'bio': self.bio,
             'created_at': self.created_at.isoformat() if isinstance(self.created_at, datetime) else self.created_at,
-            'artworks': self.artworks,
-            'followers': self.followers,
-            'following': self.following
+            'artworks': self.artworks
         }
 
     @staticmethod
@@ -322,10 +278,13 @@ class User(UserMixin):
             user.password_hash = data.get('password_hash')
             user.points = int(data.get('points', 0))
             user.profile_picture = data.get('profile_picture')
+            user.avatars = dict(data.get('avatars') or {})
             user.bio = data.get('bio', '')
             user.artworks = list(data.get('artworks', []))
-            user.followers = list(data.get('followers', []))
-            user.following = list(data.get('following', []))
+
+            # Usuarios guardados con las listas de seguimiento: se migran al grafo
+            if user._id and (data.get('following') or data.get('followers')):
+                user._follow_graph().import_lists(user._id, data.get('following'), data.get('followers'))
 
             created_at = data.get('created_at')
             if isinstance(created_at, str):
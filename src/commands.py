@@ -0,0 +1,158 @@
+import click
+import logging
+
+logger = logging.getLogger(__name__)
+
+def register_commands(app):
+    """
+    Registra los comandos de mantenimiento en la CLI de Flask
+
+    Args:
+        app (Flask): Aplicación sobre la que registrar los comandos
+
+    Note:
+        Importa los servicios de forma dinámica para evitar ciclos
+    """
+
+    @app.cli.command('similarity-recompute')
+    def similarity_recompute():
+        """Recalcula en lote los artworks similares de todo el catálogo"""
+        from .services.similarity_service import SimilarityService
+
+        count = SimilarityService().recompute_all()
+        click.echo(f"Similitudes recalculadas para {count} artworks")
+
+    @app.cli.command('similarity-refresh')
+    def similarity_refresh():
+        """Recalcula los artworks similares pendientes tras cambios de likes (tarea periódica)"""
+        from .services.similarity_service import SimilarityService
+
+        count = SimilarityService().refresh_pending()
+        click.echo(f"Similitudes recalculadas para {count} artworks")
+
+    @app.cli.command('suggestions-refresh')
+    @click.option('--all', 'recompute', is_flag=True,
+                  help='Recalcular las etiquetas gustadas y las sugerencias de todos los usuarios')
+    def suggestions_refresh(recompute):
+        """Recalcula las sugerencias de usuarios pendientes tras cambios de seguimiento (tarea periódica)"""
+        from .services.suggestion_service import SuggestionService
+
+        service = SuggestionService()
+        if recompute:
+            count = service.recompute_all()
+        else:
+            count = service.refresh_pending()
+        click.echo(f"Sugerencias recalculadas para {count} usuarios")
+
+    @app.cli.command('conversations-rebuild')
+    def conversations_rebuild():
+        """Reconstruye el índice de mensajes por conversación"""
+        from .services.conversation_service import ConversationService
+
+        count = ConversationService().rebuild()
+        if count < 0:
+            click.echo("Ya hay una reconstrucción del índice de conversaciones en curso")
+        else:
+            click.echo(f"Índice de conversaciones reconstruido con {count} mensajes")
+
+    @app.cli.command('usernames-rebuild')
+    def usernames_rebuild():
+        """Reconstruye el índice de nombres de usuario de la búsqueda"""
+        from .services.username_service import UsernameIndexService
+
+        count = UsernameIndexService().rebuild()
+        if count < 0:
+            click.echo("Ya hay una reconstrucción del índice de nombres de usuario en curso")
+        else:
+            click.echo(f"Índice de nombres de usuario reconstruido con {count} usuarios")
+
+    @app.cli.command('fuzzy-search-rebuild')
+    def fuzzy_search_rebuild():
+        """Reconstruye los índices de trigramas de usuarios y títulos"""
+        from .services.search_service import FuzzySearchService
+
+        service = FuzzySearchService()
+        for kind in service.KINDS:
+            count = service.rebuild(kind)
+            if count < 0:
+                click.echo(f"Ya hay una reconstrucción del índice de trigramas de {kind} en curso")
+            else:
+                click.echo(f"Índice de trigramas de {kind} reconstruido con {count} objetos")
+
+    @app.cli.command('trending-renormalize')
+    def trending_renormalize():
+        """Reescala las puntuaciones de tendencia a la época actual (tarea periódica)"""
+        from .services.trending_service import TrendingService
+
+        factor = TrendingService().renormalize()
+        click.echo(f"Puntuaciones de tendencia renormalizadas (factor {factor:.6g})")
+
+    @app.cli.command('images-backfill')
+    @click.option('--kind', type=click.Choice(['all', 'artworks', 'avatars']), default='all',
+                  help='Derivados a generar')
+    @click.option('--workers', type=int, default=None, help='Procesos del pool (por defecto la mitad de los núcleos)')
+    @click.option('--rate', type=float, default=0, help='Máximo de imágenes por segundo (0 = sin límite)')
+    @click.option('--force', is_flag=True, help='Regenerar también los artworks que ya tienen derivados')
+    @click.option('--restart', is_flag=True, help='Descartar el progreso guardado y empezar de nuevo')
+    def images_backfill(kind, workers, rate, force, restart):
+        """Genera miniaturas, metadatos y avatares de las imágenes antiguas (reanudable)"""
+        from .services.backfill_service import BackfillService
+
+        backfill = BackfillService()
+        kinds = BackfillService.KINDS if kind == 'all' else (kind,)
+        for current in kinds:
+            if restart:
+                backfill.reset(current)
+            previous = backfill.progress(current)
+            if previous.get('done'):
+                click.echo(f"Reanudando {current}: {previous['done']} ya procesados")
+            counts = backfill.run(current,
+                                  app.config['ARTWORK_IMAGES_FOLDER'],
+                                  app.config['PROFILE_PICTURES_FOLDER'],
+                                  workers=workers,
+                                  rate=rate,
+                                  force=force,
+                                  report=lambda counts, current=current: click.echo(f"  {current}: {counts}"))
+            click.echo(f"Backfill de {current}: {counts['processed']} procesados, {counts['failed']} con error")
+
+    @app.cli.command('uploads-gc')
+    @click.option('--kind', type=click.Choice(['all', 'artworks', 'avatars']), default='all',
+                  help='Carpeta de subidas a recorrer')
+    @click.option('--limit', type=int, default=None, help='Máximo de archivos a revisar (continúa en la siguiente ejecución)')
+    @click.option('--grace-hours', type=float, default=None, help='Antigüedad mínima de los huérfanos (por defecto GC_GRACE_HOURS)')
+    @click.option('--dry-run', is_flag=True, help='Informar de los huérfanos sin borrarlos')
+    def uploads_gc(kind, limit, grace_hours, dry_run):
+        """Borra los archivos subidos que ya no referencia ningún artwork o usuario"""
+        from .services.gc_service import UploadsGarbageCollector
+
+        collector = UploadsGarbageCollector()
+        folders = {
+            'artworks': app.config['ARTWORK_IMAGES_FOLDER'],
+            'avatars': app.config['PROFILE_PICTURES_FOLDER']
+        }
+        grace_hours = app.config['GC_GRACE_HOURS'] if grace_hours is None else grace_hours
+        kinds = UploadsGarbageCollector.KINDS if kind == 'all' else (kind,)
+        for current in kinds:
+            stats = collector.collect(current,
+                                      folders[current],
+                                      grace_seconds=int(grace_hours * 3600),
+                                      limit=limit,
+                                      dry_run=dry_run)
+            action = 'liberables' if dry_run else 'liberados'
+            state = 'pasada completa' if stats['complete'] else 'continuará en la siguiente ejecución'
+            click.echo(f"{current}: {stats['scanned']} archivos revisados, {stats['orphans']} huérfanos, "
+                       f"{stats['deleted']} borrados, {stats['bytes'] / (1024 * 1024):.1f} MB {action} ({state})")
+
+    @app.cli.command('follow-graph-migrate')
+    def follow_graph_migrate():
+        """Migra al grafo de Redis las listas de seguimiento guardadas en los usuarios"""
+        from .auth.user_model import User
+        from .services.sirope_service import SiropeService
+
+        sirope = SiropeService()
+        count = 0
+        # Cargar el usuario migra sus listas; guardarlo las elimina del objeto
+        for user in sirope.iter_all(User):
+            sirope.save(user, invalidate=False)
+            count += 1
+        click.echo(f"Relaciones de seguimiento migradas para {count} usuarios")
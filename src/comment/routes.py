@@ -3,10 +3,12 @@ from flask_login import login_required, current_user
 from .model import Comment
 from ..artwork.model import Artwork
 from ..services.sirope_service import SiropeService
+from ..services.trending_service import TrendingService
 from ..auth.user_model import User
 
 bp = Blueprint('comment', __name__)
 sirope = SiropeService()
+trending = TrendingService()
 
 @bp.route('/create/<artwork_id>', methods=['POST'])
 @login_required
@@ -44,6 +46,7 @@ def create(artwork_id):
     
     artwork.add_comment(comment_id)
     sirope.save(artwork)
+    trending.record(artwork.id, 'comment')
     
     author = sirope.find_by_id(comment.author_id, User)
     
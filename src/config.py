@@ -10,7 +10,14 @@ class Config:
     UPLOAD_FOLDER = os.path.join('src', 'static', 'uploads')
     ARTWORK_IMAGES_FOLDER = os.path.join('src', 'static', 'uploads', 'artworks')
     PROFILE_PICTURES_FOLDER = os.path.join('src', 'static', 'uploads', 'profile_pictures')
+    UPLOAD_TEMP_FOLDER = os.path.join('src', 'tmp', 'uploads')  # Fuera de static: no se sirve
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max-limit
+
+    # Configuración del envío de archivos
+    SEND_FILE_MAX_AGE_DEFAULT = 3600  # Caché de los estáticos servidos por Flask
+    UPLOADS_MAX_AGE = 24 * 3600  # Caché de imágenes subidas que no son direccionadas por contenido
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true')  # Apache/lighttpd
+    FILE_ACCEL_REDIRECT = os.environ.get('FILE_ACCEL_REDIRECT')  # Location interna de nginx, p. ej. '/_protected'
     
     # Configuración de sesión
     SESSION_TYPE = 'redis'
@@ -22,6 +29,50 @@ class Config:
     MIN_WITHDRAWAL_POINTS = 1000
     POINTS_TO_CURRENCY_RATE = 0.01  # 1 punto = 0.01€
     
+    # Configuración de explorar
+    EXPLORE_PAGE_SIZE = 24  # Artworks por página
+    EXPLORE_API_MAX_LIMIT = 60  # Máximo de artworks por respuesta de /api/explore
+
+    # Configuración de tendencias
+    TRENDING_HALF_LIFE_HOURS = 24  # Horas en las que una interacción pierde la mitad de su peso
+    TRENDING_WEIGHTS = {
+        'view': 1,
+        'like': 5,
+        'comment': 8,
+        'donation': 3  # Por cada duplicación de los puntos donados (escala logarítmica)
+    }
+    # Ventana en segundos en la que la misma interacción de un mismo usuario (o IP) cuenta una sola vez
+    TRENDING_DEDUP_SECONDS = {
+        'view': 3600,
+        'like': 24 * 3600
+    }
+
+    # Configuración de la caché de fragmentos renderizados
+    FRAGMENT_CACHE_MAX_BYTES = 32 * 1024 * 1024  # Límite de la caché en memoria de cada proceso
+    FRAGMENT_CACHE_TTL = 300  # Segundos que se conserva una tarjeta renderizada
+    PAGE_CACHE_TTL = 60  # Segundos que se conserva una página anónima completa
+    HTTP_CACHE_MAX_AGE = 60  # max-age de las respuestas públicas para navegadores y proxies
+
+    # Configuración de miniaturas
+    THUMBNAIL_SIZES = (320, 640, 1280)  # Anchos generados para cada artwork
+    THUMBNAIL_QUALITY = 82  # Calidad de compresión WebP/JPEG
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS') or 0)  # Procesos de procesado de imágenes (0 = uno por núcleo)
+
+    # Configuración del backfill de derivados (flask images-backfill)
+    BACKFILL_NICE = 10  # Prioridad reducida de los procesos para no competir con el tráfico
+    BACKFILL_REPORT_EVERY = 100  # Imágenes entre cada informe de progreso
+
+    # Configuración del recolector de archivos huérfanos (flask uploads-gc)
+    GC_GRACE_HOURS = 24  # Antigüedad mínima de un archivo no referenciado para borrarlo
+
+    # Configuración de avatares
+    AVATAR_SIZES = (48, 96, 256)  # Lados de los avatares cuadrados generados al subir la imagen de perfil
+    AVATAR_QUALITY = 85  # Calidad JPEG de los avatares
+
+    # Límites de las imágenes subidas (se comprueban en la cabecera, sin decodificar)
+    MAX_IMAGE_SIDE = 10000  # Píxeles máximos de ancho o alto
+    MAX_IMAGE_PIXELS = 40 * 1000 * 1000  # Píxeles totales máximos (40 MP); también limita a Pillow
+
     # Configuración de archivos permitidos
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     
@@ -32,6 +83,7 @@ class Config:
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     os.makedirs(PROFILE_PICTURES_FOLDER, exist_ok=True)
     os.makedirs(ARTWORK_IMAGES_FOLDER, exist_ok=True)
+    os.makedirs(UPLOAD_TEMP_FOLDER, exist_ok=True)
     print(f"Directorio de uploads configurado en: {UPLOAD_FOLDER}")
     print(f"Directorio de imágenes de perfil configurado en: {PROFILE_PICTURES_FOLDER}")
     print(f"Directorio de imágenes de artworks configurado en: {ARTWORK_IMAGES_FOLDER}")
@@ -1,8 +1,14 @@
-from flask import Blueprint, render_template, send_from_directory, current_app, abort, request
+from flask import Blueprint, render_template, current_app, request, jsonify, url_for
+from werkzeug.exceptions import NotFound
 from flask_login import current_user
 from ..artwork.model import Artwork
 from ..services.sirope_service import SiropeService
+from ..services.ranking_service import RankingService
+from ..services.tag_service import TagIndexService
+from ..services.fragment_cache import FragmentCacheService, anonymous_page_cache
+from ..services.avatar_service import AvatarService
 from ..utils.helpers import get_artwork, get_user, sync_user_artworks
+from ..utils.file_serving import serve_file
 from ..auth.user_model import User
 import logging
 import os
@@ -11,14 +17,19 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 bp = Blueprint('main', __name__)
 sirope = SiropeService()
+ranking = RankingService()
+tag_index = TagIndexService()
+fragment_cache = FragmentCacheService()
+avatars = AvatarService()
 
 @bp.route('/')
+@anonymous_page_cache
 def index():
     """
     Vista de la página principal
     
     Esta vista maneja la página de inicio:
-    - Muestra los artworks más recientes
+    - Muestra los artworks en tendencia y los más recientes
     - Sincroniza artworks con sus autores
     - Calcula estadísticas de usuarios y artworks
     
@@ -29,6 +40,8 @@ def index():
         Accesible sin autenticación
         Muestra máximo 9 artworks en un grid 3x3
         Calcula usuarios activos válidos
+        Los visitantes anónimos reciben la página cacheada mientras no
+        cambien los artworks o usuarios mostrados
     """
     # Obtener artworks recientes
     all_artworks = sirope.find_all(Artwork)
@@ -72,9 +85,17 @@ def index():
             valid_users.add(user.id)
     
     total_users = len(valid_users)
+
+    # Artworks en tendencia desde el índice, sin recalcular puntuaciones
+    trending_ids, _ = ranking.page(sort_by='trending', limit=3)
+    trending_artworks = sirope.find_many_by_ids(trending_ids, Artwork)
+
+    # Dependencias de la página cacheada, consultadas en un único HMGET
+    fragment_cache.depend(Artwork, User, *artworks, *trending_artworks)
     
     return render_template('index.html', 
                          artworks=artworks,
+                         trending_artworks=trending_artworks,
                          total_artworks=total_artworks,
                          remaining_artworks=remaining_artworks,
                          total_users=total_users)
@@ -100,105 +121,185 @@ def clean_duplicate_users(users):
     return cleaned_users
 
 @bp.route('/explore')
+@anonymous_page_cache
 def explore():
+    """
+    Vista para explorar artworks
+
+    Esta vista maneja la búsqueda y ordenación de artworks:
+    - Filtra por título, etiquetas o ambos
+    - Muestra la nube de etiquetas más usadas
+    - Ordena por fecha, título, likes, vistas o puntos
+    - Pagina los resultados
+
+    Returns:
+        str: Plantilla renderizada con la página de artworks solicitada
+
+    Note:
+        La ordenación y el filtrado se resuelven sobre los índices de Redis,
+        solo se cargan de Sirope los artworks de la página actual
+    """
     search_type = request.args.get('search_type', 'all')
-    search_query = request.args.get('q', '')
+    search_query = request.args.get('q', '').strip()
     sort_by = request.args.get('sort_by', 'recent')
     sort_order = request.args.get('sort_order', 'desc')
-    
-    # Obtener todos los artworks
-    all_artworks = sirope.find_all(Artwork)
+    page = request.args.get('page', 1, type=int)
+    page = max(page or 1, 1)
+    per_page = current_app.config['EXPLORE_PAGE_SIZE']
+
+    # Obtener los IDs de la página desde el índice de ordenación
+    artwork_ids, total = ranking.page(sort_by=sort_by,
+                                      sort_order=sort_order,
+                                      offset=(page - 1) * per_page,
+                                      limit=per_page,
+                                      search_query=search_query,
+                                      search_type=search_type)
+
+    # Cargar solo los artworks de la página, descartando los de autores inexistentes
     artworks = []
-    
-    # Filtrar artworks según el tipo de búsqueda
-    for art in all_artworks:
-        if art and art.id:
-            # Verificar que el artwork existe y es válido
-            verified_art = get_artwork(art.id)
-            if verified_art and verified_art.author_id:
-                # Verificar que el autor existe
-                author = get_user(verified_art.author_id)
-                if author:
-                    if search_query:
-                        if search_type == 'title' and search_query.lower() in verified_art.title.lower():
-                            artworks.append(verified_art)
-                        elif search_type == 'tags' and any(search_query.lower() in tag.lower() for tag in verified_art.tags):
-                            artworks.append(verified_art)
-                        elif search_type == 'all' and (
-                            search_query.lower() in verified_art.title.lower() or
-                            any(search_query.lower() in tag.lower() for tag in verified_art.tags)
-                        ):
-                            artworks.append(verified_art)
-                    else:
-                        artworks.append(verified_art)
-    
-    # Ordenar artworks según los parámetros
-    if sort_by == 'title':
-        artworks.sort(key=lambda x: x.title.lower(), reverse=(sort_order == 'desc'))
-    elif sort_by == 'likes':
-        artworks.sort(key=lambda x: len(x.likes), reverse=(sort_order == 'desc'))
-    elif sort_by == 'views':
-        artworks.sort(key=lambda x: x.views, reverse=(sort_order == 'desc'))
-    elif sort_by == 'points':
-        artworks.sort(key=lambda x: x.points_received, reverse=(sort_order == 'desc'))
-    else:  # 'recent' por defecto
-        artworks.sort(key=lambda x: x.created_at, reverse=(sort_order == 'desc'))
-    
+    for artwork in sirope.find_many_by_ids(artwork_ids, Artwork):
+        if artwork.author_id and get_user(artwork.author_id):
+            artworks.append(artwork)
+
+    # Dependencias de la página cacheada, consultadas en un único HMGET
+    fragment_cache.depend(Artwork, *artworks)
+
+    # Cursor para que el scroll infinito continúe tras el último artwork de la página
+    has_next = page * per_page < total
+    next_cursor = None
+    if has_next and artwork_ids:
+        next_cursor = ranking.cursor_for(sort_by, artwork_ids[-1], search_query, search_type)
+
     search_performed = bool(search_query)
-    return render_template('explore.html', 
-                         title='Explorar', 
+    return render_template('explore.html',
+                         title='Explorar',
                          artworks=artworks,
+                         total=total,
+                         page=page,
+                         has_next=has_next,
+                         next_cursor=next_cursor,
+                         tag_cloud=tag_index.tag_cloud(30),
                          search_type=search_type,
                          search_performed=search_performed,
                          sort_by=sort_by,
                          sort_order=sort_order)
 
-@bp.route('/uploads/<filename>')
+def card_data(artwork, author=None) -> dict:
+    """
+    Obtiene los datos compactos de la tarjeta de un artwork
+
+    Args:
+        artwork (Artwork): Artwork a mostrar
+        author (User, optional): Autor ya cargado; si no se indica se busca por author_id
+
+    Returns:
+        dict: Datos necesarios para pintar la tarjeta en el cliente
+    """
+    if author is None and artwork.author_id:
+        author = get_user(artwork.author_id)
+    username = author.username if author else None
+    description = artwork.description or ''
+    return {
+        'id': artwork.id,
+        'title': artwork.title,
+        'description': description[:100] + ('...' if len(description) > 100 else ''),
+        'url': url_for('artwork.view', artwork_id=artwork.id),
+        'image_url': url_for('main.uploaded_file', filename=artwork.thumbnail(640) or artwork.image_path),
+        'width': artwork.width,
+        'height': artwork.height,
+        'placeholder_style': artwork.placeholder_style(),
+        'author': username,
+        'author_url': url_for('auth.user_profile', username=username) if username else None,
+        'tags': artwork.tags,
+        'views': artwork.views,
+        'likes': len(artwork.likes),
+        'comments': len(artwork.comments),
+        'points': artwork.points_received
+    }
+
+@bp.route('/api/explore')
+def api_explore():
+    """
+    API de explorar con paginación por cursor
+
+    Acepta los mismos parámetros de búsqueda y ordenación que /explore,
+    además de cursor (devuelto por la respuesta anterior) y limit.
+
+    Returns:
+        Response: JSON con items, next_cursor (None en la última página) y total
+
+    Note:
+        El tamaño de cada respuesta no depende del tamaño del catálogo: solo
+        se cargan de Sirope los artworks de la página
+    """
+    per_page = current_app.config['EXPLORE_PAGE_SIZE']
+    limit = request.args.get('limit', per_page, type=int) or per_page
+    limit = min(max(limit, 1), current_app.config['EXPLORE_API_MAX_LIMIT'])
+
+    artwork_ids, next_cursor, total = ranking.page_after(sort_by=request.args.get('sort_by', 'recent'),
+                                                         sort_order=request.args.get('sort_order', 'desc'),
+                                                         cursor=request.args.get('cursor'),
+                                                         limit=limit,
+                                                         search_query=request.args.get('q', '').strip(),
+                                                         search_type=request.args.get('search_type', 'all'))
+
+    items = []
+    for artwork in sirope.find_many_by_ids(artwork_ids, Artwork):
+        author = get_user(artwork.author_id) if artwork.author_id else None
+        if author:
+            items.append(card_data(artwork, author))
+
+    return jsonify({
+        'items': items,
+        'next_cursor': next_cursor,
+        'total': total
+    })
+
+@bp.route('/uploads/<path:filename>')
 def uploaded_file(filename):
     """
-    Vista para servir archivos subidos de forma segura
-    
-    Esta vista maneja el acceso a archivos subidos:
-    - Intenta servir desde la carpeta de artworks
-    - Si no existe, intenta desde la carpeta general
-    - Maneja errores de archivos no encontrados
+    Vista para servir las imágenes de los artworks
     
     Args:
-        filename (str): Nombre del archivo solicitado
+        filename (str): Ruta relativa de la imagen (ab/cd/<hash>.ext o nombre antiguo)
         
     Returns:
-        Response: Archivo solicitado o error 404
+        Response: Imagen solicitada o error 404
         
     Note:
-        Verifica la existencia del archivo antes de servirlo
-        Registra errores para archivos no encontrados
+        Las rutas direccionadas por contenido nunca cambian y se sirven con
+        Cache-Control immutable; los nombres antiguos, con caché de un día
     """
-    try:
-        # Primero intentar en la carpeta de artworks
-        return send_from_directory(current_app.config['ARTWORK_IMAGES_FOLDER'], filename)
-    except FileNotFoundError:
-        try:
-            # Si no se encuentra, intentar en la carpeta de uploads general
-            return send_from_directory(os.path.join(current_app.root_path, '..', 'uploads'), filename)
-        except FileNotFoundError:
-            logger.error(f"Archivo no encontrado: {filename}")
-            abort(404)
+    return serve_file(current_app.config['ARTWORK_IMAGES_FOLDER'],
+                      filename,
+                      max_age=current_app.config['UPLOADS_MAX_AGE'],
+                      immutable='/' in filename)
 
-@bp.route('/profile_pictures/<filename>')
+@bp.route('/profile_pictures/<path:filename>')
 def profile_picture(filename):
     """
-    Vista para servir imágenes de perfil de forma segura
+    Vista para servir imágenes de perfil, con la imagen por defecto si no existe
+
+    Args:
+        filename (str): Ruta relativa del avatar (ab/cd/<token>_<lado>.jpg o nombre antiguo)
+
+    Returns:
+        Response: Imagen solicitada o imagen por defecto
+
+    Note:
+        La existencia del archivo se resuelve con el mapa en memoria de
+        AvatarService; los avatares nunca cambian y se sirven immutable
     """
-    try:
-        # Intentar servir la imagen de perfil desde la carpeta de uploads
-        profile_pictures_folder = current_app.config['PROFILE_PICTURES_FOLDER']
-        if filename and os.path.exists(os.path.join(profile_pictures_folder, filename)):
-            logger.info(f"Sirviendo imagen de perfil: {filename}")
-            return send_from_directory(profile_pictures_folder, filename)
-        
-        # Si no se encuentra, servir la imagen por defecto
-        logger.warning(f"Imagen de perfil no encontrada: {filename}, usando imagen por defecto")
-        return send_from_directory(os.path.join(current_app.root_path, 'static', 'img'), 'default.jpg')
-    except Exception as e:
-        logger.error(f"Error al servir imagen de perfil {filename}: {str(e)}")
-        return send_from_directory(os.path.join(current_app.root_path, 'static', 'img'), 'default.jpg') 
\ No newline at end of file
+    folder = current_app.config['PROFILE_PICTURES_FOLDER']
+    if avatars.exists(filename, folder):
+        try:
+            return serve_file(folder,
+                              filename,
+                              max_age=current_app.config['UPLOADS_MAX_AGE'],
+                              immutable='/' in filename)
+        except NotFound:
+            pass
+    logger.warning(f"Imagen de perfil no encontrada: {filename}, usando imagen por defecto")
+    return serve_file(os.path.join(current_app.root_path, 'static', 'img'),
+                      'default.jpg',
+                      max_age=current_app.config['SEND_FILE_MAX_AGE_DEFAULT'])
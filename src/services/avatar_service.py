@@ -0,0 +1,217 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+from PIL import Image, ImageOps
+from .storage_service import ImageStorageService
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+def process_avatar(path: str, upload_folder: str) -> Optional[dict]:
+    """
+    Genera los avatares de una imagen de perfil guardada (se ejecuta en un proceso del pool)
+
+    Args:
+        path (str): Ruta de la imagen original
+        upload_folder (str): Carpeta de imágenes de perfil
+
+    Returns:
+        dict|None: Avatares por lado o None si falla
+    """
+    return AvatarService().create(path, upload_folder)
+
+class AvatarService:
+    """
+    Avatares cuadrados de tamaño fijo y caché de su existencia en disco
+
+    Cada imagen de perfil se recorta al cuadrado central y se guarda en
+    AVATAR_SIZES lados como <ab>/<cd>/<token>_<lado>.jpg. El token es
+    aleatorio y nunca se reutiliza, por lo que los archivos no cambian de
+    contenido y se sirven con caché immutable.
+
+    El servicio mantiene en memoria los archivos que existen en la carpeta
+    de imágenes de perfil (se recorre una vez por proceso), de modo que la
+    imagen por defecto se resuelve sin consultar el disco en cada petición.
+
+    Note:
+        Los archivos que no están en el mapa se comprueban en disco y el
+        resultado negativo se recuerda MISSING_TTL segundos, por si otro
+        proceso acaba de guardarlos
+    """
+
+    _instance = None
+
+    MISSING_TTL = 60
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AvatarService, cls).__new__(cls)
+            cls._lock = threading.Lock()
+            cls._known = set()
+            cls._missing = {}
+            cls._scanned_folder = None
+            cls.sizes = tuple(sorted(Config.AVATAR_SIZES))
+            cls.quality = Config.AVATAR_QUALITY
+        return cls._instance
+
+    def create(self, source, upload_folder: str) -> Optional[dict]:
+        """
+        Genera los avatares de una imagen subida
+
+        Args:
+            source (FileStorage|str): Imagen subida, ya validada por su cabecera,
+                o ruta de una imagen de perfil antigua
+            upload_folder (str): Carpeta de imágenes de perfil
+
+        Returns:
+            dict|None: Avatares por lado ('48' -> ruta relativa) o None si falla
+        """
+        avatars = {}
+        try:
+            largest = self.sizes[-1]
+            with Image.open(getattr(source, 'stream', source)) as original:
+                original.draft('RGB', (largest, largest))
+                image = ImageOps.exif_transpose(original)
+                image.load()
+
+            # Recortar el cuadrado central
+            side = min(image.width, image.height)
+            left = (image.width - side) // 2
+            top = (image.height - side) // 2
+            square = image.crop((left, top, left + side, top + side))
+
+            if square.mode in ('RGBA', 'LA') or (square.mode == 'P' and 'transparency' in square.info):
+                square = square.convert('RGBA')
+                background = Image.new('RGB', square.size, (255, 255, 255))
+                background.paste(square, mask=square.getchannel('A'))
+                square = background
+            else:
+                square = square.convert('RGB')
+
+            token = uuid.uuid4().hex
+            for size in self.sizes:
+                relative_path = ImageStorageService.shard_path(token, f"_{size}.jpg")
+                path = ImageStorageService.absolute_path(relative_path, upload_folder)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                resized = square.resize((size, size), Image.LANCZOS)
+                resized.save(path, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+                avatars[str(size)] = relative_path
+
+            with self._lock:
+                self._known.update(avatars.values())
+                for relative_path in avatars.values():
+                    self._missing.pop(relative_path, None)
+            logger.info(f"Avatares generados: {token} ({len(avatars)} tamaños)")
+            return avatars
+        except Exception as e:
+            logger.error(f"Error al generar los avatares: {e}")
+            self.remove_files(list(avatars.values()), upload_folder)
+            return None
+
+    def delete(self, user, upload_folder: str) -> None:
+        """
+        Elimina los archivos de la imagen de perfil de un usuario
+
+        Args:
+            user (User): Usuario cuya imagen se sustituye
+            upload_folder (str): Carpeta de imágenes de perfil
+        """
+        names = list((getattr(user, 'avatars', None) or {}).values())
+        legacy = getattr(user, 'profile_picture', None)
+        if legacy and legacy not in names:
+            names.append(legacy)
+        self.remove_files(names, upload_folder)
+
+    def remove_files(self, names, upload_folder: str) -> None:
+        """Borra archivos de la carpeta y los quita del mapa en memoria"""
+        for name in names:
+            try:
+                path = ImageStorageService.absolute_path(name, upload_folder)
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar la imagen de perfil {name}: {e}")
+            with self._lock:
+                self._known.discard(name)
+
+    def _scan(self, upload_folder: str) -> None:
+        """Carga en memoria los archivos existentes la primera vez que se consulta la carpeta"""
+        with self._lock:
+            if self._scanned_folder == upload_folder:
+                return
+            known = set()
+            for root, _, files in os.walk(upload_folder):
+                relative_root = os.path.relpath(root, upload_folder)
+                for name in files:
+                    if name.startswith('temp_'):
+                        continue
+                    relative = name if relative_root == '.' else f"{relative_root}/{name}"
+                    known.add(relative.replace(os.sep, '/'))
+            type(self)._known = known
+            type(self)._missing = {}
+            type(self)._scanned_folder = upload_folder
+            logger.info(f"Mapa de imágenes de perfil cargado: {len(known)} archivos")
+
+    def exists(self, filename: Optional[str], upload_folder: str) -> bool:
+        """
+        Comprueba si existe un archivo de imagen de perfil
+
+        Args:
+            filename (str): Ruta relativa del archivo
+            upload_folder (str): Carpeta de imágenes de perfil
+
+        Returns:
+            bool: True si el archivo existe
+        """
+        if not filename:
+            return False
+        try:
+            self._scan(upload_folder)
+            if filename in self._known:
+                return True
+            checked_at = self._missing.get(filename)
+            if checked_at and time.monotonic() - checked_at < self.MISSING_TTL:
+                return False
+
+            found = os.path.isfile(ImageStorageService.absolute_path(filename, upload_folder))
+            with self._lock:
+                if found:
+                    self._known.add(filename)
+                    self._missing.pop(filename, None)
+                else:
+                    self._missing[filename] = time.monotonic()
+            return found
+        except Exception as e:
+            logger.error(f"Error al comprobar la imagen de perfil {filename}: {e}")
+            return False
+
+    def pick(self, user, size: int, upload_folder: str) -> Optional[str]:
+        """
+        Elige el archivo de avatar de un usuario para un tamaño de presentación
+
+        Args:
+            user (User): Usuario
+            size (int): Lado en píxeles CSS con el que se muestra
+            upload_folder (str): Carpeta de imágenes de perfil
+
+        Returns:
+            str|None: Ruta relativa del archivo o None para usar la imagen por defecto
+
+        Note:
+            Se elige el menor avatar que cubre pantallas de densidad 2x; las
+            imágenes antiguas sin avatares se usan si existen en disco
+        """
+        if not user:
+            return None
+        avatars = getattr(user, 'avatars', None) or {}
+        if avatars:
+            sides = sorted(int(side) for side in avatars)
+            chosen = next((side for side in sides if side >= size * 2), sides[-1])
+            return avatars[str(chosen)]
+        legacy = getattr(user, 'profile_picture', None)
+        if self.exists(legacy, upload_folder):
+            return legacy
+        return None
@@ -0,0 +1,226 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional
+from .sirope_service import SiropeService
+from .image_worker import ImageProcessingService, process_image
+from .avatar_service import AvatarService, process_avatar
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+def _lower_priority(niceness: int) -> None:
+    """Inicializador del pool: baja la prioridad de los procesos de la tarea"""
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError):
+        pass
+
+class BackfillService:
+    """
+    Generación en lote de los derivados de imágenes anteriores al pipeline
+
+    Recorre en streaming los artworks (miniaturas y metadatos) y los
+    usuarios con imagen de perfil antigua (avatares), procesa las imágenes en
+    un pool de procesos propio y guarda el progreso en Redis:
+    - artshare:backfill:<tipo>:done: set con los IDs ya procesados
+    - artshare:backfill:<tipo>:stats: hash con los contadores de la ejecución
+
+    Una ejecución interrumpida continúa donde se quedó, saltando los IDs
+    del set. Para no dejar sin recursos al tráfico de producción, los
+    procesos trabajan con prioridad reducida (nice), el número de imágenes
+    en vuelo está acotado y el ritmo de envío puede limitarse.
+
+    Note:
+        Importa los modelos de forma dinámica para evitar ciclos
+    """
+
+    _instance = None
+    _redis = None
+
+    KEY_PREFIX = 'artshare:backfill'
+    KINDS = ('artworks', 'avatars')
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(BackfillService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+        return cls._instance
+
+    def _done_key(self, kind: str) -> str:
+        """Obtiene la clave del set de IDs procesados de un tipo"""
+        return f"{self.KEY_PREFIX}:{kind}:done"
+
+    def _stats_key(self, kind: str) -> str:
+        """Obtiene la clave del hash de contadores de un tipo"""
+        return f"{self.KEY_PREFIX}:{kind}:stats"
+
+    def reset(self, kind: str) -> None:
+        """Descarta el progreso guardado para empezar desde el principio"""
+        self._redis.delete(self._done_key(kind), self._stats_key(kind))
+
+    def progress(self, kind: str) -> dict:
+        """
+        Obtiene los contadores guardados de un tipo
+
+        Returns:
+            dict: processed, restored, skipped, failed y done (IDs marcados como terminados)
+        """
+        try:
+            stats = {key.decode('utf-8'): int(value)
+                     for key, value in self._redis.hgetall(self._stats_key(kind)).items()}
+            stats['done'] = self._redis.scard(self._done_key(kind))
+            return stats
+        except Exception as e:
+            logger.error(f"Error al leer el progreso del backfill de {kind}: {e}")
+            return {}
+
+    @staticmethod
+    def artwork_needs_processing(artwork) -> bool:
+        """Indica si a un artwork le faltan miniaturas o metadatos"""
+        return bool(getattr(artwork, 'image_path', None)) and not (
+            getattr(artwork, 'thumbnails', None)
+            and getattr(artwork, 'placeholder', None)
+            and getattr(artwork, 'width', None)
+        )
+
+    @staticmethod
+    def user_needs_processing(user) -> bool:
+        """Indica si un usuario tiene imagen de perfil antigua sin avatares"""
+        return bool(getattr(user, 'profile_picture', None)) and not getattr(user, 'avatars', None)
+
+    def _tasks(self, kind: str, artworks_folder: str, avatars_folder: str, force: bool):
+        """
+        Genera las tareas pendientes de un tipo sin cargar todo el catálogo
+
+        Yields:
+            tuple: (ID, función, argumentos)
+        """
+        from ..artwork.model import Artwork
+        from ..auth.user_model import User
+
+        done_key = self._done_key(kind)
+        if kind == 'artworks':
+            args = (tuple(Config.THUMBNAIL_SIZES), Config.THUMBNAIL_QUALITY)
+            for artwork in SiropeService().iter_all(Artwork):
+                artwork_id = str(artwork.id)
+                if self._redis.sismember(done_key, artwork_id):
+                    continue
+                if not force and getattr(artwork, '_derivatives_restored', False):
+                    # Ya se procesó pero un guardado concurrente perdió el resultado: basta con guardarlo
+                    SiropeService().save(artwork)
+                    self._mark(kind, artwork_id, 'restored')
+                    continue
+                if not force and not self.artwork_needs_processing(artwork):
+                    self._mark(kind, artwork_id, 'skipped')
+                    continue
+                yield artwork_id, process_image, (artwork.image_path, artworks_folder) + args
+        else:
+            for user in SiropeService().iter_all(User):
+                user_id = str(user.id)
+                if self._redis.sismember(done_key, user_id):
+                    continue
+                if not self.user_needs_processing(user):
+                    self._mark(kind, user_id, 'skipped')
+                    continue
+                path = os.path.join(avatars_folder, *user.profile_picture.split('/'))
+                yield user_id, process_avatar, (path, avatars_folder)
+
+    def _mark(self, kind: str, object_id: str, outcome: str) -> None:
+        """Guarda el resultado de un ID en el checkpoint"""
+        pipe = self._redis.pipeline()
+        pipe.sadd(self._done_key(kind), object_id)
+        pipe.hincrby(self._stats_key(kind), outcome, 1)
+        pipe.execute()
+
+    def _apply(self, kind: str, object_id: str, task_args: tuple, result, avatars_folder: str) -> bool:
+        """
+        Guarda el resultado de una tarea en su objeto
+
+        Returns:
+            bool: True si el resultado era válido y se guardó
+        """
+        from ..auth.user_model import User
+
+        if kind == 'artworks':
+            filename, artworks_folder = task_args[0], task_args[1]
+            if not result or not result.get('thumbnails'):
+                return False
+            ImageProcessingService().apply_result(object_id, filename, artworks_folder, result)
+            return True
+
+        if not result:
+            return False
+        sirope = SiropeService()
+        user = sirope.find_by_id(object_id, User)
+        if user is None or getattr(user, 'avatars', None):
+            # El usuario ya no existe o ha subido otra imagen mientras tanto
+            AvatarService().remove_files(list(result.values()), avatars_folder)
+            return True
+        legacy = user.profile_picture
+        user.avatars = result
+        user.profile_picture = result[max(result, key=int)]
+        sirope.save(user)
+        AvatarService().remove_files([legacy], avatars_folder)
+        return True
+
+    def run(self, kind: str, artworks_folder: str, avatars_folder: str,
+            workers: Optional[int] = None, rate: float = 0, force: bool = False,
+            report=None) -> dict:
+        """
+        Procesa los derivados pendientes de un tipo
+
+        Args:
+            kind (str): 'artworks' o 'avatars'
+            artworks_folder (str): Carpeta de imágenes de artworks
+            avatars_folder (str): Carpeta de imágenes de perfil
+            workers (int, optional): Procesos del pool (por defecto la mitad de los núcleos)
+            rate (float): Máximo de imágenes por segundo (0 = sin límite)
+            force (bool): Regenerar también los artworks que ya tienen derivados
+            report (callable, optional): Función que recibe el progreso cada BACKFILL_REPORT_EVERY imágenes
+
+        Returns:
+            dict: Contadores de la ejecución (processed, failed)
+        """
+        workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        max_pending = workers * 2
+        interval = 1.0 / rate if rate else 0
+        counts = {'processed': 0, 'failed': 0}
+        pending = {}
+
+        def collect(futures):
+            for future in futures:
+                object_id, task_args = pending.pop(future)
+                try:
+                    ok = self._apply(kind, object_id, task_args, future.result(), avatars_folder)
+                except Exception as e:
+                    logger.error(f"Error en el backfill de {kind} {object_id}: {e}")
+                    ok = False
+                outcome = 'processed' if ok else 'failed'
+                counts[outcome] += 1
+                self._mark(kind, object_id, outcome)
+                finished = counts['processed'] + counts['failed']
+                if report and finished % Config.BACKFILL_REPORT_EVERY == 0:
+                    report(dict(counts))
+
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_lower_priority,
+                                 initargs=(Config.BACKFILL_NICE,)) as executor:
+            last_submit = 0.0
+            for object_id, function, task_args in self._tasks(kind, artworks_folder, avatars_folder, force):
+                # Limitar las imágenes en vuelo: no se lee más catálogo del que se procesa
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                if interval:
+                    delay = last_submit + interval - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    last_submit = time.monotonic()
+                pending[executor.submit(function, *task_args)] = (object_id, task_args)
+            if pending:
+                collect(wait(pending).done)
+
+        logger.info(f"Backfill de {kind} terminado: {counts}")
+        return counts
@@ -0,0 +1,104 @@
+import json
+import logging
+import time
+from typing import Callable, Iterator, List, Tuple
+from .sirope_service import SiropeService
+from .conversation_service import ConversationService
+
+logger = logging.getLogger(__name__)
+
+class ChatStreamService:
+    """
+    Entrega en tiempo real de los mensajes de chat con Redis pub/sub y SSE
+
+    Cada conversación tiene un canal artshare:chat:<min>:<max> en el que
+    send_message publica los mensajes nuevos. El endpoint de streaming se
+    suscribe al canal y los reenvía al navegador como Server-Sent Events.
+
+    Note:
+        Cada stream ocupa una conexión mientras está abierto, así que se
+        cierra tras MAX_STREAM_SECONDS; EventSource se reconecta solo y envía
+        Last-Event-ID para recuperar lo publicado entre medias
+    """
+
+    _instance = None
+    _redis = None
+
+    CHANNEL_PREFIX = 'artshare:chat'
+    HEARTBEAT_SECONDS = 15  # Comentario periódico para mantener viva la conexión
+    MAX_STREAM_SECONDS = 300
+    RETRY_MILLISECONDS = 3000
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ChatStreamService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+        return cls._instance
+
+    def channel(self, first_id: str, second_id: str) -> str:
+        """Obtiene el canal pub/sub de la conversación entre dos usuarios"""
+        low, high = ConversationService.participants(first_id, second_id)
+        return f"{self.CHANNEL_PREFIX}:{low}:{high}"
+
+    def publish(self, first_id: str, second_id: str, event_id: str, payload: dict) -> int:
+        """
+        Publica un evento en el canal de una conversación
+
+        Args:
+            first_id (str): ID de un participante
+            second_id (str): ID del otro participante
+            event_id (str): ID del evento (el del mensaje)
+            payload (dict): Datos serializables del evento
+
+        Returns:
+            int: Número de suscriptores que lo han recibido
+        """
+        try:
+            event = json.dumps({'id': str(event_id), 'data': payload})
+            return self._redis.publish(self.channel(first_id, second_id), event)
+        except Exception as e:
+            logger.error(f"Error al publicar el evento {event_id} entre {first_id} y {second_id}: {e}")
+            return 0
+
+    @staticmethod
+    def _format(event_id: str, payload) -> str:
+        """Serializa un evento en formato SSE"""
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        return f"id: {event_id}\ndata: {data}\n\n"
+
+    def events(self, first_id: str, second_id: str,
+               backlog: Callable[[], List[Tuple[str, dict]]]) -> Iterator[str]:
+        """
+        Genera el stream SSE de una conversación
+
+        Args:
+            first_id (str): ID de un participante
+            second_id (str): ID del otro participante
+            backlog (callable): Devuelve los eventos (ID, datos) perdidos desde la
+                última conexión; se llama ya suscrito para no perder ninguno
+
+        Yields:
+            str: Fragmentos del stream text/event-stream
+        """
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self.channel(first_id, second_id))
+            yield f"retry: {self.RETRY_MILLISECONDS}\n\n"
+            for event_id, payload in backlog():
+                yield self._format(event_id, payload)
+
+            deadline = time.monotonic() + self.MAX_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                message = pubsub.get_message(timeout=self.HEARTBEAT_SECONDS)
+                if message is None:
+                    yield ": ping\n\n"
+                    continue
+                event = json.loads(message['data'])
+                yield self._format(event['id'], event['data'])
+        except Exception as e:
+            logger.error(f"Error en el stream de la conversación {first_id} - {second_id}: {e}")
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
@@ -0,0 +1,409 @@
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from .sirope_service import SiropeService
+
+logger = logging.getLogger(__name__)
+
+class ConversationService:
+    """
+    Índice de mensajes por conversación y bandeja de entrada mantenidos en Redis
+
+    Estructura de claves:
+    - artshare:conv:<min>:<max>: sorted set ID de mensaje -> marca de tiempo,
+      donde <min> y <max> son los IDs numéricos de los dos participantes
+    - artshare:inbox:<id>: sorted set interlocutor -> marca de tiempo del último mensaje
+    - artshare:unread:<id>: hash interlocutor -> mensajes recibidos sin leer
+    - artshare:read:<id>: hash interlocutor -> marca de tiempo hasta la que ha leído
+    - artshare:conv:built: marca de la última reconstrucción completa
+    - artshare:conv:lock: cerrojo (SET NX EX) de la reconstrucción en curso
+
+    Note:
+        La clave de una conversación es la misma sea quien sea el emisor, de
+        modo que el historial se lee sin recorrer los mensajes de otros usuarios
+    """
+
+    _instance = None
+    _redis = None
+
+    KEY_PREFIX = 'artshare:conv'
+    INBOX_PREFIX = 'artshare:inbox'
+    UNREAD_PREFIX = 'artshare:unread'
+    READ_PREFIX = 'artshare:read'
+    BUILT_KEY = 'artshare:conv:built'
+    LOCK_KEY = 'artshare:conv:lock'
+    LOCK_SECONDS = 600  # Caducidad del cerrojo si el proceso que reconstruye muere
+    TEMP_PREFIX = 'artshare:rebuild:conv'  # Las claves se construyen como <prefijo>:<clave definitiva>
+    BATCH_SIZE = 500  # Mensajes escritos por pipeline durante la reconstrucción
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ConversationService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+        return cls._instance
+
+    @staticmethod
+    def participants(first_id: str, second_id: str) -> Tuple[str, str]:
+        """
+        Ordena los IDs de dos participantes de forma canónica
+
+        Returns:
+            tuple: (menor ID, mayor ID), comparando numéricamente si es posible
+        """
+        first_id = str(first_id).split('@')[-1]
+        second_id = str(second_id).split('@')[-1]
+        if first_id.isdigit() and second_id.isdigit():
+            ordered = sorted((first_id, second_id), key=int)
+        else:
+            ordered = sorted((first_id, second_id))
+        return ordered[0], ordered[1]
+
+    def conversation_key(self, first_id: str, second_id: str) -> str:
+        """Obtiene la clave del sorted set de mensajes entre dos usuarios"""
+        low, high = self.participants(first_id, second_id)
+        return f"{self.KEY_PREFIX}:{low}:{high}"
+
+    def _inbox_key(self, user_id: str) -> str:
+        """Obtiene la clave de la bandeja de entrada de un usuario"""
+        return f"{self.INBOX_PREFIX}:{user_id}"
+
+    def _unread_key(self, user_id: str) -> str:
+        """Obtiene la clave del hash de mensajes sin leer de un usuario"""
+        return f"{self.UNREAD_PREFIX}:{user_id}"
+
+    def _read_key(self, user_id: str) -> str:
+        """Obtiene la clave del hash de marcas de lectura de un usuario"""
+        return f"{self.READ_PREFIX}:{user_id}"
+
+    @staticmethod
+    def _score(message) -> float:
+        """Obtiene la puntuación de un mensaje: su fecha de creación (UTC) en segundos desde epoch"""
+        created_at = getattr(message, 'created_at', None)
+        if not isinstance(created_at, datetime):
+            return 0.0
+        # created_at es naive en UTC; sin tzinfo timestamp() lo interpretaría como hora local
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return created_at.timestamp()
+
+    def index_message(self, message) -> bool:
+        """
+        Añade un mensaje guardado a su conversación
+
+        Args:
+            message (Message): Mensaje con ID asignado
+
+        Returns:
+            bool: True si se indexó correctamente
+        """
+        try:
+            if not message or not message.id or not message.sender_id or not message.receiver_id:
+                return False
+            key = self.conversation_key(message.sender_id, message.receiver_id)
+            self._redis.zadd(key, {str(message.id): self._score(message)})
+            return True
+        except Exception as e:
+            logger.error(f"Error al indexar el mensaje {getattr(message, 'id', None)}: {e}")
+            return False
+
+    def add_message(self, message) -> bool:
+        """
+        Registra un mensaje recién enviado en su conversación y en las bandejas
+
+        Args:
+            message (Message): Mensaje con ID asignado
+
+        Returns:
+            bool: True si se registró correctamente
+
+        Note:
+            Actualiza la conversación, la posición del interlocutor en la
+            bandeja de ambos usuarios y el contador de no leídos del receptor
+        """
+        try:
+            if not message or not message.id or not message.sender_id or not message.receiver_id:
+                return False
+            sender_id, receiver_id = (str(value).split('@')[-1] for value in (message.sender_id, message.receiver_id))
+            score = self._score(message)
+            pipe = self._redis.pipeline()
+            pipe.zadd(self.conversation_key(sender_id, receiver_id), {str(message.id): score})
+            pipe.zadd(self._inbox_key(sender_id), {receiver_id: score})
+            pipe.zadd(self._inbox_key(receiver_id), {sender_id: score})
+            pipe.hincrby(self._unread_key(receiver_id), sender_id, 1)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error al registrar el mensaje {getattr(message, 'id', None)}: {e}")
+            return False
+
+    def mark_read(self, user_id: str, other_id: str) -> None:
+        """
+        Marca como leída una conversación completa
+
+        Args:
+            user_id (str): ID del usuario que lee
+            other_id (str): ID del interlocutor
+
+        Note:
+            No modifica los mensajes: lleva la marca de lectura del usuario
+            hasta la puntuación del último mensaje de la conversación y pone
+            a cero su contador en una sola transacción, sea cual sea el
+            número de mensajes pendientes. La conversación se vigila con
+            WATCH para que un mensaje que llegue entre medias siga sin leer
+        """
+        try:
+            user_id, other_id = str(user_id), str(other_id)
+            conversation_key = self.conversation_key(user_id, other_id)
+
+            def advance(pipe):
+                newest = pipe.zrange(conversation_key, -1, -1, withscores=True)
+                pipe.multi()
+                if newest:
+                    pipe.hset(self._read_key(user_id), other_id, newest[0][1])
+                pipe.hdel(self._unread_key(user_id), other_id)
+
+            self._redis.transaction(advance, conversation_key)
+        except Exception as e:
+            logger.error(f"Error al marcar como leída la conversación {user_id} - {other_id}: {e}")
+
+    def read_watermark(self, user_id: str, other_id: str) -> float:
+        """Obtiene la marca de tiempo hasta la que un usuario ha leído una conversación"""
+        try:
+            value = self._redis.hget(self._read_key(str(user_id)), str(other_id))
+            return float(value) if value is not None else 0.0
+        except Exception as e:
+            logger.error(f"Error al obtener la marca de lectura {user_id} - {other_id}: {e}")
+            return 0.0
+
+    def is_read(self, message) -> bool:
+        """Indica si el receptor ya ha leído un mensaje"""
+        if getattr(message, 'read', False):
+            return True
+        receiver_id = str(message.receiver_id).split('@')[-1]
+        sender_id = str(message.sender_id).split('@')[-1]
+        return self._score(message) <= self.read_watermark(receiver_id, sender_id)
+
+    def recent(self, user_id: str, limit: int = 10) -> List[Tuple[str, Optional[str], int]]:
+        """
+        Obtiene las conversaciones más recientes de un usuario
+
+        Args:
+            user_id (str): ID del usuario
+            limit (int): Número máximo de conversaciones
+
+        Returns:
+            list: (ID del interlocutor, ID del último mensaje, no leídos), de la más reciente a la más antigua
+        """
+        try:
+            self.ensure_built()
+            user_id = str(user_id)
+            others = [member.decode('utf-8') for member in self._redis.zrevrange(self._inbox_key(user_id), 0, limit - 1)]
+            if not others:
+                return []
+            pipe = self._redis.pipeline()
+            pipe.hmget(self._unread_key(user_id), others)
+            for other_id in others:
+                pipe.zrange(self.conversation_key(user_id, other_id), -1, -1)
+            unread, *last = pipe.execute()
+            return [
+                (other_id, members[0].decode('utf-8') if members else None, int(count or 0))
+                for other_id, count, members in zip(others, unread, last)
+            ]
+        except Exception as e:
+            logger.error(f"Error al obtener las conversaciones recientes del usuario {user_id}: {e}")
+            return []
+
+    def message_ids(self, first_id: str, second_id: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Obtiene los IDs de los mensajes de una conversación en orden cronológico
+
+        Args:
+            first_id (str): ID de un participante
+            second_id (str): ID del otro participante
+            limit (int, optional): Devolver solo los últimos mensajes
+
+        Returns:
+            list: IDs del más antiguo al más reciente
+        """
+        try:
+            self.ensure_built()
+            key = self.conversation_key(first_id, second_id)
+            start = -limit if limit else 0
+            return [member.decode('utf-8') for member in self._redis.zrange(key, start, -1)]
+        except Exception as e:
+            logger.error(f"Error al obtener los mensajes entre {first_id} y {second_id}: {e}")
+            return []
+
+    def message_ids_before(self, first_id: str, second_id: str, message_id: str,
+                           limit: int = 50) -> Tuple[List[str], bool]:
+        """
+        Obtiene una página de mensajes anteriores a uno dado
+
+        Args:
+            first_id (str): ID de un participante
+            second_id (str): ID del otro participante
+            message_id (str): ID del mensaje más antiguo ya mostrado (cursor)
+            limit (int): Tamaño de la página
+
+        Returns:
+            tuple: (IDs en orden cronológico, True si quedan mensajes más antiguos)
+
+        Note:
+            El cursor se resuelve por posición en el sorted set, de modo que
+            los mensajes con la misma marca de tiempo no se saltan ni se repiten
+        """
+        try:
+            key = self.conversation_key(first_id, second_id)
+            rank = self._redis.zrank(key, str(message_id))
+            if not rank:
+                return [], False
+            start = max(0, rank - limit)
+            ids = self._redis.zrange(key, start, rank - 1)
+            return [member.decode('utf-8') for member in ids], start > 0
+        except Exception as e:
+            logger.error(f"Error al obtener los mensajes anteriores a {message_id}: {e}")
+            return [], False
+
+    def message_count(self, first_id: str, second_id: str) -> int:
+        """Obtiene el número de mensajes de una conversación"""
+        try:
+            return self._redis.zcard(self.conversation_key(first_id, second_id))
+        except Exception as e:
+            logger.error(f"Error al contar los mensajes entre {first_id} y {second_id}: {e}")
+            return 0
+
+    def message_ids_after(self, first_id: str, second_id: str, message_id: str, limit: int = 50) -> List[str]:
+        """
+        Obtiene los IDs de los mensajes posteriores a uno dado
+
+        Args:
+            first_id (str): ID de un participante
+            second_id (str): ID del otro participante
+            message_id (str): ID del último mensaje recibido
+            limit (int): Número máximo de resultados
+
+        Returns:
+            list: IDs en orden cronológico, vacía si el mensaje no está en la conversación
+
+        Note:
+            Como en message_ids_before, el cursor se resuelve por posición para
+            no perder los mensajes con la misma marca de tiempo que el cursor
+        """
+        try:
+            key = self.conversation_key(first_id, second_id)
+            rank = self._redis.zrank(key, str(message_id))
+            if rank is None:
+                return []
+            ids = self._redis.zrange(key, rank + 1, rank + limit)
+            return [member.decode('utf-8') for member in ids]
+        except Exception as e:
+            logger.error(f"Error al obtener los mensajes posteriores a {message_id}: {e}")
+            return []
+
+    def messages(self, first_id: str, second_id: str, limit: Optional[int] = None) -> list:
+        """
+        Carga los mensajes de una conversación en orden cronológico
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+        """
+        from ..social.models import Message
+
+        ids = self.message_ids(first_id, second_id, limit)
+        return SiropeService().find_many_by_ids(ids, Message)
+
+    def ensure_built(self) -> None:
+        """
+        Reconstruye el índice si todavía no se ha generado
+
+        Note:
+            Solo reconstruye el proceso que obtiene el cerrojo; las peticiones
+            concurrentes no esperan y leen el índice tal como esté
+        """
+        try:
+            if not self._redis.exists(self.BUILT_KEY):
+                self.rebuild()
+        except Exception as e:
+            logger.error(f"Error al comprobar el índice de conversaciones: {e}")
+
+    def _temp_key(self, key: str) -> str:
+        """Obtiene la clave temporal en la que se reconstruye una clave del índice"""
+        return f"{self.TEMP_PREFIX}:{key}"
+
+    def _live_key(self, temp_key: bytes) -> str:
+        """Obtiene la clave definitiva que corresponde a una clave temporal"""
+        return temp_key.decode('utf-8')[len(self.TEMP_PREFIX) + 1:]
+
+    def rebuild(self) -> int:
+        """
+        Reconstruye el índice de conversaciones a partir de los mensajes de Sirope
+
+        Returns:
+            int: Número de mensajes indexados, o -1 si ya había otra
+            reconstrucción en curso
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+            Las conversaciones, bandejas y contadores se generan en claves
+            temporales que sustituyen a las definitivas en una sola
+            transacción, así que nunca se leen a medio construir ni se
+            suman dos veces los no leídos. Las marcas de lectura se conservan
+        """
+        from ..social.models import Message
+
+        if not self._redis.set(self.LOCK_KEY, 1, nx=True, ex=self.LOCK_SECONDS):
+            logger.info("Reconstrucción del índice de conversaciones ya en curso")
+            return -1
+
+        try:
+            for key in self._redis.scan_iter(match=f"{self.TEMP_PREFIX}:*", count=500):
+                self._redis.delete(key)
+
+            count = 0
+            pipe = self._redis.pipeline()
+            for message in SiropeService().iter_all(Message):
+                if not message or not message.id or not message.sender_id or not message.receiver_id:
+                    continue
+                sender_id = str(message.sender_id).split('@')[-1]
+                receiver_id = str(message.receiver_id).split('@')[-1]
+                pipe.zadd(self._temp_key(self.conversation_key(sender_id, receiver_id)),
+                          {str(message.id): self._score(message)})
+                if not self.is_read(message):
+                    pipe.hincrby(self._temp_key(self._unread_key(receiver_id)), sender_id, 1)
+                count += 1
+                if count % self.BATCH_SIZE == 0:
+                    pipe.execute()
+            pipe.execute()
+
+            # Las bandejas se derivan del último mensaje de cada conversación
+            prefix_parts = len(self.KEY_PREFIX.split(':'))
+            for key in self._redis.scan_iter(match=self._temp_key(f"{self.KEY_PREFIX}:*:*"), count=500):
+                parts = self._live_key(key).split(':')[prefix_parts:]
+                last = self._redis.zrange(key, -1, -1, withscores=True)
+                if len(parts) != 2 or not last:
+                    continue
+                low, high = parts
+                score = last[0][1]
+                pipe = self._redis.pipeline()
+                pipe.zadd(self._temp_key(self._inbox_key(low)), {high: score})
+                pipe.zadd(self._temp_key(self._inbox_key(high)), {low: score})
+                pipe.execute()
+
+            reserved = {self.BUILT_KEY, self.LOCK_KEY}
+            live_keys = [key for pattern in (f"{self.KEY_PREFIX}:*", f"{self.INBOX_PREFIX}:*", f"{self.UNREAD_PREFIX}:*")
+                         for key in self._redis.scan_iter(match=pattern, count=500)
+                         if key.decode('utf-8') not in reserved]
+            temp_keys = list(self._redis.scan_iter(match=f"{self.TEMP_PREFIX}:*", count=500))
+
+            pipe = self._redis.pipeline(transaction=True)
+            if live_keys:
+                pipe.delete(*live_keys)
+            for key in temp_keys:
+                pipe.rename(key, self._live_key(key))
+            pipe.set(self.BUILT_KEY, datetime.utcnow().isoformat())
+            pipe.execute()
+        finally:
+            self._redis.delete(self.LOCK_KEY)
+
+        logger.info(f"Índice de conversaciones reconstruido: {count} mensajes")
+        return count
@@ -0,0 +1,218 @@
+import logging
+from typing import List, Tuple
+from .sirope_service import SiropeService
+
+logger = logging.getLogger(__name__)
+
+class FollowGraphService:
+    """
+    Grafo de seguimiento entre usuarios mantenido en Redis
+
+    Estructura de claves:
+    - artshare:following:<id>: set con los IDs de usuarios que sigue
+    - artshare:followers:<id>: set con los IDs de usuarios que le siguen
+    - artshare:followers:recent:<id>: lista con los últimos seguidores (más reciente primero)
+    - artshare:follow:migrated: set con los usuarios cuyas listas antiguas ya se migraron
+
+    Las consultas se resuelven con operaciones de conjuntos en Redis:
+    pertenencia con SISMEMBER, contadores con SCARD y amigos (seguimiento
+    mutuo) con SINTER, sin cargar las relaciones en el objeto User.
+
+    Note:
+        Los IDs son siempre la parte numérica del ID de Sirope
+    """
+
+    _instance = None
+    _redis = None
+
+    FOLLOWING_PREFIX = 'artshare:following'
+    FOLLOWERS_PREFIX = 'artshare:followers'
+    RECENT_PREFIX = 'artshare:followers:recent'
+    MIGRATED_KEY = 'artshare:follow:migrated'
+    RECENT_SIZE = 20
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(FollowGraphService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+        return cls._instance
+
+    def following_key(self, user_id: str) -> str:
+        """Obtiene la clave del set de usuarios seguidos"""
+        return f"{self.FOLLOWING_PREFIX}:{user_id}"
+
+    def followers_key(self, user_id: str) -> str:
+        """Obtiene la clave del set de seguidores"""
+        return f"{self.FOLLOWERS_PREFIX}:{user_id}"
+
+    def _recent_key(self, user_id: str) -> str:
+        """Obtiene la clave de la lista de seguidores recientes"""
+        return f"{self.RECENT_PREFIX}:{user_id}"
+
+    @staticmethod
+    def _decode(values) -> List[str]:
+        return [value.decode('utf-8') for value in values]
+
+    def follow(self, follower_id: str, followed_id: str) -> bool:
+        """
+        Registra que un usuario sigue a otro
+
+        Args:
+            follower_id (str): ID del usuario que sigue
+            followed_id (str): ID del usuario seguido
+
+        Returns:
+            bool: True si la relación no existía y se ha creado
+        """
+        try:
+            follower_id, followed_id = str(follower_id), str(followed_id)
+            if not follower_id or not followed_id or follower_id == followed_id:
+                return False
+            pipe = self._redis.pipeline()
+            pipe.sadd(self.following_key(follower_id), followed_id)
+            pipe.sadd(self.followers_key(followed_id), follower_id)
+            added, _ = pipe.execute()
+            if added:
+                recent_key = self._recent_key(followed_id)
+                pipe = self._redis.pipeline()
+                pipe.lrem(recent_key, 0, follower_id)
+                pipe.lpush(recent_key, follower_id)
+                pipe.ltrim(recent_key, 0, self.RECENT_SIZE - 1)
+                pipe.execute()
+            return bool(added)
+        except Exception as e:
+            logger.error(f"Error al registrar el seguimiento {follower_id} -> {followed_id}: {e}")
+            return False
+
+    def unfollow(self, follower_id: str, followed_id: str) -> bool:
+        """
+        Elimina la relación de seguimiento entre dos usuarios
+
+        Args:
+            follower_id (str): ID del usuario que seguía
+            followed_id (str): ID del usuario seguido
+
+        Returns:
+            bool: True si la relación existía y se ha eliminado
+        """
+        try:
+            follower_id, followed_id = str(follower_id), str(followed_id)
+            pipe = self._redis.pipeline()
+            pipe.srem(self.following_key(follower_id), followed_id)
+            pipe.srem(self.followers_key(followed_id), follower_id)
+            pipe.lrem(self._recent_key(followed_id), 0, follower_id)
+            removed, _, _ = pipe.execute()
+            return bool(removed)
+        except Exception as e:
+            logger.error(f"Error al eliminar el seguimiento {follower_id} -> {followed_id}: {e}")
+            return False
+
+    def is_following(self, follower_id: str, followed_id: str) -> bool:
+        """Indica si un usuario sigue a otro"""
+        try:
+            return bool(self._redis.sismember(self.following_key(follower_id), str(followed_id)))
+        except Exception as e:
+            logger.error(f"Error al comprobar el seguimiento {follower_id} -> {followed_id}: {e}")
+            return False
+
+    def relation(self, user_id: str, other_id: str) -> Tuple[bool, bool]:
+        """
+        Obtiene la relación entre dos usuarios en una sola ida y vuelta
+
+        Returns:
+            tuple: (user_id sigue a other_id, other_id sigue a user_id)
+        """
+        try:
+            pipe = self._redis.pipeline()
+            pipe.sismember(self.following_key(user_id), str(other_id))
+            pipe.sismember(self.following_key(other_id), str(user_id))
+            follows, followed_by = pipe.execute()
+            return bool(follows), bool(followed_by)
+        except Exception as e:
+            logger.error(f"Error al obtener la relación entre {user_id} y {other_id}: {e}")
+            return False, False
+
+    def counts(self, user_id: str) -> Tuple[int, int]:
+        """
+        Obtiene los contadores de un usuario
+
+        Returns:
+            tuple: (seguidores, seguidos)
+        """
+        try:
+            pipe = self._redis.pipeline()
+            pipe.scard(self.followers_key(user_id))
+            pipe.scard(self.following_key(user_id))
+            followers, following = pipe.execute()
+            return int(followers), int(following)
+        except Exception as e:
+            logger.error(f"Error al contar las relaciones del usuario {user_id}: {e}")
+            return 0, 0
+
+    def following_ids(self, user_id: str) -> List[str]:
+        """Obtiene los IDs de los usuarios que sigue un usuario"""
+        try:
+            return self._decode(self._redis.smembers(self.following_key(user_id)))
+        except Exception as e:
+            logger.error(f"Error al obtener los seguidos del usuario {user_id}: {e}")
+            return []
+
+    def follower_ids(self, user_id: str) -> List[str]:
+        """Obtiene los IDs de los seguidores de un usuario"""
+        try:
+            return self._decode(self._redis.smembers(self.followers_key(user_id)))
+        except Exception as e:
+            logger.error(f"Error al obtener los seguidores del usuario {user_id}: {e}")
+            return []
+
+    def friend_ids(self, user_id: str) -> List[str]:
+        """Obtiene los IDs de los usuarios con seguimiento mutuo (SINTER)"""
+        try:
+            return self._decode(self._redis.sinter(self.following_key(user_id), self.followers_key(user_id)))
+        except Exception as e:
+            logger.error(f"Error al obtener los amigos del usuario {user_id}: {e}")
+            return []
+
+    def recent_follower_ids(self, user_id: str, limit: int = 5) -> List[str]:
+        """Obtiene los IDs de los últimos seguidores, del más reciente al más antiguo"""
+        try:
+            return self._decode(self._redis.lrange(self._recent_key(user_id), 0, limit - 1))
+        except Exception as e:
+            logger.error(f"Error al obtener los seguidores recientes del usuario {user_id}: {e}")
+            return []
+
+    def import_lists(self, user_id: str, following: List[str], followers: List[str]) -> None:
+        """
+        Migra al grafo las listas de seguimiento guardadas en un User antiguo
+
+        Args:
+            user_id (str): ID del usuario
+            following (list): IDs que seguía según la lista antigua
+            followers (list): IDs que le seguían según la lista antigua
+
+        Note:
+            Cada usuario se migra una sola vez: las listas antiguas siguen en
+            el objeto guardado hasta que se vuelve a guardar y no deben
+            restaurar relaciones eliminadas después
+        """
+        try:
+            user_id = str(user_id)
+            if not self._redis.sadd(self.MIGRATED_KEY, user_id):
+                return
+            pipe = self._redis.pipeline()
+            for followed_id in {str(value) for value in following or [] if value}:
+                if followed_id != user_id:
+                    pipe.sadd(self.following_key(user_id), followed_id)
+                    pipe.sadd(self.followers_key(followed_id), user_id)
+            ordered_followers = [str(value) for value in followers or [] if value and str(value) != user_id]
+            for follower_id in set(ordered_followers):
+                pipe.sadd(self.followers_key(user_id), follower_id)
+                pipe.sadd(self.following_key(follower_id), user_id)
+            # Las listas antiguas guardaban el orden de llegada de los seguidores
+            recent = list(dict.fromkeys(reversed(ordered_followers)))[:self.RECENT_SIZE]
+            if recent and not self._redis.exists(self._recent_key(user_id)):
+                pipe.rpush(self._recent_key(user_id), *recent)
+            pipe.execute()
+            logger.info(f"Relaciones del usuario {user_id} migradas al grafo de seguimiento")
+        except Exception as e:
+            logger.error(f"Error al migrar las relaciones del usuario {user_id}: {e}")
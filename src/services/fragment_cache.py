@@ -0,0 +1,240 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Optional
+from urllib.parse import urlencode
+from flask import g, request, session, render_template
+from flask_login import current_user
+from markupsafe import Markup
+from .sirope_service import SiropeService
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+class FragmentCacheService:
+    """
+    Caché de HTML renderizado en dos niveles
+
+    - Nivel 1: LRU en memoria del proceso, limitado en bytes
+    - Nivel 2: Redis (artshare:fragment:<clave>), compartido entre procesos
+
+    Se usa para las tarjetas de artwork, con clave por ID y versión del
+    objeto, y para las páginas completas de visitantes anónimos. Las
+    versiones las incrementa SiropeService al guardar o eliminar, por lo que
+    un fragmento nunca se sirve después de modificar su objeto: la clave
+    cambia y la entrada antigua acaba expirando o saliendo del LRU.
+
+    Note:
+        Las páginas guardan las versiones de los objetos de los que dependen
+        y se validan con un único HMGET antes de servirse
+    """
+
+    _instance = None
+    _redis = None
+
+    KEY_PREFIX = 'artshare:fragment'
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(FragmentCacheService, cls).__new__(cls)
+            cls.sirope = SiropeService()
+            cls._redis = cls.sirope.redis
+            cls._local = OrderedDict()
+            cls._local_bytes = 0
+            cls._lock = threading.Lock()
+            cls.max_bytes = Config.FRAGMENT_CACHE_MAX_BYTES
+            cls.fragment_ttl = Config.FRAGMENT_CACHE_TTL
+            cls.page_ttl = Config.PAGE_CACHE_TTL
+        return cls._instance
+
+    def _local_get(self, key: str) -> Optional[bytes]:
+        """Obtiene un valor del LRU en memoria si no ha expirado"""
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._local[key]
+                self._local_bytes -= len(value)
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key: str, value: bytes, ttl: float) -> None:
+        """Guarda un valor en el LRU en memoria, expulsando los menos usados"""
+        if len(value) > self.max_bytes or ttl <= 0:
+            return
+        with self._lock:
+            old = self._local.pop(key, None)
+            if old is not None:
+                self._local_bytes -= len(old[0])
+            self._local[key] = (value, time.time() + ttl)
+            self._local_bytes += len(value)
+            while self._local_bytes > self.max_bytes:
+                _, (evicted, _) = self._local.popitem(last=False)
+                self._local_bytes -= len(evicted)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Obtiene un fragmento de la caché
+
+        Args:
+            key (str): Clave del fragmento
+
+        Returns:
+            str|None: HTML cacheado o None si no existe
+        """
+        value = self._local_get(key)
+        if value is None:
+            try:
+                pipe = self._redis.pipeline()
+                pipe.get(f"{self.KEY_PREFIX}:{key}")
+                pipe.pttl(f"{self.KEY_PREFIX}:{key}")
+                value, pttl = pipe.execute()
+            except Exception as e:
+                logger.warning(f"Error al leer fragmento {key} de Redis: {e}")
+                return None
+            if value is None:
+                return None
+            self._local_set(key, value, (pttl or 0) / 1000)
+        return value.decode('utf-8')
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        """
+        Guarda un fragmento en ambos niveles de la caché
+
+        Args:
+            key (str): Clave del fragmento
+            value (str): HTML renderizado
+            ttl (int): Segundos de validez
+        """
+        data = value.encode('utf-8')
+        self._local_set(key, data, ttl)
+        try:
+            self._redis.setex(f"{self.KEY_PREFIX}:{key}", ttl, data)
+        except Exception as e:
+            logger.warning(f"Error al guardar fragmento {key} en Redis: {e}")
+
+    def _known_versions(self) -> dict:
+        """Versiones ya consultadas en la petición actual (dependencias de la página)"""
+        if 'fragment_deps' not in g:
+            g.fragment_deps = {}
+        return g.fragment_deps
+
+    def depend(self, *objects) -> None:
+        """
+        Registra objetos o clases de los que depende la página actual
+
+        Args:
+            *objects: Objetos (su versión) o clases (versión de la colección)
+
+        Note:
+            Consulta todas las versiones pendientes en un único HMGET, por lo
+            que conviene llamarlo con todas las tarjetas antes de renderizar
+        """
+        known = self._known_versions()
+        keys = [self.sirope.version_key(obj) for obj in objects if obj is not None]
+        keys = [key for key in dict.fromkeys(keys) if key not in known]
+        known.update(zip(keys, self.sirope.get_versions(keys)))
+
+    def render_card(self, artwork, variant: str = 'explore') -> Markup:
+        """
+        Renderiza la tarjeta de un artwork reutilizando el HTML cacheado
+
+        Args:
+            artwork (Artwork): Artwork a mostrar
+            variant (str): Plantilla artwork/_card_<variant>.html a usar
+
+        Returns:
+            Markup: HTML de la tarjeta
+        """
+        self.depend(artwork)
+        version = self._known_versions().get(self.sirope.version_key(artwork), -1)
+        key = f"card:{variant}:{artwork.id}:{version}"
+
+        # Versión desconocida (Redis no disponible): renderizar sin cachear
+        html = self.get(key) if version >= 0 else None
+        if html is None:
+            html = render_template(f'artwork/_card_{variant}.html', artwork=artwork)
+            if version >= 0:
+                self.set(key, html, self.fragment_ttl)
+        return Markup(html)
+
+    def _page_key(self) -> str:
+        """Clave de la página solicitada, independiente del orden de los parámetros"""
+        return f"page:{request.path}?{urlencode(sorted(request.args.items(multi=True)))}"
+
+    def _page_cacheable(self) -> bool:
+        """Solo se cachean GET de visitantes anónimos sin mensajes flash pendientes"""
+        return (request.method == 'GET'
+                and not current_user.is_authenticated
+                and '_flashes' not in session)
+
+    def get_page(self) -> Optional[str]:
+        """
+        Obtiene la página anónima cacheada si sus dependencias no han cambiado
+
+        Returns:
+            str|None: HTML de la página o None si hay que renderizarla
+        """
+        try:
+            if not self._page_cacheable():
+                return None
+            raw = self.get(self._page_key())
+            if raw is None:
+                return None
+            entry = json.loads(raw)
+            deps = entry.get('deps', {})
+            if self.sirope.get_versions(list(deps)) != list(deps.values()):
+                return None
+            return entry['body']
+        except Exception as e:
+            logger.error(f"Error al leer la página cacheada {request.path}: {e}")
+            return None
+
+    def store_page(self, body: str) -> None:
+        """
+        Guarda la página renderizada junto con las versiones de sus dependencias
+
+        Args:
+            body (str): HTML de la página
+        """
+        try:
+            if not self._page_cacheable():
+                return
+            deps = self._known_versions()
+            if any(version < 0 for version in deps.values()):
+                return
+            self.set(self._page_key(), json.dumps({'body': body, 'deps': deps}), self.page_ttl)
+        except Exception as e:
+            logger.error(f"Error al guardar la página cacheada {request.path}: {e}")
+
+def anonymous_page_cache(view):
+    """
+    Decorador que sirve la página desde la caché a los visitantes anónimos
+
+    Args:
+        view (callable): Vista que devuelve el HTML renderizado
+
+    Returns:
+        callable: Vista envuelta
+
+    Note:
+        Las respuestas que no son HTML renderizado (redirecciones, errores)
+        no se cachean
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = FragmentCacheService()
+        body = cache.get_page()
+        if body is not None:
+            return body
+        response = view(*args, **kwargs)
+        if isinstance(response, str):
+            cache.store_page(response)
+        return response
+    return wrapper
@@ -0,0 +1,238 @@
+import logging
+import os
+import time
+from typing import Optional
+from .sirope_service import SiropeService
+from .storage_service import ImageStorageService
+
+logger = logging.getLogger(__name__)
+
+class UploadsGarbageCollector:
+    """
+    Recolector incremental de archivos huérfanos en las carpetas de subidas
+
+    Cada pasada completa funciona así:
+    1. Construye en Redis un índice con las rutas referenciadas, recorriendo
+       en streaming artworks (imagen y miniaturas) o usuarios (imagen de
+       perfil y avatares): artshare:gc:<tipo>:referenced
+    2. Recorre la carpeta en orden y consulta el índice por lotes
+    3. Borra los archivos no referenciados más antiguos que el periodo de gracia
+
+    La posición del recorrido se guarda en artshare:gc:<tipo>:cursor, de
+    modo que cada ejecución puede limitarse a un número de archivos y la
+    siguiente continúa donde se quedó con el mismo índice. El momento en que
+    empezó a construirse el índice se guarda junto a él (<índice>:built).
+
+    Note:
+        El periodo de gracia protege las subidas en curso y los derivados
+        que aún no se han guardado en su objeto. Se cuenta desde la creación
+        del índice y no desde ahora, porque un archivo subido después no
+        está en él aunque una ejecución posterior lo encuentre ya antiguo.
+        Los archivos direccionados
+        por contenido se comprueban además contra el contador de referencias
+        en vivo, por si una subida idéntica los reutilizó tras crear el índice
+    """
+
+    _instance = None
+    _redis = None
+
+    KEY_PREFIX = 'artshare:gc'
+    KINDS = ('artworks', 'avatars')
+    BATCH_SIZE = 500
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(UploadsGarbageCollector, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+        return cls._instance
+
+    def _index_key(self, kind: str, dry_run: bool = False) -> str:
+        """Obtiene la clave del índice de rutas referenciadas de un tipo (aparte para simulaciones)"""
+        return f"{self.KEY_PREFIX}:{kind}:{'dry-run' if dry_run else 'referenced'}"
+
+    def _built_key(self, index_key: str) -> str:
+        """Obtiene la clave con el momento en que empezó a construirse un índice"""
+        return f"{index_key}:built"
+
+    def _cursor_key(self, kind: str) -> str:
+        """Obtiene la clave de la posición del recorrido de un tipo"""
+        return f"{self.KEY_PREFIX}:{kind}:cursor"
+
+    def _referenced_paths(self, kind: str):
+        """
+        Genera las rutas referenciadas por los objetos de un tipo
+
+        Note:
+            Importa los modelos de forma dinámica para evitar ciclos
+        """
+        from ..artwork.model import Artwork
+        from ..auth.user_model import User
+
+        if kind == 'artworks':
+            for artwork in SiropeService().iter_all(Artwork):
+                if getattr(artwork, 'image_path', None):
+                    yield artwork.image_path
+                for variants in (getattr(artwork, 'thumbnails', None) or {}).values():
+                    yield from (name for name in variants.values() if name)
+        else:
+            for user in SiropeService().iter_all(User):
+                if getattr(user, 'profile_picture', None):
+                    yield user.profile_picture
+                yield from (getattr(user, 'avatars', None) or {}).values()
+
+    def build_index(self, kind: str, index_key: str) -> int:
+        """
+        Reconstruye el índice de rutas referenciadas de un tipo
+
+        Args:
+            kind (str): 'artworks' o 'avatars'
+            index_key (str): Clave del set donde se construye el índice
+
+        Returns:
+            int: Número de rutas indexadas
+
+        Note:
+            Se guarda la hora de inicio, no la de fin: lo subido mientras se
+            recorren los objetos puede no haber entrado en el índice
+        """
+        started_at = time.time()
+        self._redis.delete(index_key, self._built_key(index_key))
+        batch = []
+        for path in self._referenced_paths(kind):
+            batch.append(path)
+            if len(batch) >= self.BATCH_SIZE:
+                self._redis.sadd(index_key, *batch)
+                batch = []
+        if batch:
+            self._redis.sadd(index_key, *batch)
+        self._redis.set(self._built_key(index_key), started_at)
+        count = self._redis.scard(index_key)
+        logger.info(f"Índice de archivos referenciados de {kind}: {count} rutas")
+        return count
+
+    @staticmethod
+    def _walk(folder: str, cursor: tuple, prefix: tuple = ()):
+        """
+        Recorre una carpeta en orden determinista a partir de una posición
+
+        Args:
+            folder (str): Carpeta actual
+            cursor (tuple): Componentes de la última ruta procesada
+            prefix (tuple): Componentes de la carpeta actual respecto a la raíz
+
+        Yields:
+            tuple: (ruta relativa con '/', os.DirEntry)
+
+        Note:
+            Las rutas se comparan por componentes, el mismo orden en que se
+            recorren, y se saltan sin leerlas las carpetas ya procesadas
+        """
+        try:
+            entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            parts = prefix + (entry.name,)
+            if entry.is_dir(follow_symlinks=False):
+                if parts < cursor[:len(parts)]:
+                    continue
+                yield from UploadsGarbageCollector._walk(entry.path, cursor, parts)
+            elif entry.is_file(follow_symlinks=False):
+                if parts <= cursor:
+                    continue
+                yield '/'.join(parts), entry
+
+    def collect(self, kind: str, upload_folder: str, grace_seconds: int,
+                limit: Optional[int] = None, dry_run: bool = False) -> dict:
+        """
+        Ejecuta (o continúa) una pasada del recolector sobre una carpeta
+
+        Args:
+            kind (str): 'artworks' o 'avatars'
+            upload_folder (str): Carpeta de subidas del tipo
+            grace_seconds (int): Antigüedad mínima de un archivo para borrarlo
+            limit (int, optional): Máximo de archivos a revisar en esta ejecución
+            dry_run (bool): Solo informar, sin borrar ni guardar la posición
+
+        Returns:
+            dict: scanned, orphans, deleted, bytes (liberados o liberables) y complete
+        """
+        stats = {'scanned': 0, 'orphans': 0, 'deleted': 0, 'bytes': 0, 'complete': False}
+        cursor_key = self._cursor_key(kind)
+        index_key = self._index_key(kind, dry_run)
+        saved_cursor = None if dry_run else self._redis.get(cursor_key)
+        built_at = self._redis.get(self._built_key(index_key))
+        if saved_cursor is None or built_at is None or not self._redis.exists(index_key):
+            self.build_index(kind, index_key)
+            built_at = self._redis.get(self._built_key(index_key))
+        cursor = ()
+        if saved_cursor is not None:
+            cursor = tuple(saved_cursor.decode('utf-8').split('/'))
+            logger.info(f"Continuando la recolección de {kind} tras {saved_cursor.decode('utf-8')}")
+
+        # Un índice vacío haría huérfanos a todos los archivos: no se borra nada
+        if not self._redis.exists(index_key):
+            logger.warning(f"Índice de archivos de {kind} vacío, se omite la recolección")
+            return stats
+
+        storage = ImageStorageService()
+        # Solo son candidatos los archivos que ya superaban el periodo de gracia al construir el índice
+        deadline = float(built_at) - grace_seconds
+        walker = self._walk(upload_folder, cursor)
+
+        while True:
+            batch = []
+            for item in walker:
+                batch.append(item)
+                if len(batch) >= self.BATCH_SIZE:
+                    break
+            if limit is not None:
+                batch = batch[:max(limit - stats['scanned'], 0)]
+            if not batch:
+                stats['complete'] = limit is None or stats['scanned'] < limit
+                break
+
+            pipe = self._redis.pipeline()
+            for relative_path, _ in batch:
+                pipe.sismember(index_key, relative_path)
+            referenced = pipe.execute()
+
+            for (relative_path, entry), is_referenced in zip(batch, referenced):
+                stats['scanned'] += 1
+                if is_referenced:
+                    continue
+                try:
+                    info = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                if info.st_mtime > deadline:
+                    continue
+                stats['orphans'] += 1
+                if dry_run:
+                    stats['bytes'] += info.st_size
+                    continue
+                if storage.original_candidates(relative_path):
+                    removed = storage.remove_if_unreferenced(relative_path, upload_folder)
+                else:
+                    try:
+                        os.remove(entry.path)
+                        removed = True
+                    except OSError as e:
+                        logger.warning(f"No se pudo borrar el archivo huérfano {relative_path}: {e}")
+                        removed = False
+                if removed:
+                    stats['deleted'] += 1
+                    stats['bytes'] += info.st_size
+                    logger.info(f"Archivo huérfano borrado: {relative_path} ({info.st_size} bytes)")
+
+            if not dry_run:
+                self._redis.set(cursor_key, batch[-1][0])
+            if limit is not None and stats['scanned'] >= limit:
+                break
+
+        if dry_run:
+            self._redis.delete(index_key, self._built_key(index_key))
+        elif stats['complete']:
+            self._redis.delete(cursor_key, index_key, self._built_key(index_key))
+        logger.info(f"Recolección de {kind}: {stats}")
+        return stats
@@ -0,0 +1,157 @@
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from .sirope_service import SiropeService
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+def process_image(filename: str, upload_folder: str, sizes, quality: int) -> dict:
+    """
+    Genera los derivados de una imagen (se ejecuta en un proceso del pool)
+
+    Args:
+        filename (str): Nombre del archivo original
+        upload_folder (str): Carpeta de la imagen
+        sizes (tuple): Anchos de las miniaturas
+        quality (int): Calidad de compresión
+
+    Returns:
+        dict: Atributos del artwork a actualizar con el resultado
+
+    Note:
+        Recibe toda la configuración como argumentos porque los procesos
+        del pool no tienen contexto de aplicación.
+        La imagen se decodifica una sola vez para miniaturas y metadatos
+    """
+    from ..utils.helpers import open_image, generate_thumbnails
+    from ..utils.image_metadata import extract_image_metadata
+
+    try:
+        image, size = open_image(filename, upload_folder, min_side=max(sizes))
+    except Exception as e:
+        logger.error(f"Error al abrir la imagen {filename}: {e}")
+        return {'thumbnails': {}}
+
+    result = extract_image_metadata(image, size)
+    result['thumbnails'] = generate_thumbnails(filename, upload_folder, sizes=sizes, quality=quality, image=image)
+    return result
+
+class ImageProcessingService:
+    """
+    Procesado en segundo plano de las imágenes subidas
+
+    Las subidas guardan solo el original y encolan aquí la generación de
+    miniaturas y metadatos, que se ejecuta en un ProcessPoolExecutor con un
+    proceso por núcleo. Al terminar, el callback actualiza el artwork; hasta
+    entonces las plantillas muestran el original.
+
+    Note:
+        Si el pool no está disponible, la imagen se procesa en el momento
+        para no dejar artworks sin miniaturas
+    """
+
+    _instance = None
+    _executor = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ImageProcessingService, cls).__new__(cls)
+            cls._lock = threading.Lock()
+            cls.max_workers = Config.IMAGE_WORKERS or os.cpu_count() or 1
+        return cls._instance
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Crea el pool de procesos la primera vez que se necesita"""
+        with self._lock:
+            if self._executor is None:
+                type(self)._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                atexit.register(self._executor.shutdown, wait=False)
+                logger.info(f"Pool de procesado de imágenes iniciado con {self.max_workers} procesos")
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        """Descarta un pool roto para recrearlo en el siguiente envío"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                type(self)._executor = None
+
+    def submit(self, artwork_id: str, filename: str, upload_folder: str, sizes, quality: int) -> bool:
+        """
+        Encola el procesado de la imagen de un artwork
+
+        Args:
+            artwork_id (str): ID del artwork a actualizar
+            filename (str): Nombre del archivo original
+            upload_folder (str): Carpeta de la imagen
+            sizes (tuple): Anchos de las miniaturas
+            quality (int): Calidad de compresión
+
+        Returns:
+            bool: True si se encoló, False si se procesó de forma síncrona
+        """
+        args = (filename, upload_folder, tuple(sizes), quality)
+        try:
+            future = self._get_executor().submit(process_image, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.error(f"Pool de imágenes no disponible, procesando {filename} en el momento: {e}")
+            self._reset_executor()
+            self.apply_result(artwork_id, filename, upload_folder, process_image(*args))
+            return False
+
+        def on_done(done):
+            try:
+                self.apply_result(artwork_id, filename, upload_folder, done.result())
+            except Exception as e:
+                logger.error(f"Error al procesar la imagen {filename} del artwork {artwork_id}: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    self._reset_executor()
+
+        future.add_done_callback(on_done)
+        return True
+
+    def apply_result(self, artwork_id: str, filename: str, upload_folder: str, result: Optional[dict]) -> None:
+        """
+        Guarda en el artwork el resultado del procesado
+
+        Args:
+            artwork_id (str): ID del artwork
+            filename (str): Imagen procesada
+            upload_folder (str): Carpeta de la imagen
+            result (dict): Atributos a actualizar
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+            Si el artwork se ha eliminado o su imagen ha cambiado mientras se
+            procesaba, se descartan los derivados generados si ya no se usan.
+            El resultado se guarda antes en ImageStorageService: si una
+            petición que cargó el artwork antes del procesado lo guarda después
+            sin los derivados, Artwork los reaplica al volver a cargarlo
+        """
+        from ..artwork.model import Artwork
+        from .storage_service import ImageStorageService
+
+        if not result:
+            return
+        storage = ImageStorageService()
+        storage.remember_derivatives(filename, result)
+        thumbnails = result.get('thumbnails') or {}
+
+        sirope = SiropeService()
+        artwork = sirope.find_by_id(artwork_id, Artwork)
+        if artwork is None or artwork.image_path != filename:
+            # Los derivados se comparten entre artworks con la misma imagen:
+            # solo se borran si el original ya no está en uso
+            logger.info(f"Descartando derivados obsoletos de {filename} (artwork {artwork_id})")
+            storage.discard_derivatives(filename, upload_folder, thumbnails)
+            return
+
+        for attribute, value in result.items():
+            setattr(artwork, attribute, value)
+        sirope.save(artwork)
+        logger.info(f"Imagen del artwork {artwork_id} procesada: {len(thumbnails)} tamaños")
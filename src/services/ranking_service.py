@@ -0,0 +1,568 @@
+import base64
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+from .sirope_service import SiropeService
+from .tag_service import TagIndexService
+from .search_service import FuzzySearchService
+
+logger = logging.getLogger(__name__)
+
+class RankingService:
+    """
+    Índices de ordenación de artworks mantenidos en Redis
+
+    Cada criterio de ordenación de explore tiene su propio sorted set
+    (artshare:rank:<criterio>) con el ID del artwork como miembro:
+    - recent: timestamp de creación
+    - likes: número de likes
+    - views: número de visualizaciones; es el contador de referencia (ZINCRBY
+      en cada visita), así que no se recalcula desde los artworks
+    - points: puntos recibidos
+    - title: posición del título en el orden alfabético completo (ver _index_title)
+    - trending: puntuación de tendencia, mantenida por TrendingService
+
+    Los títulos se mantienen en el índice de trigramas de FuzzySearchService
+    para filtrar búsquedas (tolerando erratas) sin deserializar los artworks.
+    Las búsquedas por etiqueta usan directamente el índice de TagIndexService.
+
+    Note:
+        Los índices se reconstruyen automáticamente desde Sirope la primera
+        vez que se consultan si aún no existen
+    """
+
+    _instance = None
+    _redis = None
+
+    KEY_PREFIX = 'artshare:rank'
+    BUILT_KEY = 'artshare:rank:built'
+    SORT_KEYS = ('recent', 'title', 'likes', 'views', 'points', 'trending')
+    # Índices que no se pueden recalcular a partir del estado de los artworks
+    EVENT_SORT_KEYS = ('views', 'trending')
+    FILTER_TTL = 60  # Segundos que se conserva una intersección búsqueda+orden
+    MAX_TITLE_MATCHES = 500  # Coincidencias de título que entran en un filtro
+
+    # Orden alfabético exacto de los títulos: sorted set de puntuación 0 con
+    # miembros "<título casefold>\x00<id>" y hash ID -> miembro actual
+    TITLE_LEX_KEY = 'artshare:rank:title:lex'
+    TITLE_MEMBERS_KEY = 'artshare:rank:title:members'
+    TITLE_GAP = 2.0 ** 20  # Separación entre puntuaciones consecutivas al renumerar
+    SEPARATOR = '\x00'
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RankingService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+            cls.tags = TagIndexService()
+            cls.fuzzy = FuzzySearchService()
+        return cls._instance
+
+    def _sort_key(self, sort_by: str) -> str:
+        """Obtiene la clave del sorted set para un criterio de ordenación"""
+        if sort_by not in self.SORT_KEYS:
+            sort_by = 'recent'
+        return f"{self.KEY_PREFIX}:{sort_by}"
+
+    @staticmethod
+    def _date_score(value) -> float:
+        """Convierte una fecha (datetime o string ISO) en segundos desde epoch"""
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return 0.0
+        if not isinstance(value, datetime):
+            return 0.0
+        return (value - datetime(1970, 1, 1)).total_seconds()
+
+    def _title_member(self, artwork_id: str, title: str) -> str:
+        """Obtiene el miembro del índice alfabético para un título"""
+        return f"{(title or '').strip().casefold().replace(self.SEPARATOR, '')}{self.SEPARATOR}{artwork_id}"
+
+    def _index_title(self, artwork_id: str, title: str) -> None:
+        """
+        Coloca un artwork en el orden alfabético exacto de los títulos
+
+        El título se inserta en TITLE_LEX_KEY, que Redis mantiene en orden
+        lexicográfico completo, y la puntuación del artwork en el índice
+        'title' se fija entre las de sus vecinos alfabéticos. Así el índice
+        sigue teniendo IDs como miembros (y admite las mismas intersecciones
+        y cursores que el resto) sin empates entre títulos distintos.
+
+        Args:
+            artwork_id (str): ID del artwork
+            title (str): Título actual
+
+        Note:
+            Si ya no cabe un valor entre los dos vecinos se renumera todo el
+            índice con separación TITLE_GAP, algo que solo ocurre tras muchas
+            inserciones en el mismo punto
+        """
+        member = self._title_member(artwork_id, title)
+        previous = self._redis.hget(self.TITLE_MEMBERS_KEY, artwork_id)
+        if previous is not None and previous.decode('utf-8') == member:
+            return
+
+        pipe = self._redis.pipeline()
+        if previous is not None:
+            pipe.zrem(self.TITLE_LEX_KEY, previous)
+        pipe.zadd(self.TITLE_LEX_KEY, {member: 0})
+        pipe.hset(self.TITLE_MEMBERS_KEY, artwork_id, member)
+        pipe.zrank(self.TITLE_LEX_KEY, member)
+        rank = pipe.execute()[-1]
+
+        neighbours = self._redis.zrange(self.TITLE_LEX_KEY, max(rank - 1, 0), rank + 1)
+        neighbour_ids = [value.decode('utf-8').rsplit(self.SEPARATOR, 1)[-1] for value in neighbours]
+        before = neighbour_ids[0] if rank > 0 else None
+        after = neighbour_ids[-1] if neighbour_ids[-1] != artwork_id else None
+
+        title_key = self._sort_key('title')
+        known = [neighbour_id for neighbour_id in (before, after) if neighbour_id]
+        pipe = self._redis.pipeline()
+        for neighbour_id in known:
+            pipe.zscore(title_key, neighbour_id)
+        scores = dict(zip(known, pipe.execute()))
+        low, high = scores.get(before), scores.get(after)
+
+        if low is None and high is None:
+            score = 0.0
+        elif low is None:
+            score = high - self.TITLE_GAP
+        elif high is None:
+            score = low + self.TITLE_GAP
+        else:
+            score = (low + high) / 2
+            if not low < score < high:
+                self._renumber_titles()
+                return
+        self._redis.zadd(title_key, {artwork_id: score})
+
+    def _renumber_titles(self) -> None:
+        """Reasigna las puntuaciones del índice 'title' siguiendo el orden alfabético, con separación TITLE_GAP"""
+        title_key = self._sort_key('title')
+        batch = 500
+        start = 0
+        while True:
+            members = self._redis.zrange(self.TITLE_LEX_KEY, start, start + batch - 1)
+            if not members:
+                break
+            pipe = self._redis.pipeline()
+            for position, member in enumerate(members, start):
+                artwork_id = member.decode('utf-8').rsplit(self.SEPARATOR, 1)[-1]
+                pipe.zadd(title_key, {artwork_id: position * self.TITLE_GAP})
+            pipe.execute()
+            start += batch
+
+    def index_artwork(self, artwork) -> bool:
+        """
+        Añade o actualiza un artwork en todos los índices de ordenación
+
+        Args:
+            artwork (Artwork): Artwork a indexar
+
+        Returns:
+            bool: True si se actualizó el índice, False en caso contrario
+        """
+        try:
+            if not artwork or not artwork.id:
+                return False
+
+            artwork_id = str(artwork.id)
+
+            pipe = self._redis.pipeline()
+            pipe.zadd(self._sort_key('recent'), {artwork_id: self._date_score(getattr(artwork, 'created_at', None))})
+            pipe.zadd(self._sort_key('likes'), {artwork_id: len(getattr(artwork, 'likes', None) or [])})
+            # Solo se siembra con el valor guardado: el contador vivo es este índice
+            pipe.zadd(self._sort_key('views'), {artwork_id: artwork.__dict__.get('views', 0) or 0}, nx=True)
+            pipe.zadd(self._sort_key('points'), {artwork_id: getattr(artwork, 'points_received', 0) or 0})
+            # Solo se asegura la presencia, la puntuación la acumulan los eventos
+            pipe.zadd(self._sort_key('trending'), {artwork_id: 0}, nx=True)
+            pipe.execute()
+            self._index_title(artwork_id, getattr(artwork, 'title', ''))
+            self.fuzzy.index('titles', artwork_id, getattr(artwork, 'title', ''))
+            return True
+        except Exception as e:
+            logger.error(f"Error al indexar artwork {getattr(artwork, 'id', None)}: {e}")
+            return False
+
+    def update_score(self, sort_by: str, artwork_id: str, value: float) -> bool:
+        """
+        Actualiza un único contador del índice (likes o points)
+
+        Args:
+            sort_by (str): Criterio a actualizar
+            artwork_id (str): ID del artwork
+            value (float): Nuevo valor del contador
+
+        Returns:
+            bool: True si se actualizó el índice
+        """
+        try:
+            if not artwork_id:
+                return False
+            self._redis.zadd(self._sort_key(sort_by), {str(artwork_id): value or 0})
+            return True
+        except Exception as e:
+            logger.error(f"Error al actualizar índice {sort_by} del artwork {artwork_id}: {e}")
+            return False
+
+    def increment_views(self, artwork_id: str) -> Optional[int]:
+        """
+        Suma una visualización a un artwork
+
+        Args:
+            artwork_id (str): ID del artwork
+
+        Returns:
+            int|None: Nuevo número de visualizaciones, o None si hay error
+
+        Note:
+            ZINCRBY es atómico, así que las visitas no reescriben el artwork
+            ni pisan los likes o comentarios guardados a la vez
+        """
+        try:
+            return int(self._redis.zincrby(self._sort_key('views'), 1, str(artwork_id)))
+        except Exception as e:
+            logger.error(f"Error al contabilizar la visualización del artwork {artwork_id}: {e}")
+            return None
+
+    def view_count(self, artwork_id: str) -> Optional[int]:
+        """Obtiene las visualizaciones de un artwork, o None si no está en el índice"""
+        try:
+            score = self._redis.zscore(self._sort_key('views'), str(artwork_id))
+            return int(score) if score is not None else None
+        except Exception as e:
+            logger.error(f"Error al obtener las visualizaciones del artwork {artwork_id}: {e}")
+            return None
+
+    def remove_artwork(self, artwork_id: str) -> bool:
+        """
+        Elimina un artwork de todos los índices
+
+        Args:
+            artwork_id (str): ID del artwork eliminado
+
+        Returns:
+            bool: True si se eliminó correctamente
+        """
+        try:
+            artwork_id = str(artwork_id)
+            pipe = self._redis.pipeline()
+            for sort_by in self.SORT_KEYS:
+                pipe.zrem(self._sort_key(sort_by), artwork_id)
+            pipe.hget(self.TITLE_MEMBERS_KEY, artwork_id)
+            title_member = pipe.execute()[-1]
+            pipe = self._redis.pipeline()
+            if title_member is not None:
+                pipe.zrem(self.TITLE_LEX_KEY, title_member)
+            pipe.hdel(self.TITLE_MEMBERS_KEY, artwork_id)
+            pipe.execute()
+            self.fuzzy.remove('titles', artwork_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error al eliminar artwork {artwork_id} de los índices: {e}")
+            return False
+
+    def ensure_built(self) -> None:
+        """
+        Reconstruye los índices si todavía no se han generado
+
+        Note:
+            También reconstruye si hay títulos indexados pero falta el orden
+            alfabético exacto (índices creados con la puntuación por prefijo)
+        """
+        try:
+            pipe = self._redis.pipeline()
+            pipe.exists(self.BUILT_KEY)
+            pipe.zcard(self._sort_key('title'))
+            pipe.exists(self.TITLE_LEX_KEY)
+            built, titles, lex_built = pipe.execute()
+            if not built or (titles and not lex_built):
+                self.rebuild()
+        except Exception as e:
+            logger.error(f"Error al comprobar los índices de ordenación: {e}")
+
+    def rebuild(self) -> int:
+        """
+        Reconstruye todos los índices a partir de los artworks de Sirope
+
+        Returns:
+            int: Número de artworks indexados
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+            Los índices de EVENT_SORT_KEYS se conservan
+        """
+        from ..artwork.model import Artwork
+
+        sirope = SiropeService()
+        keys = [self._sort_key(sort_by) for sort_by in self.SORT_KEYS if sort_by not in self.EVENT_SORT_KEYS]
+        self._redis.delete(*keys, self.TITLE_LEX_KEY, self.TITLE_MEMBERS_KEY)
+
+        count = 0
+        for artwork in sirope.find_all(Artwork):
+            if self.index_artwork(artwork):
+                count += 1
+        # Espaciar uniformemente las puntuaciones de título tras las inserciones sucesivas
+        self._renumber_titles()
+
+        self._redis.set(self.BUILT_KEY, datetime.utcnow().isoformat())
+        logger.info(f"Índices de ordenación reconstruidos: {count} artworks")
+        return count
+
+    def _title_ids(self, query: str) -> List[str]:
+        """
+        Busca los IDs de artworks cuyo título contiene la consulta o se le parece
+
+        Args:
+            query (str): Texto a buscar
+
+        Returns:
+            list: IDs de los artworks que coinciden
+
+        Note:
+            Usa el índice de trigramas: un título que contiene la consulta
+            comparte todos sus trigramas, y uno con erratas la mayoría
+        """
+        return self.fuzzy.search('titles', query, limit=self.MAX_TITLE_MATCHES)
+
+    def _filtered_key(self, sort_by: str, query: str, search_type: str) -> str:
+        """
+        Obtiene un sorted set con los resultados de una búsqueda en el orden pedido
+
+        Intersecta el índice de ordenación con el conjunto de IDs que cumplen
+        el filtro (con peso 0, para conservar la puntuación de ordenación).
+        Para las etiquetas el filtro es directamente el set del índice de
+        etiquetas; para los títulos, un set temporal con las coincidencias.
+        El resultado se reutiliza durante FILTER_TTL segundos para las
+        siguientes páginas de la misma búsqueda.
+
+        Args:
+            sort_by (str): Criterio de ordenación
+            query (str): Texto buscado
+            search_type (str): Tipo de búsqueda
+
+        Returns:
+            str: Clave del sorted set filtrado
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+        """
+        from ..artwork.model import Artwork
+
+        digest = hashlib.sha1(f"{search_type}:{query.lower()}".encode('utf-8')).hexdigest()
+        result_key = f"{self.KEY_PREFIX}:tmp:{sort_by}:{digest}"
+        if self._redis.exists(result_key):
+            return result_key
+
+        filter_key = f"{self.KEY_PREFIX}:tmp:filter:{digest}"
+        pipe = self._redis.pipeline()
+
+        if search_type == 'tags':
+            filter_key = self.tags.tag_key(Artwork.normalize_tag(query))
+        else:
+            title_ids = self._title_ids(query)
+            if title_ids:
+                pipe.sadd(filter_key, *title_ids)
+            if search_type == 'all':
+                tag_key = self.tags.tag_key(Artwork.normalize_tag(query))
+                pipe.sunionstore(filter_key, [filter_key, tag_key])
+
+        pipe.zinterstore(result_key, {self._sort_key(sort_by): 1, filter_key: 0})
+        pipe.expire(result_key, self.FILTER_TTL)
+        if search_type != 'tags':
+            pipe.delete(filter_key)
+        pipe.execute()
+        return result_key
+
+    def related(self, artwork, limit: int = 4) -> List[str]:
+        """
+        Obtiene artworks que comparten alguna etiqueta, ordenados por likes
+
+        Args:
+            artwork (Artwork): Artwork de referencia
+            limit (int): Número máximo de resultados
+
+        Returns:
+            list: IDs de los artworks relacionados
+
+        Note:
+            Es la unión de los sets de sus etiquetas intersectada con el
+            índice de likes, sin recorrer el catálogo
+        """
+        try:
+            tag_keys = self.tags.tag_keys(getattr(artwork, 'tags', None) or [])
+            if not tag_keys:
+                return []
+
+            self.tags.ensure_built()
+            self.ensure_built()
+
+            union_key = f"{self.KEY_PREFIX}:tmp:related:{artwork.id}"
+            result_key = f"{union_key}:likes"
+            pipe = self._redis.pipeline()
+            pipe.sunionstore(union_key, tag_keys)
+            pipe.srem(union_key, str(artwork.id))
+            pipe.zinterstore(result_key, {self._sort_key('likes'): 1, union_key: 0})
+            pipe.zrevrange(result_key, 0, limit - 1)
+            pipe.delete(union_key, result_key)
+            ids = pipe.execute()[3]
+            return [artwork_id.decode('utf-8') for artwork_id in ids]
+        except Exception as e:
+            logger.error(f"Error al obtener artworks relacionados con {getattr(artwork, 'id', None)}: {e}")
+            return []
+
+    def _result_key(self, sort_by: str, search_query: str, search_type: str) -> str:
+        """Obtiene el sorted set a recorrer para un orden y una búsqueda"""
+        self.ensure_built()
+        self.tags.ensure_built()
+        if search_query:
+            return self._filtered_key(sort_by, search_query, search_type)
+        return self._sort_key(sort_by)
+
+    @staticmethod
+    def encode_cursor(score: float, artwork_id: str) -> str:
+        """Codifica la posición (puntuación, ID) de un artwork como cursor opaco"""
+        raw = json.dumps([score, artwork_id], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Optional[Tuple[float, str]]:
+        """Decodifica un cursor, devolviendo None si no es válido"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            score, artwork_id = json.loads(raw)
+            return float(score), str(artwork_id)
+        except (ValueError, TypeError):
+            return None
+
+    def cursor_for(self, sort_by: str, artwork_id: str, search_query: str = '',
+                   search_type: str = 'all') -> Optional[str]:
+        """
+        Obtiene el cursor que apunta justo después de un artwork
+
+        Args:
+            sort_by (str): Criterio de ordenación
+            artwork_id (str): Último artwork mostrado
+            search_query (str, optional): Texto de búsqueda
+            search_type (str, optional): Tipo de búsqueda
+
+        Returns:
+            str|None: Cursor o None si el artwork no está en el índice
+        """
+        try:
+            if sort_by not in self.SORT_KEYS:
+                sort_by = 'recent'
+            key = self._result_key(sort_by, search_query, search_type)
+            score = self._redis.zscore(key, str(artwork_id))
+            return self.encode_cursor(score, str(artwork_id)) if score is not None else None
+        except Exception as e:
+            logger.error(f"Error al calcular el cursor del artwork {artwork_id}: {e}")
+            return None
+
+    def page_after(self, sort_by: str = 'recent', sort_order: str = 'desc', cursor: Optional[str] = None,
+                   limit: int = 24, search_query: str = '', search_type: str = 'all') -> Tuple[List[str], Optional[str], int]:
+        """
+        Obtiene los artworks siguientes a un cursor (paginación por cursor)
+
+        Args:
+            sort_by (str): Criterio de ordenación
+            sort_order (str): 'asc' o 'desc'
+            cursor (str, optional): Cursor devuelto por la página anterior
+            limit (int): Número máximo de resultados
+            search_query (str, optional): Texto de búsqueda
+            search_type (str, optional): Tipo de búsqueda
+
+        Returns:
+            tuple: (IDs de la página, cursor siguiente o None, total de resultados)
+
+        Note:
+            Si el artwork del cursor conserva su puntuación se continúa desde
+            su posición (ZRANK, estable con empates); si ha cambiado o se ha
+            eliminado, desde el primer elemento posterior a su puntuación
+        """
+        try:
+            if sort_by not in self.SORT_KEYS:
+                sort_by = 'recent'
+            key = self._result_key(sort_by, search_query, search_type)
+            ascending = sort_order == 'asc'
+            limit = max(int(limit), 1)
+
+            offset = 0
+            position = self.decode_cursor(cursor) if cursor else None
+            if position:
+                score, artwork_id = position
+                pipe = self._redis.pipeline()
+                pipe.zscore(key, artwork_id)
+                if ascending:
+                    pipe.zrank(key, artwork_id)
+                else:
+                    pipe.zrevrank(key, artwork_id)
+                current_score, rank = pipe.execute()
+                if current_score == score and rank is not None:
+                    offset = rank + 1
+                elif ascending:
+                    offset = self._redis.zcount(key, '-inf', score)
+                else:
+                    offset = self._redis.zcount(key, score, '+inf')
+
+            pipe = self._redis.pipeline()
+            pipe.zcard(key)
+            if ascending:
+                pipe.zrange(key, offset, offset + limit - 1, withscores=True)
+            else:
+                pipe.zrevrange(key, offset, offset + limit - 1, withscores=True)
+            total, rows = pipe.execute()
+
+            ids = [artwork_id.decode('utf-8') for artwork_id, _ in rows]
+            next_cursor = None
+            if rows and offset + len(rows) < total:
+                last_id, last_score = rows[-1]
+                next_cursor = self.encode_cursor(last_score, last_id.decode('utf-8'))
+            return ids, next_cursor, total
+        except Exception as e:
+            logger.error(f"Error al paginar el índice de ordenación {sort_by}: {e}")
+            return [], None, 0
+
+    def page(self, sort_by: str = 'recent', sort_order: str = 'desc', offset: int = 0,
+             limit: int = 24, search_query: str = '', search_type: str = 'all') -> Tuple[List[str], int]:
+        """
+        Obtiene una página de IDs de artworks en el orden indicado
+
+        Args:
+            sort_by (str): Criterio de ordenación
+            sort_order (str): 'asc' o 'desc'
+            offset (int): Posición del primer resultado
+            limit (int): Número máximo de resultados
+            search_query (str, optional): Texto de búsqueda
+            search_type (str, optional): Tipo de búsqueda
+
+        Returns:
+            tuple: (lista de IDs de la página, total de resultados)
+
+        Note:
+            Sin búsqueda es un único ZRANGE sobre el índice; con búsqueda,
+            una intersección de conjuntos en Redis en lugar de ordenar en Python
+        """
+        try:
+            if sort_by not in self.SORT_KEYS:
+                sort_by = 'recent'
+            key = self._result_key(sort_by, search_query, search_type)
+
+            offset = max(int(offset), 0)
+            end = offset + max(int(limit), 1) - 1
+
+            pipe = self._redis.pipeline()
+            pipe.zcard(key)
+            if sort_order == 'asc':
+                pipe.zrange(key, offset, end)
+            else:
+                pipe.zrevrange(key, offset, end)
+            total, ids = pipe.execute()
+
+            return [artwork_id.decode('utf-8') for artwork_id in ids], total
+        except Exception as e:
+            logger.error(f"Error al consultar el índice de ordenación {sort_by}: {e}")
+            return [], 0
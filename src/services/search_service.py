@@ -0,0 +1,405 @@
+import logging
+import unicodedata
+import uuid
+from datetime import datetime
+from typing import List, Set, Tuple
+from .sirope_service import SiropeService
+
+logger = logging.getLogger(__name__)
+
+class FuzzySearchService:
+    """
+    Búsqueda tolerante a erratas mediante un índice de trigramas en Redis
+
+    Cada texto indexado (nombres de usuario y títulos de artworks) se
+    normaliza y se descompone en trigramas; cada trigrama tiene un set con
+    los IDs que lo contienen. Una consulta suma en Redis los sets de sus
+    trigramas (ZUNIONSTORE), de modo que la puntuación de cada candidato es
+    el número de trigramas compartidos, y solo los mejores candidatos se
+    comparan después con la distancia de edición.
+
+    Estructura de claves (<kind> es 'users' o 'titles'):
+    - artshare:trgm:<kind>:<trigrama>: set de IDs cuyo texto contiene el trigrama
+    - artshare:trgm:<kind>:text: hash ID -> texto normalizado, usado para
+      calcular la diferencia de trigramas al editar y para reordenar
+    - artshare:trgm:<kind>:built: marca de la última reconstrucción completa
+    - artshare:trgm:<kind>:lock: cerrojo (SET NX EX) de la reconstrucción en curso
+
+    Note:
+        La memoria está acotada por MAX_TEXT_LENGTH (como mucho unos 66
+        trigramas por objeto), y una consulta nunca lee más de
+        MAX_CANDIDATES candidatos ni suma sets de más de MAX_POSTINGS IDs
+    """
+
+    _instance = None
+    _redis = None
+
+    KEY_PREFIX = 'artshare:trgm'
+    KINDS = ('users', 'titles')
+    MAX_TEXT_LENGTH = 64  # Caracteres normalizados que se indexan por texto
+    MAX_QUERY_TRIGRAMS = 32  # Trigramas de la consulta que se consultan como mucho
+    MAX_POSTINGS = 5000  # Trigramas más frecuentes que esto no discriminan y se ignoran
+    MAX_CANDIDATES = 500  # Candidatos leídos del índice por consulta
+    RERANK_SIZE = 50  # Candidatos reordenados con la distancia de edición
+    MIN_SIMILARITY = 0.5  # Fracción mínima de trigramas de la consulta presentes
+    LOCK_SECONDS = 600  # Caducidad del cerrojo si el proceso que reconstruye muere
+    TEMP_PREFIX = 'artshare:rebuild:trgm'  # Las claves se construyen como <prefijo>:<clave definitiva>
+    BATCH_SIZE = 500  # Objetos escritos por pipeline durante la reconstrucción
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(FuzzySearchService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+        return cls._instance
+
+    def _text_key(self, kind: str) -> str:
+        """Obtiene la clave del hash de textos indexados"""
+        return f"{self.KEY_PREFIX}:{kind}:text"
+
+    def _built_key(self, kind: str) -> str:
+        """Obtiene la clave que marca el índice como construido"""
+        return f"{self.KEY_PREFIX}:{kind}:built"
+
+    def _lock_key(self, kind: str) -> str:
+        """Obtiene la clave del cerrojo de reconstrucción de un índice"""
+        return f"{self.KEY_PREFIX}:{kind}:lock"
+
+    def _trigram_key(self, kind: str, trigram: str) -> str:
+        """Obtiene la clave del set de IDs de un trigrama"""
+        return f"{self.KEY_PREFIX}:{kind}:{trigram}"
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        """
+        Normaliza un texto para el índice
+
+        Pasa a minúsculas, elimina tildes y diacríticos y reduce cualquier
+        carácter que no sea letra o número a un único espacio
+
+        Args:
+            text (str): Texto original
+
+        Returns:
+            str: Texto normalizado y recortado a MAX_TEXT_LENGTH
+        """
+        decomposed = unicodedata.normalize('NFKD', (text or '').casefold())
+        cleaned = ''.join(char if char.isalnum() else ' '
+                          for char in decomposed if not unicodedata.combining(char))
+        return ' '.join(cleaned.split())[:cls.MAX_TEXT_LENGTH]
+
+    @staticmethod
+    def trigrams(text: str) -> Set[str]:
+        """
+        Obtiene los trigramas de un texto ya normalizado
+
+        Cada palabra se rellena con dos espacios delante y uno detrás, así
+        que los inicios de palabra generan trigramas propios
+
+        Args:
+            text (str): Texto normalizado
+
+        Returns:
+            set: Trigramas del texto
+        """
+        grams = set()
+        for word in text.split():
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return grams
+
+    @classmethod
+    def query_trigrams(cls, query: str) -> Set[str]:
+        """
+        Obtiene los trigramas con los que se busca una consulta normalizada
+
+        Args:
+            query (str): Consulta normalizada
+
+        Returns:
+            set: Trigramas de la consulta
+
+        Note:
+            Las palabras de tres o más caracteres solo aportan sus trigramas
+            interiores, para que una consulta que aparece en mitad de un
+            texto siga teniendo todos sus trigramas en él. Las más cortas se
+            buscan como inicio de palabra
+        """
+        grams = set()
+        for word in query.split():
+            if len(word) >= 3:
+                grams.update(word[i:i + 3] for i in range(len(word) - 2))
+            else:
+                grams.update(f"  {word}"[i:i + 3] for i in range(len(word)))
+        return grams
+
+    def index(self, kind: str, object_id: str, text: str) -> bool:
+        """
+        Indexa o actualiza el texto de un objeto
+
+        Solo se tocan los sets de los trigramas que cambian respecto al
+        texto indexado anteriormente
+
+        Args:
+            kind (str): Tipo de índice ('users' o 'titles')
+            object_id (str): ID del objeto
+            text (str): Texto actual
+
+        Returns:
+            bool: True si el índice quedó actualizado
+        """
+        try:
+            if kind not in self.KINDS or not object_id:
+                return False
+            object_id = str(object_id)
+            normalized = self.normalize(text)
+            previous = self._redis.hget(self._text_key(kind), object_id)
+            previous = previous.decode('utf-8') if previous is not None else None
+            if previous == normalized:
+                return True
+
+            old_grams = self.trigrams(previous) if previous else set()
+            new_grams = self.trigrams(normalized)
+            pipe = self._redis.pipeline()
+            for trigram in old_grams - new_grams:
+                pipe.srem(self._trigram_key(kind, trigram), object_id)
+            for trigram in new_grams - old_grams:
+                pipe.sadd(self._trigram_key(kind, trigram), object_id)
+            if normalized:
+                pipe.hset(self._text_key(kind), object_id, normalized)
+            else:
+                pipe.hdel(self._text_key(kind), object_id)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error al indexar trigramas de {kind} {object_id}: {e}")
+            return False
+
+    def remove(self, kind: str, object_id: str) -> bool:
+        """
+        Retira un objeto del índice
+
+        Args:
+            kind (str): Tipo de índice ('users' o 'titles')
+            object_id (str): ID del objeto
+
+        Returns:
+            bool: True si se retiró correctamente
+        """
+        try:
+            object_id = str(object_id)
+            previous = self._redis.hget(self._text_key(kind), object_id)
+            if previous is None:
+                return True
+            pipe = self._redis.pipeline()
+            for trigram in self.trigrams(previous.decode('utf-8')):
+                pipe.srem(self._trigram_key(kind, trigram), object_id)
+            pipe.hdel(self._text_key(kind), object_id)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error al retirar {kind} {object_id} del índice de trigramas: {e}")
+            return False
+
+    @staticmethod
+    def edit_distance(first: str, second: str) -> int:
+        """Calcula la distancia de Levenshtein entre dos textos"""
+        if len(first) < len(second):
+            first, second = second, first
+        previous = list(range(len(second) + 1))
+        for i, char_a in enumerate(first, 1):
+            current = [i]
+            for j, char_b in enumerate(second, 1):
+                current.append(min(previous[j] + 1,
+                                   current[j - 1] + 1,
+                                   previous[j - 1] + (char_a != char_b)))
+            previous = current
+        return previous[-1]
+
+    @classmethod
+    def _best_distance(cls, query: str, text: str) -> int:
+        """
+        Obtiene la menor distancia de edición entre la consulta y un fragmento del texto
+
+        Note:
+            Se compara con cada ventana de tantas palabras como la consulta,
+            de modo que un título largo no se penaliza por su longitud
+        """
+        words = text.split()
+        size = max(1, len(query.split()))
+        if len(words) <= size:
+            return cls.edit_distance(query, text)
+        return min(cls.edit_distance(query, ' '.join(words[i:i + size]))
+                   for i in range(len(words) - size + 1))
+
+    def _candidates(self, kind: str, grams: Set[str]) -> List[Tuple[str, float]]:
+        """
+        Obtiene los candidatos con más trigramas en común con la consulta
+
+        Args:
+            kind (str): Tipo de índice
+            grams (set): Trigramas de la consulta
+
+        Returns:
+            list: Pares (ID, trigramas compartidos / trigramas consultados)
+        """
+        keys = [self._trigram_key(kind, trigram) for trigram in sorted(grams)[:self.MAX_QUERY_TRIGRAMS]]
+        pipe = self._redis.pipeline()
+        for key in keys:
+            pipe.scard(key)
+        sizes = dict(zip(keys, pipe.execute()))
+
+        # Los trigramas demasiado comunes no discriminan; si todos lo son se usa el más raro
+        selected = [key for key in keys if 0 < sizes[key] <= self.MAX_POSTINGS]
+        if not selected:
+            present = [key for key in keys if sizes[key]]
+            if not present:
+                return []
+            selected = [min(present, key=sizes.get)]
+
+        union_key = f"{self.KEY_PREFIX}:tmp:{uuid.uuid4().hex}"
+        pipe = self._redis.pipeline()
+        pipe.zunionstore(union_key, selected)
+        pipe.zrevrange(union_key, 0, self.MAX_CANDIDATES - 1, withscores=True)
+        pipe.delete(union_key)
+        ranked = pipe.execute()[1]
+        return [(member.decode('utf-8'), score / len(selected)) for member, score in ranked]
+
+    def search(self, kind: str, query: str, limit: int = 20,
+               min_similarity: float = None) -> List[str]:
+        """
+        Busca objetos cuyo texto se parece a la consulta
+
+        Args:
+            kind (str): Tipo de índice ('users' o 'titles')
+            query (str): Texto buscado, posiblemente con erratas
+            limit (int): Número máximo de resultados
+            min_similarity (float): Fracción mínima de trigramas compartidos
+
+        Returns:
+            list: IDs ordenados de más a menos parecido
+
+        Note:
+            Los RERANK_SIZE mejores candidatos se ordenan por distancia de
+            edición; el resto conserva el orden por trigramas compartidos
+        """
+        try:
+            if kind not in self.KINDS:
+                return []
+            normalized = self.normalize(query)
+            grams = self.query_trigrams(normalized)
+            if not grams:
+                return []
+            self.ensure_built(kind)
+            if min_similarity is None:
+                min_similarity = self.MIN_SIMILARITY
+
+            candidates = [(object_id, similarity) for object_id, similarity in self._candidates(kind, grams)
+                          if similarity >= min_similarity][:limit]
+            head = candidates[:self.RERANK_SIZE]
+            if not head:
+                return []
+
+            texts = self._redis.hmget(self._text_key(kind), [object_id for object_id, _ in head])
+            reranked = []
+            for (object_id, similarity), text in zip(head, texts):
+                if text is None:
+                    continue
+                distance = self._best_distance(normalized, text.decode('utf-8'))
+                reranked.append((distance, -similarity, object_id))
+            reranked.sort()
+            return [object_id for _, _, object_id in reranked] + \
+                [object_id for object_id, _ in candidates[self.RERANK_SIZE:]]
+        except Exception as e:
+            logger.error(f"Error en la búsqueda aproximada de {kind} '{query}': {e}")
+            return []
+
+    def ensure_built(self, kind: str) -> None:
+        """
+        Reconstruye un índice si todavía no se ha generado
+
+        Note:
+            Solo reconstruye el proceso que obtiene el cerrojo; las peticiones
+            concurrentes no esperan y consultan el índice tal como esté
+        """
+        try:
+            if not self._redis.exists(self._built_key(kind)):
+                self.rebuild(kind)
+        except Exception as e:
+            logger.error(f"Error al comprobar el índice de trigramas de {kind}: {e}")
+
+    def _temp_key(self, key: str) -> str:
+        """Obtiene la clave temporal en la que se reconstruye una clave del índice"""
+        return f"{self.TEMP_PREFIX}:{key}"
+
+    def rebuild(self, kind: str) -> int:
+        """
+        Reconstruye un índice a partir de los objetos de Sirope
+
+        Args:
+            kind (str): Tipo de índice ('users' o 'titles')
+
+        Returns:
+            int: Número de objetos indexados, o -1 si ya había otra
+            reconstrucción de ese índice en curso
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+            Los textos y los sets de trigramas se generan en claves
+            temporales que sustituyen a las definitivas en una sola
+            transacción, así que el hash de textos nunca queda sin sus sets
+        """
+        from ..auth.user_model import User
+        from ..artwork.model import Artwork
+
+        if kind not in self.KINDS:
+            return 0
+
+        lock_key = self._lock_key(kind)
+        if not self._redis.set(lock_key, 1, nx=True, ex=self.LOCK_SECONDS):
+            logger.info(f"Reconstrucción del índice de trigramas de {kind} ya en curso")
+            return -1
+
+        try:
+            temp_pattern = self._temp_key(f"{self.KEY_PREFIX}:{kind}:*")
+            for key in self._redis.scan_iter(match=temp_pattern, count=500):
+                self._redis.delete(key)
+
+            if kind == 'users':
+                objects = ((user.id, getattr(user, 'username', ''))
+                           for user in SiropeService().iter_all(User) if user)
+            else:
+                objects = ((artwork.id, getattr(artwork, 'title', ''))
+                           for artwork in SiropeService().iter_all(Artwork) if artwork)
+
+            count = 0
+            pipe = self._redis.pipeline()
+            for object_id, text in objects:
+                normalized = self.normalize(text)
+                if not object_id or not normalized:
+                    continue
+                object_id = str(object_id)
+                for trigram in self.trigrams(normalized):
+                    pipe.sadd(self._temp_key(self._trigram_key(kind, trigram)), object_id)
+                pipe.hset(self._temp_key(self._text_key(kind)), object_id, normalized)
+                count += 1
+                if count % self.BATCH_SIZE == 0:
+                    pipe.execute()
+            pipe.execute()
+
+            reserved = {self._built_key(kind), lock_key}
+            live_keys = [key for key in self._redis.scan_iter(match=f"{self.KEY_PREFIX}:{kind}:*", count=500)
+                         if key.decode('utf-8') not in reserved]
+            temp_keys = list(self._redis.scan_iter(match=temp_pattern, count=500))
+
+            pipe = self._redis.pipeline(transaction=True)
+            if live_keys:
+                pipe.delete(*live_keys)
+            for key in temp_keys:
+                pipe.rename(key, key.decode('utf-8')[len(self.TEMP_PREFIX) + 1:])
+            pipe.set(self._built_key(kind), datetime.utcnow().isoformat())
+            pipe.execute()
+        finally:
+            self._redis.delete(lock_key)
+
+        logger.info(f"Índice de trigramas de {kind} reconstruido: {count} objetos")
+        return count
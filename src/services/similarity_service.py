@@ -0,0 +1,398 @@
+import hashlib
+import logging
+import random
+import struct
+from typing import Dict, List, Optional, Set
+from .sirope_service import SiropeService
+
+logger = logging.getLogger(__name__)
+
+class SimilarityService:
+    """
+    Motor de artworks similares basado en MinHash y LSH
+
+    La similitud entre dos artworks combina la similitud de Jaccard de sus
+    etiquetas y la de los usuarios que les han dado like, ambas estimadas
+    con firmas MinHash. Para no comparar cada artwork con todo el catálogo,
+    las firmas se reparten en bandas (LSH) y solo se comparan los artworks
+    que coinciden en alguna banda.
+
+    Estructura de claves:
+    - artshare:similar:sig:<tipo>: hash ID -> firma MinHash empaquetada
+    - artshare:lsh:<tipo>:<banda>:<hash>: set de IDs que comparten la banda
+    - artshare:similar:<id>: sorted set con los TOP_K vecinos y su similitud
+    - artshare:similar:rev:<id>: set de artworks en cuyas listas puede aparecer
+      <id> (índice inverso, puede contener entradas ya expulsadas)
+    - artshare:similar:pending: set de artworks con likes pendientes de procesar
+
+    Note:
+        Los vecinos se actualizan de forma incremental al cambiar etiquetas;
+        los likes solo marcan el artwork como pendiente y refresh_pending
+        lo procesa en lote. recompute_all reconstruye todo
+    """
+
+    _instance = None
+    _redis = None
+
+    NUM_PERM = 64  # Permutaciones por firma
+    BANDS = 16  # Bandas LSH (BANDS * ROWS == NUM_PERM)
+    ROWS = 4
+    TOP_K = 12  # Vecinos guardados por artwork
+    MAX_CANDIDATES = 500  # Límite de candidatos evaluados por actualización
+    WEIGHTS = {'tags': 0.7, 'likes': 0.3}  # Peso de cada similitud de Jaccard
+
+    KEY_PREFIX = 'artshare:similar'
+    PENDING_KEY = 'artshare:similar:pending'
+    LSH_PREFIX = 'artshare:lsh'
+
+    _MERSENNE_PRIME = (1 << 61) - 1
+    _MAX_HASH = (1 << 64) - 1
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SimilarityService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+            # Coeficientes fijos para que las firmas sean estables entre procesos
+            rng = random.Random(20240601)
+            cls._permutations = [
+                (rng.randrange(1, cls._MERSENNE_PRIME), rng.randrange(0, cls._MERSENNE_PRIME))
+                for _ in range(cls.NUM_PERM)
+            ]
+        return cls._instance
+
+    def _signature_key(self, kind: str) -> str:
+        """Obtiene la clave del hash de firmas de un tipo ('tags' o 'likes')"""
+        return f"{self.KEY_PREFIX}:sig:{kind}"
+
+    def _neighbours_key(self, artwork_id: str) -> str:
+        """Obtiene la clave del sorted set de vecinos de un artwork"""
+        return f"{self.KEY_PREFIX}:{artwork_id}"
+
+    def _reverse_key(self, artwork_id: str) -> str:
+        """Obtiene la clave del set de listas de vecinos en las que aparece un artwork"""
+        return f"{self.KEY_PREFIX}:rev:{artwork_id}"
+
+    def _purge(self, pipe, artwork_id: str, previous: List[str]) -> None:
+        """
+        Añade al pipeline la retirada de un artwork de todas las listas de vecinos
+
+        Args:
+            pipe: Pipeline de Redis
+            artwork_id (str): ID del artwork
+            previous (list): Vecinos que tenía el artwork en su propia lista
+        """
+        for holder in self._redis.smembers(self._reverse_key(artwork_id)):
+            pipe.zrem(self._neighbours_key(holder.decode('utf-8')), artwork_id)
+        pipe.delete(self._reverse_key(artwork_id))
+        for neighbour_id in previous:
+            pipe.srem(self._reverse_key(neighbour_id), artwork_id)
+        pipe.delete(self._neighbours_key(artwork_id))
+
+    @staticmethod
+    def _features(artwork) -> Dict[str, Set[str]]:
+        """Obtiene los conjuntos de etiquetas y de usuarios con like de un artwork"""
+        likes = getattr(artwork, 'likes', None) or []
+        return {
+            'tags': set(getattr(artwork, 'tags', None) or []),
+            'likes': {str(user_id).split('@')[-1] for user_id in likes}
+        }
+
+    def _signature(self, tokens: Set[str]) -> Optional[bytes]:
+        """
+        Calcula la firma MinHash de un conjunto de tokens
+
+        Args:
+            tokens (set): Conjunto de etiquetas o IDs de usuario
+
+        Returns:
+            bytes|None: Firma empaquetada o None si el conjunto está vacío
+        """
+        if not tokens:
+            return None
+
+        hashes = [
+            int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+            for token in tokens
+        ]
+        signature = [
+            min(((a * value + b) % self._MERSENNE_PRIME) & self._MAX_HASH for value in hashes)
+            for a, b in self._permutations
+        ]
+        return struct.pack(f'<{self.NUM_PERM}Q', *signature)
+
+    def _unpack(self, signature: bytes):
+        return struct.unpack(f'<{self.NUM_PERM}Q', signature)
+
+    def _band_keys(self, kind: str, signature: Optional[bytes]) -> List[str]:
+        """Obtiene las claves de los buckets LSH en los que cae una firma"""
+        if not signature:
+            return []
+        size = self.ROWS * 8
+        keys = []
+        for band in range(self.BANDS):
+            band_bytes = signature[band * size:(band + 1) * size]
+            band_hash = hashlib.blake2b(band_bytes, digest_size=8).hexdigest()
+            keys.append(f"{self.LSH_PREFIX}:{kind}:{band}:{band_hash}")
+        return keys
+
+    def _estimate(self, first: Optional[bytes], second: Optional[bytes]) -> float:
+        """Estima la similitud de Jaccard como la fracción de mínimos coincidentes"""
+        if not first or not second:
+            return 0.0
+        matches = sum(1 for x, y in zip(self._unpack(first), self._unpack(second)) if x == y)
+        return matches / self.NUM_PERM
+
+    def _similarity(self, signatures: Dict[str, Optional[bytes]], other: Dict[str, Optional[bytes]]) -> float:
+        """Combina las similitudes de etiquetas y likes según WEIGHTS"""
+        return sum(weight * self._estimate(signatures.get(kind), other.get(kind))
+                   for kind, weight in self.WEIGHTS.items())
+
+    def _load_signatures(self, artwork_ids: List[str]) -> Dict[str, Dict[str, Optional[bytes]]]:
+        """Carga las firmas almacenadas de varios artworks"""
+        pipe = self._redis.pipeline()
+        for kind in self.WEIGHTS:
+            pipe.hmget(self._signature_key(kind), artwork_ids)
+        results = pipe.execute()
+        return {
+            artwork_id: {kind: results[i][j] for i, kind in enumerate(self.WEIGHTS)}
+            for j, artwork_id in enumerate(artwork_ids)
+        }
+
+    def has_signature(self, artwork_id: str) -> bool:
+        """Indica si el artwork ya tiene firma de etiquetas o de likes"""
+        try:
+            return any(self._redis.hexists(self._signature_key(kind), str(artwork_id)) for kind in self.WEIGHTS)
+        except Exception as e:
+            logger.error(f"Error al comprobar la firma del artwork {artwork_id}: {e}")
+            return False
+
+    def _store_signatures(self, artwork_id: str, signatures: Dict[str, Optional[bytes]]) -> None:
+        """Guarda las firmas de un artwork y actualiza sus buckets LSH"""
+        old = self._load_signatures([artwork_id])[artwork_id]
+        pipe = self._redis.pipeline()
+        for kind, signature in signatures.items():
+            if old.get(kind) == signature:
+                continue
+            for key in self._band_keys(kind, old.get(kind)):
+                pipe.srem(key, artwork_id)
+            if signature:
+                pipe.hset(self._signature_key(kind), artwork_id, signature)
+                for key in self._band_keys(kind, signature):
+                    pipe.sadd(key, artwork_id)
+            else:
+                pipe.hdel(self._signature_key(kind), artwork_id)
+        pipe.execute()
+
+    def _candidates(self, artwork_id: str, signatures: Dict[str, Optional[bytes]]) -> List[str]:
+        """
+        Obtiene los artworks que comparten al menos una banda LSH
+
+        Note:
+            ZUNIONSTORE cuenta en Redis cuántas bandas comparte cada candidato;
+            si hay más de MAX_CANDIDATES se conservan los que comparten más
+            bandas, que son los que más probablemente están entre los TOP_K
+        """
+        keys = []
+        for kind, signature in signatures.items():
+            keys.extend(self._band_keys(kind, signature))
+        if not keys:
+            return []
+        union_key = f"{self.LSH_PREFIX}:tmp:candidates:{artwork_id}"
+        pipe = self._redis.pipeline()
+        pipe.zunionstore(union_key, keys)
+        pipe.zrem(union_key, artwork_id)
+        pipe.zrevrange(union_key, 0, self.MAX_CANDIDATES - 1)
+        pipe.delete(union_key)
+        ranked = pipe.execute()[2]
+        return [member.decode('utf-8') for member in ranked]
+
+    def _refresh_neighbours(self, artwork_id: str, signatures: Dict[str, Optional[bytes]]) -> None:
+        """
+        Recalcula los vecinos de un artwork y se ofrece como vecino a sus candidatos
+
+        Args:
+            artwork_id (str): ID del artwork
+            signatures (dict): Firmas actuales del artwork
+        """
+        own_key = self._neighbours_key(artwork_id)
+        previous = [member.decode('utf-8') for member in self._redis.zrange(own_key, 0, -1)]
+        candidates = self._candidates(artwork_id, signatures)
+        candidate_signatures = self._load_signatures(candidates) if candidates else {}
+
+        scores = {}
+        for candidate_id, candidate_sigs in candidate_signatures.items():
+            score = self._similarity(signatures, candidate_sigs)
+            if score > 0:
+                scores[candidate_id] = score
+
+        pipe = self._redis.pipeline()
+        # Retirar este artwork de todas las listas en las que aparece, no solo
+        # de las de sus vecinos: las listas no son simétricas
+        self._purge(pipe, artwork_id, previous)
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.TOP_K]
+        if top:
+            pipe.zadd(own_key, dict(top))
+            for neighbour_id, _ in top:
+                pipe.sadd(self._reverse_key(neighbour_id), artwork_id)
+
+        # Actualizar las listas de los candidatos manteniendo solo los TOP_K mejores
+        for candidate_id, score in scores.items():
+            candidate_key = self._neighbours_key(candidate_id)
+            pipe.zadd(candidate_key, {artwork_id: score})
+            pipe.zremrangebyrank(candidate_key, 0, -(self.TOP_K + 1))
+            pipe.sadd(self._reverse_key(artwork_id), candidate_id)
+        pipe.execute()
+
+    def update_artwork(self, artwork) -> bool:
+        """
+        Actualiza las firmas y los vecinos de un artwork tras cambiar etiquetas o likes
+
+        Args:
+            artwork (Artwork): Artwork modificado
+
+        Returns:
+            bool: True si se actualizó correctamente
+        """
+        try:
+            if not artwork or not artwork.id:
+                return False
+
+            artwork_id = str(artwork.id)
+            signatures = {kind: self._signature(tokens) for kind, tokens in self._features(artwork).items()}
+            self._store_signatures(artwork_id, signatures)
+            self._refresh_neighbours(artwork_id, signatures)
+            return True
+        except Exception as e:
+            logger.error(f"Error al actualizar similitud del artwork {getattr(artwork, 'id', None)}: {e}")
+            return False
+
+    def remove_artwork(self, artwork_id: str) -> bool:
+        """
+        Elimina un artwork del motor de similitud
+
+        Args:
+            artwork_id (str): ID del artwork eliminado
+
+        Returns:
+            bool: True si se eliminó correctamente
+        """
+        try:
+            artwork_id = str(artwork_id)
+            self._store_signatures(artwork_id, {kind: None for kind in self.WEIGHTS})
+
+            previous = [member.decode('utf-8')
+                        for member in self._redis.zrange(self._neighbours_key(artwork_id), 0, -1)]
+            pipe = self._redis.pipeline()
+            self._purge(pipe, artwork_id, previous)
+            pipe.srem(self.PENDING_KEY, artwork_id)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error al eliminar similitud del artwork {artwork_id}: {e}")
+            return False
+
+    def mark_pending(self, artwork_id: str) -> None:
+        """
+        Marca un artwork para recalcular su similitud en la próxima tarea periódica
+
+        Args:
+            artwork_id (str): ID del artwork cuyos likes han cambiado
+
+        Note:
+            Recalcular la firma y los vecinos en cada like es demasiado caro
+            para hacerlo dentro de la petición
+        """
+        try:
+            self._redis.sadd(self.PENDING_KEY, str(artwork_id))
+        except Exception as e:
+            logger.error(f"Error al marcar la similitud del artwork {artwork_id} como pendiente: {e}")
+
+    def refresh_pending(self, batch_size: int = 100) -> int:
+        """
+        Recalcula las firmas y vecinos de los artworks marcados como pendientes
+
+        Args:
+            batch_size (int): Artworks extraídos del set en cada iteración
+
+        Returns:
+            int: Número de artworks recalculados
+        """
+        from ..artwork.model import Artwork
+
+        count = 0
+        while True:
+            batch = self._redis.spop(self.PENDING_KEY, batch_size)
+            if not batch:
+                break
+            ids = [member.decode('utf-8') for member in batch]
+            for artwork in SiropeService().find_many_by_ids(ids, Artwork):
+                if artwork and self.update_artwork(artwork):
+                    count += 1
+        logger.info(f"Similitudes pendientes recalculadas para {count} artworks")
+        return count
+
+    def similar_ids(self, artwork_id: str, limit: int = 4) -> List[str]:
+        """
+        Obtiene los IDs de los artworks más similares
+
+        Args:
+            artwork_id (str): ID del artwork de referencia
+            limit (int): Número máximo de resultados
+
+        Returns:
+            list: IDs ordenados de mayor a menor similitud
+        """
+        try:
+            ids = self._redis.zrevrange(self._neighbours_key(str(artwork_id)), 0, limit - 1)
+            return [member.decode('utf-8') for member in ids]
+        except Exception as e:
+            logger.error(f"Error al obtener similares del artwork {artwork_id}: {e}")
+            return []
+
+    def recompute_all(self) -> int:
+        """
+        Recalcula en lote las firmas y vecinos de todos los artworks
+
+        Returns:
+            int: Número de artworks procesados
+
+        Note:
+            Primero se generan todas las firmas y buckets, y después los
+            vecinos, para que cada artwork vea a todos sus candidatos
+        """
+        from ..artwork.model import Artwork
+
+        for pattern in (f"{self.KEY_PREFIX}:*", f"{self.LSH_PREFIX}:*"):
+            for key in self._redis.scan_iter(match=pattern, count=500):
+                if key.decode('utf-8') != self.PENDING_KEY:
+                    self._redis.delete(key)
+
+        all_signatures = {}
+        for artwork in SiropeService().find_all(Artwork):
+            if not artwork or not artwork.id:
+                continue
+            artwork_id = str(artwork.id)
+            signatures = {kind: self._signature(tokens) for kind, tokens in self._features(artwork).items()}
+            self._store_signatures(artwork_id, signatures)
+            all_signatures[artwork_id] = signatures
+
+        for artwork_id, signatures in all_signatures.items():
+            candidates = self._candidates(artwork_id, signatures)
+            scores = {}
+            for candidate_id in candidates:
+                candidate_sigs = all_signatures.get(candidate_id)
+                if candidate_sigs:
+                    score = self._similarity(signatures, candidate_sigs)
+                    if score > 0:
+                        scores[candidate_id] = score
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.TOP_K]
+            if top:
+                pipe = self._redis.pipeline()
+                pipe.zadd(self._neighbours_key(artwork_id), dict(top))
+                for neighbour_id, _ in top:
+                    pipe.sadd(self._reverse_key(neighbour_id), artwork_id)
+                pipe.execute()
+
+        logger.info(f"Similitudes recalculadas para {len(all_signatures)} artworks")
+        return len(all_signatures)
@@ -1,5 +1,5 @@
 import sirope
-from typing import TypeVar, Type, Optional, List, Callable
+from typing import TypeVar, Type, Optional, List, Callable, Iterator
 import logging
 import os
 import pickle
@@ -73,6 +73,13 @@ class SiropeService:
             raise RuntimeError("Sirope no está inicializado")
         return self._sirope
 
+    @property
+    def redis(self):
+        """Cliente Redis compartido, usado también por los índices auxiliares"""
+        if not self._redis:
+            raise RuntimeError("Redis no está inicializado")
+        return self._redis
+
     def _ensure_sirope_initialized(self):
         """Asegura que Sirope está inicializado antes de cualquier operación"""
         if not self._sirope:
@@ -132,8 +139,69 @@ class SiropeService:
             logger.error(f"Error al generar siguiente ID: {e}")
             raise
 
-    def save(self, obj: T) -> T:
-        """Guarda un objeto en la base de datos y retorna el objeto con su ID actualizado"""
+    VERSIONS_KEY = 'artshare:cache:versions'
+
+    def version_key(self, obj_or_cls, oid: Optional[str] = None) -> str:
+        """
+        Obtiene la clave de versión de un objeto o de la colección de una clase
+
+        Args:
+            obj_or_cls: Objeto guardado o clase
+            oid (str, optional): ID del objeto si se pasa una clase
+
+        Returns:
+            str: '<Clase>:<id>' para un objeto o '<Clase>:*' para la colección
+        """
+        cls = obj_or_cls if isinstance(obj_or_cls, type) else obj_or_cls.__class__
+        if oid is None and not isinstance(obj_or_cls, type):
+            oid = getattr(obj_or_cls, '_id', None)
+        return f"{cls.__name__}:{self._extract_numeric_id(oid) if oid else '*'}"
+
+    def get_versions(self, keys: List[str]) -> List[int]:
+        """
+        Obtiene las versiones actuales de varios objetos o colecciones
+
+        Args:
+            keys (list): Claves obtenidas con version_key
+
+        Returns:
+            list: Versiones en el mismo orden (0 si nunca se han modificado)
+        """
+        if not keys:
+            return []
+        try:
+            return [int(value or 0) for value in self._redis.hmget(self.VERSIONS_KEY, keys)]
+        except Exception as e:
+            logger.warning(f"Error al obtener versiones de caché: {e}")
+            return [-1] * len(keys)
+
+    def _bump_version(self, obj: T, collection: bool = False) -> None:
+        """
+        Incrementa la versión de un objeto para invalidar los fragmentos renderizados
+
+        Args:
+            obj: Objeto modificado
+            collection (bool): Si también cambia la colección (alta o baja)
+        """
+        try:
+            pipe = self._redis.pipeline()
+            pipe.hincrby(self.VERSIONS_KEY, self.version_key(obj), 1)
+            if collection:
+                pipe.hincrby(self.VERSIONS_KEY, self.version_key(obj.__class__), 1)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Error al incrementar versión de caché: {e}")
+
+    def save(self, obj: T, invalidate: bool = True) -> T:
+        """
+        Guarda un objeto en la base de datos y retorna el objeto con su ID actualizado
+
+        Args:
+            obj: Objeto a guardar
+            invalidate (bool, optional): Si se invalidan los fragmentos cacheados
+                del objeto. Se desactiva para contadores de alta frecuencia como
+                las visualizaciones, que se refrescan al expirar el fragmento
+        """
         self._ensure_sirope_initialized()
         try:
             # Validar que el objeto no sea None
@@ -141,7 +209,8 @@ class SiropeService:
                 raise ValueError("No se puede guardar un objeto None")
 
             # Generar un nuevo ID si el objeto no tiene uno
-            if not hasattr(obj, '_id') or not obj._id:
+            created = not hasattr(obj, '_id') or not obj._id
+            if created:
                 class_name = self._get_class_key(obj.__class__)
                 new_id = str(self._get_next_id(class_name))
                 obj._id = new_id
@@ -161,6 +230,9 @@ class SiropeService:
                 logger.info(f"Objeto guardado en caché: {cache_key}")
             except Exception as cache_error:
                 logger.warning(f"Error al guardar en caché: {cache_error}")
+
+            if invalidate or created:
+                self._bump_version(obj, collection=created)
             
             return obj
             
@@ -228,6 +300,8 @@ class SiropeService:
                 logger.info(f"Objeto eliminado de caché: {cache_key}")
             except Exception as cache_error:
                 logger.warning(f"Error al eliminar de caché: {cache_error}")
+
+            self._bump_version(obj, collection=True)
             
             return True
             
@@ -290,6 +364,32 @@ class SiropeService:
             logger.error(f"Error en find_all: {str(e)}")
             return []
 
+    def iter_all(self, cls: Type[T]) -> Iterator[T]:
+        """
+        Recorre todos los objetos de una clase sin cargarlos a la vez en memoria
+
+        Args:
+            cls (type): Clase de los objetos
+
+        Yields:
+            object: Objetos con el ID normalizado a su parte numérica
+
+        Note:
+            Usa el HSCAN de Sirope (enumerate) en lugar de HVALS, pensado para
+            tareas de mantenimiento sobre todo el catálogo. Los errores se
+            propagan: un recorrido incompleto no debe tomarse por el catálogo
+        """
+        try:
+            for obj in self._sirope.enumerate(cls):
+                if getattr(obj, '_id', None):
+                    numeric_id = self._extract_numeric_id(obj._id)
+                    if numeric_id:
+                        obj._id = numeric_id
+                yield obj
+        except Exception as e:
+            logger.error(f"Error al recorrer objetos de {cls.__name__}: {e}")
+            raise
+
     def find_by_id(self, id_value: str, cls: Type[T]) -> Optional[T]:
         """Busca un objeto por su ID"""
         try:
@@ -372,22 +472,17 @@ class SiropeService:
                 user.bio = ""
             if not hasattr(user, 'artworks'):
                 user.artworks = []
-            if not hasattr(user, 'followers'):
-                user.followers = []
-            if not hasattr(user, 'following'):
-                user.following = []
             if not hasattr(user, 'points'):
                 user.points = 0
             if not hasattr(user, 'created_at'):
                 from datetime import datetime
                 user.created_at = datetime.utcnow()
                 
-            # Guardar el usuario una sola vez después de asegurar todos los atributos
-            user = self.save(user)
+            # Guardar el usuario una sola vez después de asegurar todos los atributos;
+            # completar atributos no cambia su contenido visible, no se invalida la caché
+            user = self.save(user, invalidate=False)
                 
             logger.info(f"Atributos de usuario verificados y corregidos: {user.username}")
-            logger.info(f"Estado de following: {user.following}")
-            logger.info(f"Estado de followers: {user.followers}")
             
             return user
             
@@ -473,6 +568,8 @@ class SiropeService:
             except Exception as delete_error:
                 logger.error(f"Error al eliminar usando delete: {delete_error}")
                 success = False
+
+            self._bump_version(obj, collection=True)
             
             return success
             
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from contextlib import ExitStack
+from typing import Optional
+from werkzeug.utils import secure_filename
+from .sirope_service import SiropeService
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+class ImageStorageService:
+    """
+    Almacenamiento de imágenes direccionado por contenido
+
+    Cada imagen se guarda como <ab>/<cd>/<sha256><ext> dentro de la carpeta
+    de subidas, donde ab y cd son los primeros bytes del hash. Así:
+    - dos subidas nunca colisionan aunque tengan el mismo nombre
+    - los directorios se mantienen pequeños
+    - un archivo nunca cambia de contenido y puede cachearse indefinidamente
+    - las imágenes idénticas se guardan una sola vez
+
+    El número de artworks que usan cada archivo se guarda en el hash de
+    Redis artshare:files:refs; el archivo (y sus miniaturas) solo se borra
+    cuando deja de estar referenciado.
+
+    El resultado del procesado de cada archivo (miniaturas, dimensiones,
+    colores y placeholder) se guarda también en artshare:files:derived, fuera
+    del artwork, para poder reaplicarlo si un guardado concurrente del
+    artwork lo pierde. Se borra junto con el archivo.
+
+    Note:
+        Los archivos antiguos (nombre plano sin hash) no tienen contador y
+        se consideran referenciados una única vez
+    """
+
+    _instance = None
+    _redis = None
+
+    REFS_KEY = 'artshare:files:refs'
+    DERIVED_KEY = 'artshare:files:derived'
+    LOCK_PREFIX = 'artshare:files:lock'
+    CHUNK_SIZE = 1024 * 1024
+    EXTENSION_ALIASES = {'.jpeg': '.jpg'}
+    # Originales (ab/cd/<sha256><ext>) y sus miniaturas (ab/cd/<sha256>_<ancho>.<formato>)
+    HASHED_PATTERN = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(?:_\d+)?(?:\.\w+)?$')
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ImageStorageService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+        return cls._instance
+
+    def _lock(self, relative_path: str):
+        """Bloqueo en Redis que serializa altas y bajas de un mismo archivo"""
+        return self._redis.lock(f"{self.LOCK_PREFIX}:{relative_path}", timeout=30, blocking_timeout=10)
+
+    @classmethod
+    def shard_path(cls, digest: str, ext: str) -> str:
+        """
+        Obtiene la ruta relativa de un archivo a partir de su hash
+
+        Args:
+            digest (str): SHA-256 en hexadecimal
+            ext (str): Extensión con punto
+
+        Returns:
+            str: Ruta relativa con separadores '/' (ab/cd/<hash><ext>)
+        """
+        ext = ext.lower()
+        ext = cls.EXTENSION_ALIASES.get(ext, ext)
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    @staticmethod
+    def absolute_path(relative_path: str, upload_folder: str) -> str:
+        """Convierte una ruta relativa con '/' en una ruta del sistema"""
+        return os.path.join(upload_folder, *relative_path.split('/'))
+
+    def store(self, file, upload_folder: str) -> Optional[str]:
+        """
+        Guarda un archivo subido y suma una referencia
+
+        Args:
+            file: Objeto FileStorage subido
+            upload_folder (str): Carpeta raíz de las subidas
+
+        Returns:
+            str|None: Ruta relativa del archivo o None si hay error
+
+        Note:
+            El hash se calcula mientras se escribe un temporal, que después
+            se mueve a su ruta definitiva o se descarta si ya existía. Los
+            temporales se escriben en UPLOAD_TEMP_FOLDER, fuera de la carpeta
+            servida, para que no se puedan descargar a medio escribir
+        """
+        temp_path = None
+        try:
+            ext = os.path.splitext(secure_filename(file.filename or ''))[1]
+            temp_dir = Config.UPLOAD_TEMP_FOLDER
+            os.makedirs(temp_dir, exist_ok=True)
+            temp_path = os.path.join(temp_dir, uuid.uuid4().hex)
+
+            digest = hashlib.sha256()
+            with open(temp_path, 'wb') as temp:
+                for chunk in iter(lambda: file.stream.read(self.CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    temp.write(chunk)
+
+            relative_path = self.shard_path(digest.hexdigest(), ext)
+            final_path = self.absolute_path(relative_path, upload_folder)
+
+            with self._lock(relative_path):
+                self._redis.hincrby(self.REFS_KEY, relative_path, 1)
+                if os.path.exists(final_path):
+                    logger.info(f"Imagen duplicada, reutilizando {relative_path}")
+                    os.remove(temp_path)
+                else:
+                    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                    os.replace(temp_path, final_path)
+            return relative_path
+        except Exception as e:
+            logger.error(f"Error al guardar la imagen: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+
+    def refcount(self, relative_path: str) -> int:
+        """Obtiene el número de artworks que usan un archivo"""
+        try:
+            value = self._redis.hget(self.REFS_KEY, relative_path)
+            return int(value) if value is not None else 0
+        except Exception as e:
+            logger.error(f"Error al consultar referencias de {relative_path}: {e}")
+            return 0
+
+    def release(self, relative_path: Optional[str], upload_folder: str, thumbnails: Optional[dict] = None) -> bool:
+        """
+        Resta una referencia y borra el archivo y sus miniaturas si era la última
+
+        Args:
+            relative_path (str): Ruta relativa del original
+            upload_folder (str): Carpeta raíz de las subidas
+            thumbnails (dict, optional): Miniaturas registradas en el artwork
+
+        Returns:
+            bool: True si se borraron los archivos
+        """
+        if not relative_path:
+            return False
+        from ..utils.helpers import delete_image_files
+
+        try:
+            with self._lock(relative_path):
+                remaining = self._redis.hincrby(self.REFS_KEY, relative_path, -1)
+                if remaining > 0:
+                    return False
+                self._redis.hdel(self.REFS_KEY, relative_path)
+                self._redis.hdel(self.DERIVED_KEY, relative_path)
+                delete_image_files(relative_path, upload_folder, thumbnails)
+                return True
+        except Exception as e:
+            logger.error(f"Error al liberar la imagen {relative_path}: {e}")
+            return False
+
+    def remember_derivatives(self, relative_path: str, result: dict) -> None:
+        """
+        Guarda el resultado del procesado de un archivo
+
+        Args:
+            relative_path (str): Ruta relativa del original
+            result (dict): Atributos generados (thumbnails, width, height...)
+        """
+        try:
+            if relative_path and result and result.get('thumbnails'):
+                self._redis.hset(self.DERIVED_KEY, relative_path, json.dumps(result, default=int))
+        except Exception as e:
+            logger.error(f"Error al guardar los derivados de {relative_path}: {e}")
+
+    def derivatives(self, relative_path: str) -> Optional[dict]:
+        """Obtiene el resultado del procesado de un archivo, o None si no se ha procesado"""
+        try:
+            value = self._redis.hget(self.DERIVED_KEY, relative_path) if relative_path else None
+            return json.loads(value) if value is not None else None
+        except Exception as e:
+            logger.error(f"Error al leer los derivados de {relative_path}: {e}")
+            return None
+
+    def discard_derivatives(self, relative_path: str, upload_folder: str, thumbnails: Optional[dict]) -> bool:
+        """
+        Borra miniaturas generadas para un archivo que ya no está en uso
+
+        Args:
+            relative_path (str): Ruta relativa del original
+            upload_folder (str): Carpeta raíz de las subidas
+            thumbnails (dict): Miniaturas generadas
+
+        Returns:
+            bool: True si se borraron (el original no tenía referencias)
+        """
+        from ..utils.helpers import delete_image_files
+
+        try:
+            with self._lock(relative_path):
+                if self.refcount(relative_path) > 0:
+                    return False
+                self._redis.hdel(self.DERIVED_KEY, relative_path)
+                delete_image_files(None, upload_folder, thumbnails)
+                return True
+        except Exception as e:
+            logger.error(f"Error al descartar miniaturas de {relative_path}: {e}")
+            return False
+
+    @classmethod
+    def original_candidates(cls, relative_path: str) -> list:
+        """
+        Obtiene las rutas posibles del original de un archivo direccionado por contenido
+
+        Args:
+            relative_path (str): Original o miniatura (ab/cd/<sha256>...)
+
+        Returns:
+            list: Rutas del original con cada extensión permitida, o [] si no
+            es un archivo direccionado por contenido
+        """
+        match = cls.HASHED_PATTERN.match(relative_path)
+        if not match:
+            return []
+        digest = match.group(3)
+        return sorted({cls.shard_path(digest, f".{ext}") for ext in Config.ALLOWED_EXTENSIONS})
+
+    def remove_if_unreferenced(self, relative_path: str, upload_folder: str) -> bool:
+        """
+        Borra un archivo direccionado por contenido si su original no tiene referencias
+
+        Args:
+            relative_path (str): Original o miniatura
+            upload_folder (str): Carpeta raíz de las subidas
+
+        Returns:
+            bool: True si se borró el archivo
+
+        Note:
+            Mantiene los bloqueos de todos los originales posibles mientras
+            comprueba y borra, para no competir con una subida del mismo
+            contenido que reutilice el archivo
+        """
+        candidates = self.original_candidates(relative_path)
+        if not candidates:
+            return False
+        try:
+            with ExitStack() as stack:
+                for candidate in candidates:
+                    stack.enter_context(self._lock(candidate))
+                if any(count and int(count) > 0 for count in self._redis.hmget(self.REFS_KEY, candidates)):
+                    return False
+                os.remove(self.absolute_path(relative_path, upload_folder))
+                # Falta al menos un derivado: el resultado guardado ya no es válido
+                self._redis.hdel(self.DERIVED_KEY, *candidates)
+                return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"Error al borrar el archivo huérfano {relative_path}: {e}")
+            return False
@@ -0,0 +1,258 @@
+import logging
+import random
+import time
+from collections import Counter
+from typing import Iterable, List
+from .sirope_service import SiropeService
+from .follow_service import FollowGraphService
+
+logger = logging.getLogger(__name__)
+
+class SuggestionService:
+    """
+    Sugerencias de "gente que quizá conozcas" basadas en amigos de amigos
+
+    La puntuación de un candidato es el número de amigos en común (amistad =
+    seguimiento mutuo). Los empates se deshacen con las etiquetas que ambos
+    usuarios comparten entre las que más les gustan, con un peso inferior a
+    un amigo en común para que nunca alteren el orden principal.
+
+    Estructura de claves:
+    - artshare:suggest:<id>: sorted set con las TOP_N sugerencias y su puntuación
+    - artshare:suggest:updated: hash ID -> marca de tiempo del último cálculo
+    - artshare:suggest:pending: set de usuarios cuyas sugerencias hay que recalcular
+    - artshare:liked-tags:<id>: sorted set etiqueta -> artworks con like del usuario
+
+    Note:
+        Un cambio de seguimiento recalcula al momento las sugerencias de quien
+        sigue y marca como pendientes las del seguido y las de los amigos de
+        ambos; la tarea periódica procesa los pendientes
+    """
+
+    _instance = None
+    _redis = None
+
+    TOP_N = 20  # Sugerencias guardadas por usuario
+    MAX_FRIENDS = 200  # Amigos recorridos como máximo al calcular (muestra aleatoria)
+    MAX_TIEBREAK = 200  # Candidatos para los que se comparan etiquetas
+    TAG_SAMPLE = 20  # Etiquetas más gustadas que se comparan por usuario
+
+    KEY_PREFIX = 'artshare:suggest'
+    UPDATED_KEY = 'artshare:suggest:updated'
+    PENDING_KEY = 'artshare:suggest:pending'
+    LIKED_TAGS_PREFIX = 'artshare:liked-tags'
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SuggestionService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+            cls.graph = FollowGraphService()
+        return cls._instance
+
+    def _suggestions_key(self, user_id: str) -> str:
+        """Obtiene la clave del sorted set de sugerencias de un usuario"""
+        return f"{self.KEY_PREFIX}:{user_id}"
+
+    def _liked_tags_key(self, user_id: str) -> str:
+        """Obtiene la clave del sorted set de etiquetas gustadas de un usuario"""
+        return f"{self.LIKED_TAGS_PREFIX}:{user_id}"
+
+    def record_like(self, user_id: str, tags: Iterable[str], liked: bool) -> None:
+        """
+        Actualiza las etiquetas gustadas de un usuario tras dar o quitar un like
+
+        Args:
+            user_id (str): ID del usuario
+            tags (list): Etiquetas del artwork
+            liked (bool): True si se ha dado like, False si se ha quitado
+        """
+        try:
+            tags = [tag for tag in tags or [] if tag]
+            if not tags:
+                return
+            key = self._liked_tags_key(str(user_id).split('@')[-1])
+            pipe = self._redis.pipeline()
+            for tag in tags:
+                pipe.zincrby(key, 1 if liked else -1, tag)
+            if not liked:
+                pipe.zremrangebyscore(key, '-inf', 0)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error al actualizar las etiquetas gustadas del usuario {user_id}: {e}")
+
+    def _tag_overlaps(self, user_id: str, candidates: List[str]) -> dict:
+        """Cuenta las etiquetas más gustadas que cada candidato comparte con el usuario"""
+        pipe = self._redis.pipeline()
+        for member in [user_id] + candidates:
+            pipe.zrevrange(self._liked_tags_key(member), 0, self.TAG_SAMPLE - 1)
+        own, *others = pipe.execute()
+        own = set(own)
+        if not own:
+            return {}
+        return {candidate: len(own.intersection(tags)) for candidate, tags in zip(candidates, others)}
+
+    def refresh(self, user_id: str) -> int:
+        """
+        Recalcula las sugerencias de un usuario
+
+        Args:
+            user_id (str): ID del usuario
+
+        Returns:
+            int: Número de sugerencias guardadas
+        """
+        try:
+            user_id = str(user_id)
+            friends = self.graph.friend_ids(user_id)
+            if len(friends) > self.MAX_FRIENDS:
+                friends = random.sample(friends, self.MAX_FRIENDS)
+
+            pipe = self._redis.pipeline()
+            for friend_id in friends:
+                pipe.sinter(self.graph.following_key(friend_id), self.graph.followers_key(friend_id))
+            pipe.smembers(self.graph.following_key(user_id))
+            *friends_of_friends, following = pipe.execute()
+
+            excluded = {member.decode('utf-8') for member in following}
+            excluded.add(user_id)
+            mutual = Counter()
+            for members in friends_of_friends:
+                mutual.update(member.decode('utf-8') for member in members)
+            for member in excluded:
+                mutual.pop(member, None)
+
+            ranked = mutual.most_common()
+            scores = {}
+            if ranked:
+                # Solo importan las etiquetas en los empates que pueden entrar en el TOP_N
+                cutoff = ranked[min(self.TOP_N, len(ranked)) - 1][1]
+                tied = [candidate for candidate, count in ranked if count >= cutoff][:self.MAX_TIEBREAK]
+                overlaps = self._tag_overlaps(user_id, tied)
+                for candidate in tied:
+                    scores[candidate] = mutual[candidate] + overlaps.get(candidate, 0) / (self.TAG_SAMPLE + 1)
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.TOP_N]
+
+            key = self._suggestions_key(user_id)
+            pipe = self._redis.pipeline()
+            pipe.delete(key)
+            if top:
+                pipe.zadd(key, dict(top))
+            pipe.hset(self.UPDATED_KEY, user_id, int(time.time()))
+            pipe.srem(self.PENDING_KEY, user_id)
+            pipe.execute()
+            return len(top)
+        except Exception as e:
+            logger.error(f"Error al calcular las sugerencias del usuario {user_id}: {e}")
+            return 0
+
+    def on_follow_change(self, follower_id: str, followed_id: str) -> None:
+        """
+        Actualiza las sugerencias afectadas por un follow o unfollow
+
+        Args:
+            follower_id (str): ID del usuario que sigue o deja de seguir
+            followed_id (str): ID del otro usuario
+
+        Note:
+            Una amistad que aparece o desaparece cambia los amigos en común
+            entre cada uno de los dos usuarios y los amigos del otro
+        """
+        try:
+            follower_id, followed_id = str(follower_id), str(followed_id)
+            affected = {followed_id}
+            affected.update(self.graph.friend_ids(follower_id))
+            affected.update(self.graph.friend_ids(followed_id))
+            affected.discard(follower_id)
+            if affected:
+                self._redis.sadd(self.PENDING_KEY, *affected)
+            self.refresh(follower_id)
+        except Exception as e:
+            logger.error(f"Error al actualizar las sugerencias tras {follower_id} -> {followed_id}: {e}")
+
+    def suggestion_ids(self, user_id: str, limit: int = 4) -> List[str]:
+        """
+        Obtiene los IDs de las mejores sugerencias de un usuario
+
+        Args:
+            user_id (str): ID del usuario
+            limit (int): Número máximo de resultados
+
+        Returns:
+            list: IDs ordenados de mayor a menor puntuación
+
+        Note:
+            Si el usuario nunca se ha calculado, se calcula en ese momento
+        """
+        try:
+            user_id = str(user_id)
+            if not self._redis.hexists(self.UPDATED_KEY, user_id):
+                self.refresh(user_id)
+            ids = self._redis.zrevrange(self._suggestions_key(user_id), 0, limit - 1)
+            return [member.decode('utf-8') for member in ids]
+        except Exception as e:
+            logger.error(f"Error al obtener las sugerencias del usuario {user_id}: {e}")
+            return []
+
+    def refresh_pending(self, batch_size: int = 100) -> int:
+        """
+        Recalcula las sugerencias de los usuarios marcados como pendientes
+
+        Args:
+            batch_size (int): Usuarios extraídos del set en cada iteración
+
+        Returns:
+            int: Número de usuarios recalculados
+        """
+        count = 0
+        while True:
+            batch = self._redis.spop(self.PENDING_KEY, batch_size)
+            if not batch:
+                break
+            for member in batch:
+                self.refresh(member.decode('utf-8'))
+                count += 1
+        logger.info(f"Sugerencias pendientes recalculadas para {count} usuarios")
+        return count
+
+    def rebuild_liked_tags(self) -> int:
+        """
+        Reconstruye las etiquetas gustadas de todos los usuarios
+
+        Returns:
+            int: Número de artworks recorridos
+        """
+        from ..artwork.model import Artwork
+
+        for key in self._redis.scan_iter(match=f"{self.LIKED_TAGS_PREFIX}:*", count=500):
+            self._redis.delete(key)
+
+        count = 0
+        for artwork in SiropeService().iter_all(Artwork):
+            tags = getattr(artwork, 'tags', None) or []
+            likes = getattr(artwork, 'likes', None) or []
+            if tags and likes:
+                pipe = self._redis.pipeline()
+                for user_id in {str(like_id).split('@')[-1] for like_id in likes}:
+                    for tag in tags:
+                        pipe.zincrby(self._liked_tags_key(user_id), 1, tag)
+                pipe.execute()
+            count += 1
+        return count
+
+    def recompute_all(self) -> int:
+        """
+        Recalcula en lote las etiquetas gustadas y las sugerencias de todos los usuarios
+
+        Returns:
+            int: Número de usuarios procesados
+        """
+        from ..auth.user_model import User
+
+        self.rebuild_liked_tags()
+        count = 0
+        for user in SiropeService().iter_all(User):
+            if user and user.id:
+                self.refresh(user.id)
+                count += 1
+        logger.info(f"Sugerencias recalculadas para {count} usuarios")
+        return count
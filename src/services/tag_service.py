@@ -0,0 +1,164 @@
+import logging
+from datetime import datetime
+from typing import List, Tuple
+from .sirope_service import SiropeService
+
+logger = logging.getLogger(__name__)
+
+class TagIndexService:
+    """
+    Índice invertido de etiquetas mantenido en Redis
+
+    Estructura de claves:
+    - artshare:tag:<etiqueta>: set con los IDs de artworks que la usan
+    - artshare:tags:counts: sorted set etiqueta -> número de artworks
+    - artshare:artwork:<id>:tags: set con las etiquetas indexadas del artwork,
+      usado para calcular las diferencias al editar
+
+    Note:
+        Las etiquetas se indexan ya normalizadas (ver Artwork.normalize_tag)
+    """
+
+    _instance = None
+    _redis = None
+
+    TAG_PREFIX = 'artshare:tag'
+    COUNTS_KEY = 'artshare:tags:counts'
+    BUILT_KEY = 'artshare:tags:built'
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TagIndexService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+        return cls._instance
+
+    def tag_key(self, tag: str) -> str:
+        """Obtiene la clave del set de artworks de una etiqueta normalizada"""
+        return f"{self.TAG_PREFIX}:{tag}"
+
+    def _artwork_key(self, artwork_id: str) -> str:
+        """Obtiene la clave del set de etiquetas indexadas de un artwork"""
+        return f"artshare:artwork:{artwork_id}:tags"
+
+    def index_artwork(self, artwork) -> bool:
+        """
+        Sincroniza el índice con las etiquetas actuales de un artwork
+
+        Args:
+            artwork (Artwork): Artwork creado o editado
+
+        Returns:
+            bool: True si se actualizó el índice
+
+        Note:
+            Solo modifica las etiquetas añadidas o eliminadas desde la última
+            indexación, manteniendo los contadores por etiqueta
+        """
+        try:
+            if not artwork or not artwork.id:
+                return False
+
+            artwork_id = str(artwork.id)
+            artwork_key = self._artwork_key(artwork_id)
+            old_tags = {tag.decode('utf-8') for tag in self._redis.smembers(artwork_key)}
+            new_tags = set(getattr(artwork, 'tags', None) or [])
+
+            pipe = self._redis.pipeline()
+            for tag in old_tags - new_tags:
+                pipe.srem(self.tag_key(tag), artwork_id)
+                pipe.zincrby(self.COUNTS_KEY, -1, tag)
+            for tag in new_tags - old_tags:
+                pipe.sadd(self.tag_key(tag), artwork_id)
+                pipe.zincrby(self.COUNTS_KEY, 1, tag)
+            pipe.delete(artwork_key)
+            if new_tags:
+                pipe.sadd(artwork_key, *new_tags)
+            pipe.zremrangebyscore(self.COUNTS_KEY, '-inf', 0)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error al indexar etiquetas del artwork {getattr(artwork, 'id', None)}: {e}")
+            return False
+
+    def remove_artwork(self, artwork_id: str) -> bool:
+        """
+        Elimina un artwork del índice de etiquetas
+
+        Args:
+            artwork_id (str): ID del artwork eliminado
+
+        Returns:
+            bool: True si se eliminó correctamente
+        """
+        try:
+            artwork_id = str(artwork_id)
+            artwork_key = self._artwork_key(artwork_id)
+            tags = [tag.decode('utf-8') for tag in self._redis.smembers(artwork_key)]
+
+            pipe = self._redis.pipeline()
+            for tag in tags:
+                pipe.srem(self.tag_key(tag), artwork_id)
+                pipe.zincrby(self.COUNTS_KEY, -1, tag)
+            pipe.delete(artwork_key)
+            pipe.zremrangebyscore(self.COUNTS_KEY, '-inf', 0)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error al eliminar etiquetas del artwork {artwork_id}: {e}")
+            return False
+
+    def tag_keys(self, tags: List[str]) -> List[str]:
+        """Obtiene las claves de los sets de varias etiquetas"""
+        return [self.tag_key(tag) for tag in tags if tag]
+
+    def tag_cloud(self, limit: int = 30) -> List[Tuple[str, int]]:
+        """
+        Obtiene las etiquetas más usadas
+
+        Args:
+            limit (int): Número máximo de etiquetas
+
+        Returns:
+            list: Tuplas (etiqueta, número de artworks) ordenadas por uso
+        """
+        try:
+            self.ensure_built()
+            tags = self._redis.zrevrange(self.COUNTS_KEY, 0, limit - 1, withscores=True)
+            return [(tag.decode('utf-8'), int(count)) for tag, count in tags]
+        except Exception as e:
+            logger.error(f"Error al obtener la nube de etiquetas: {e}")
+            return []
+
+    def ensure_built(self) -> None:
+        """Reconstruye el índice si todavía no se ha generado"""
+        try:
+            if not self._redis.exists(self.BUILT_KEY):
+                self.rebuild()
+        except Exception as e:
+            logger.error(f"Error al comprobar el índice de etiquetas: {e}")
+
+    def rebuild(self) -> int:
+        """
+        Reconstruye el índice de etiquetas a partir de los artworks de Sirope
+
+        Returns:
+            int: Número de artworks indexados
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+        """
+        from ..artwork.model import Artwork
+
+        for pattern in (f"{self.TAG_PREFIX}:*", 'artshare:artwork:*:tags'):
+            for key in self._redis.scan_iter(match=pattern, count=500):
+                self._redis.delete(key)
+        self._redis.delete(self.COUNTS_KEY)
+
+        count = 0
+        for artwork in SiropeService().find_all(Artwork):
+            if self.index_artwork(artwork):
+                count += 1
+
+        self._redis.set(self.BUILT_KEY, datetime.utcnow().isoformat())
+        logger.info(f"Índice de etiquetas reconstruido: {count} artworks")
+        return count
@@ -0,0 +1,129 @@
+import logging
+import math
+import time
+from .sirope_service import SiropeService
+from .ranking_service import RankingService
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+class TrendingService:
+    """
+    Puntuación de tendencia de los artworks con decaimiento exponencial
+
+    Cada interacción suma w * 2^((t - t0) / vida_media) al sorted set
+    artshare:rank:trending, donde t0 es la época de referencia guardada en
+    artshare:trending:epoch. Sumar pesos que crecen con el tiempo equivale a
+    que las interacciones antiguas pierdan peso, sin tener que recalcular
+    la puntuación de ningún artwork: el orden relativo es el mismo que el de
+    la suma de pesos decaídos a fecha de hoy.
+
+    Para que los valores no crezcan sin límite, renormalize escala todas
+    las puntuaciones por 2^(-(ahora - t0) / vida_media) y mueve t0 a ahora.
+
+    Note:
+        El sorted set es uno más de los índices de RankingService, por lo que
+        explore puede ordenar y filtrar por tendencia como por el resto.
+        Las interacciones de Config.TRENDING_DEDUP_SECONDS cuentan una sola
+        vez por usuario y artwork dentro de su ventana (SET NX EX en
+        artshare:trending:seen:<evento>:<artwork>:<usuario>), para que
+        recargar o alternar un like no infle la puntuación
+    """
+
+    _instance = None
+    _redis = None
+
+    EPOCH_KEY = 'artshare:trending:epoch'
+    SEEN_PREFIX = 'artshare:trending:seen'
+    # Renormalizar automáticamente cuando el factor de crecimiento supera 2^64
+    MAX_EXPONENT = 64
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TrendingService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+            cls.key = RankingService()._sort_key('trending')
+            cls.half_life = Config.TRENDING_HALF_LIFE_HOURS * 3600
+            cls.weights = Config.TRENDING_WEIGHTS
+            cls.dedup_seconds = Config.TRENDING_DEDUP_SECONDS
+        return cls._instance
+
+    def _epoch(self) -> float:
+        """Obtiene la época de referencia, fijándola a ahora si no existe"""
+        epoch = self._redis.get(self.EPOCH_KEY)
+        if epoch is None:
+            now = time.time()
+            # SETNX para no pisar la época fijada por otro proceso
+            if self._redis.setnx(self.EPOCH_KEY, now):
+                return now
+            epoch = self._redis.get(self.EPOCH_KEY)
+        return float(epoch)
+
+    def _weight(self, event: str, amount: float) -> float:
+        """Obtiene el peso base de una interacción"""
+        weight = self.weights.get(event, 0)
+        if event == 'donation':
+            return weight * math.log2(1 + max(amount, 0))
+        return weight * amount
+
+    def _first_in_window(self, artwork_id: str, event: str, actor: str) -> bool:
+        """Indica si es la primera vez que el usuario realiza la interacción dentro de su ventana"""
+        window = self.dedup_seconds.get(event)
+        if not window or not actor:
+            return True
+        key = f"{self.SEEN_PREFIX}:{event}:{artwork_id}:{actor}"
+        return bool(self._redis.set(key, 1, nx=True, ex=window))
+
+    def record(self, artwork_id: str, event: str, amount: float = 1, actor: str = None) -> bool:
+        """
+        Registra una interacción sobre un artwork
+
+        Args:
+            artwork_id (str): ID del artwork
+            event (str): Tipo de interacción ('view', 'like', 'comment' o 'donation')
+            amount (float, optional): Número de interacciones o puntos donados
+            actor (str, optional): Usuario (o IP, si es anónimo) que interactúa,
+                para contar una sola vez las interacciones repetidas
+
+        Returns:
+            bool: True si se actualizó la puntuación
+        """
+        try:
+            weight = self._weight(event, amount)
+            if not artwork_id or weight <= 0:
+                return False
+            if not self._first_in_window(str(artwork_id), event, actor):
+                return False
+
+            exponent = (time.time() - self._epoch()) / self.half_life
+            if exponent > self.MAX_EXPONENT:
+                self.renormalize()
+                exponent = (time.time() - self._epoch()) / self.half_life
+
+            self._redis.zincrby(self.key, weight * math.pow(2, exponent), str(artwork_id))
+            return True
+        except Exception as e:
+            logger.error(f"Error al registrar interacción {event} del artwork {artwork_id}: {e}")
+            return False
+
+    def renormalize(self) -> float:
+        """
+        Escala todas las puntuaciones a la época actual
+
+        Returns:
+            float: Factor aplicado a las puntuaciones
+
+        Note:
+            ZUNIONSTORE con peso sobre la propia clave escala el sorted set
+            en Redis; se ejecuta en una transacción junto al cambio de época
+        """
+        now = time.time()
+        factor = math.pow(2, -(now - self._epoch()) / self.half_life)
+
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.zunionstore(self.key, {self.key: factor})
+        pipe.set(self.EPOCH_KEY, now)
+        pipe.execute()
+
+        logger.info(f"Puntuaciones de tendencia renormalizadas (factor {factor:.6g})")
+        return factor
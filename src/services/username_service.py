@@ -0,0 +1,184 @@
+import logging
+from datetime import datetime
+from typing import List
+from .sirope_service import SiropeService
+from .search_service import FuzzySearchService
+
+logger = logging.getLogger(__name__)
+
+class UsernameIndexService:
+    """
+    Índice lexicográfico de nombres de usuario mantenido en Redis
+
+    Estructura de claves:
+    - artshare:usernames: sorted set con puntuación 0 y miembros
+      "<nombre en minúsculas>\\x00<id>", consultado por prefijo con ZRANGEBYLEX
+    - artshare:usernames:members: hash ID -> miembro indexado, usado para
+      retirar la entrada anterior al cambiar el nombre
+    - artshare:usernames:built: marca de la última reconstrucción completa
+    - artshare:usernames:lock: cerrojo (SET NX EX) de la reconstrucción en curso
+
+    Note:
+        Una búsqueda por prefijo cuesta O(log n + resultados), sin cargar
+        ningún usuario que no se vaya a mostrar. Los nombres se mantienen
+        también en el índice de trigramas para la búsqueda con erratas
+    """
+
+    _instance = None
+    _redis = None
+
+    INDEX_KEY = 'artshare:usernames'
+    MEMBERS_KEY = 'artshare:usernames:members'
+    BUILT_KEY = 'artshare:usernames:built'
+    LOCK_KEY = 'artshare:usernames:lock'
+    LOCK_SECONDS = 600  # Caducidad del cerrojo si el proceso que reconstruye muere
+    BATCH_SIZE = 500  # Usuarios escritos por pipeline durante la reconstrucción
+    SEPARATOR = '\x00'
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(UsernameIndexService, cls).__new__(cls)
+            cls._redis = SiropeService().redis
+            cls.fuzzy = FuzzySearchService()
+        return cls._instance
+
+    @staticmethod
+    def normalize(username: str) -> str:
+        """Normaliza un nombre de usuario o prefijo para el índice"""
+        return (username or '').strip().lower().replace(UsernameIndexService.SEPARATOR, '')
+
+    def index_user(self, user) -> bool:
+        """
+        Sincroniza el índice con el nombre actual de un usuario
+
+        Args:
+            user (User): Usuario creado o editado
+
+        Returns:
+            bool: True si se actualizó el índice
+        """
+        try:
+            if not user or not user.id or not getattr(user, 'username', None):
+                return False
+            user_id = str(user.id)
+            member = f"{self.normalize(user.username)}{self.SEPARATOR}{user_id}"
+            previous = self._redis.hget(self.MEMBERS_KEY, user_id)
+            if previous is not None and previous.decode('utf-8') == member:
+                return True
+            pipe = self._redis.pipeline()
+            if previous is not None:
+                pipe.zrem(self.INDEX_KEY, previous)
+            pipe.zadd(self.INDEX_KEY, {member: 0})
+            pipe.hset(self.MEMBERS_KEY, user_id, member)
+            pipe.execute()
+            self.fuzzy.index('users', user_id, user.username)
+            return True
+        except Exception as e:
+            logger.error(f"Error al indexar el nombre del usuario {getattr(user, 'id', None)}: {e}")
+            return False
+
+    def remove_user(self, user_id: str) -> bool:
+        """Retira a un usuario del índice"""
+        try:
+            user_id = str(user_id)
+            previous = self._redis.hget(self.MEMBERS_KEY, user_id)
+            pipe = self._redis.pipeline()
+            if previous is not None:
+                pipe.zrem(self.INDEX_KEY, previous)
+            pipe.hdel(self.MEMBERS_KEY, user_id)
+            pipe.execute()
+            self.fuzzy.remove('users', user_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error al retirar del índice al usuario {user_id}: {e}")
+            return False
+
+    def search_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Busca usuarios cuyo nombre empieza por un prefijo
+
+        Args:
+            prefix (str): Prefijo (no distingue mayúsculas)
+            limit (int): Número máximo de resultados
+
+        Returns:
+            list: IDs de usuario en orden alfabético
+        """
+        try:
+            prefix = self.normalize(prefix)
+            if not prefix:
+                return []
+            self.ensure_built()
+            encoded = prefix.encode('utf-8')
+            members = self._redis.zrangebylex(self.INDEX_KEY, b'[' + encoded, b'[' + encoded + b'\xff',
+                                              start=0, num=limit)
+            return [member.decode('utf-8').rsplit(self.SEPARATOR, 1)[-1] for member in members]
+        except Exception as e:
+            logger.error(f"Error al buscar usuarios por el prefijo '{prefix}': {e}")
+            return []
+
+    def ensure_built(self) -> None:
+        """
+        Reconstruye el índice si todavía no se ha generado
+
+        Note:
+            Solo reconstruye el proceso que obtiene el cerrojo; las peticiones
+            concurrentes no esperan y buscan en el índice tal como esté
+        """
+        try:
+            if not self._redis.exists(self.BUILT_KEY):
+                self.rebuild()
+        except Exception as e:
+            logger.error(f"Error al comprobar el índice de nombres de usuario: {e}")
+
+    def rebuild(self) -> int:
+        """
+        Reconstruye el índice a partir de los usuarios de Sirope
+
+        Returns:
+            int: Número de usuarios indexados, o -1 si ya había otra
+            reconstrucción en curso
+
+        Note:
+            Importa dependencias de forma dinámica para evitar ciclos
+            El índice se genera en claves temporales que sustituyen a las
+            definitivas con RENAME, así que nunca se consulta a medio construir
+        """
+        from ..auth.user_model import User
+
+        if not self._redis.set(self.LOCK_KEY, 1, nx=True, ex=self.LOCK_SECONDS):
+            logger.info("Reconstrucción del índice de nombres de usuario ya en curso")
+            return -1
+
+        try:
+            temp_index = f"{self.INDEX_KEY}:tmp"
+            temp_members = f"{self.MEMBERS_KEY}:tmp"
+            self._redis.delete(temp_index, temp_members)
+
+            count = 0
+            pipe = self._redis.pipeline()
+            for user in SiropeService().iter_all(User):
+                if not user or not user.id or not getattr(user, 'username', None):
+                    continue
+                user_id = str(user.id)
+                member = f"{self.normalize(user.username)}{self.SEPARATOR}{user_id}"
+                pipe.zadd(temp_index, {member: 0})
+                pipe.hset(temp_members, user_id, member)
+                count += 1
+                if count % self.BATCH_SIZE == 0:
+                    pipe.execute()
+            pipe.execute()
+
+            pipe = self._redis.pipeline(transaction=True)
+            if count:
+                pipe.rename(temp_index, self.INDEX_KEY)
+                pipe.rename(temp_members, self.MEMBERS_KEY)
+            else:
+                pipe.delete(self.INDEX_KEY, self.MEMBERS_KEY)
+            pipe.set(self.BUILT_KEY, datetime.utcnow().isoformat())
+            pipe.execute()
+        finally:
+            self._redis.delete(self.LOCK_KEY)
+
+        logger.info(f"Índice de nombres de usuario reconstruido: {count} usuarios")
+        return count
@@ -1,17 +1,41 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, session, current_app, send_from_directory
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, session, current_app, send_from_directory, Response
 from flask_login import login_required, current_user
 from .models import Message
 from ..services.sirope_service import SiropeService
+from ..services.follow_service import FollowGraphService
+from ..services.suggestion_service import SuggestionService
+from ..services.conversation_service import ConversationService
+from ..services.chat_stream_service import ChatStreamService
+from ..services.username_service import UsernameIndexService
+from ..services.search_service import FuzzySearchService
 from ..auth.user_model import User
+from ..auth.routes import avatar_url
 import logging
 import os
 from datetime import datetime
 from ..utils.helpers import get_user
+from ..utils.filters import format_datetime
 
 bp = Blueprint('social', __name__)
 sirope = SiropeService()
+follow_graph = FollowGraphService()
+suggestions = SuggestionService()
+conversations_index = ConversationService()
+chat_stream = ChatStreamService()
+usernames = UsernameIndexService()
+fuzzy_search = FuzzySearchService()
 logger = logging.getLogger(__name__)
 
+# Sugerencias mostradas en la página social
+SUGGESTIONS_SHOWN = 4
+# Conversaciones mostradas en la página social
+RECENT_CONVERSATIONS = 10
+# Mensajes por página del historial de chat
+CHAT_PAGE_SIZE = 50
+# Resultados de la búsqueda de usuarios y del autocompletado
+SEARCH_RESULTS = 50
+AUTOCOMPLETE_RESULTS = 8
+
 @bp.route('/')
 @login_required
 def index():
@@ -47,63 +71,25 @@ def index():
         current_user_fresh.ensure_attributes()
         sirope.save(current_user_fresh)
         
-        logger.info(f"Usuario actual - Following: {current_user_fresh.following}")
-        logger.info(f"Usuario actual - Followers: {current_user_fresh.followers}")
-
-        # Obtener todos los usuarios
-        all_users = sirope.find_all(User)
-        users = []
-        friends = []  # Usuarios que se siguen mutuamente
-        processed_ids = set()
-
-        for user in all_users:
-            try:
-                if not user or not user.id:
-                    continue
-
-                numeric_id = sirope._extract_numeric_id(user.id)
-                str_numeric_id = str(numeric_id)
-                
-                # Evitar duplicados y el usuario actual
-                if numeric_id == current_user_id or numeric_id in processed_ids:
-                    continue
-                
-                processed_ids.add(numeric_id)
-
-                # Asegurar que el usuario tenga todos los atributos necesarios
-                user.ensure_attributes()
-                sirope.save(user)
-
-                # Verificar si hay seguimiento mutuo (amistad)
-                str_current_id = str(current_user_id)
-                current_follows_user = str_numeric_id in current_user_fresh.following
-                user_follows_current = str_current_id in user.following
-
-                if current_follows_user and user_follows_current:
-                    friends.append(user)
-                    logger.info(f"Usuario {user.username} añadido a amigos")
-                else:
-                    users.append(user)
-                    logger.info(f"Usuario {user.username} añadido a usuarios")
-
-            except Exception as user_error:
-                logger.error(f"Error procesando usuario: {str(user_error)}")
-                continue
-        
-        # Ordenar las listas por nombre de usuario
+        # Amigos (seguimiento mutuo) resueltos con SINTER en Redis
+        friends = sirope.find_many_by_ids(follow_graph.friend_ids(current_user_id), User)
+        for friend in friends:
+            friend.ensure_attributes()
         friends.sort(key=lambda x: x.username.lower())
-        users.sort(key=lambda x: x.username.lower())
+
+        # Sugerencias precalculadas (amigos de amigos), ya ordenadas por puntuación
+        users = sirope.find_many_by_ids(suggestions.suggestion_ids(current_user_id, SUGGESTIONS_SHOWN), User)
+        for user in users:
+            user.ensure_attributes()
         
         # Obtener seguidores recientes (últimos 5)
         recent_followers = []
-        if current_user_fresh.followers:
-            for follower_id in current_user_fresh.followers[-5:]:
-                follower = sirope.find_by_id(follower_id, User)
-                if follower:
-                    follower.ensure_attributes()
-                    sirope.save(follower)
-                    recent_followers.append(follower)
-        recent_followers.reverse()
+        for follower_id in follow_graph.recent_follower_ids(current_user_id, 5):
+            follower = sirope.find_by_id(follower_id, User)
+            if follower:
+                follower.ensure_attributes()
+                sirope.save(follower)
+                recent_followers.append(follower)
         
         # Obtener conversaciones recientes
         conversations = get_recent_conversations(current_user_id)
@@ -138,51 +124,20 @@ def search():
             flash('Ha ocurrido un error al buscar usuarios.')
             return render_template('social/search.html', users=[], query=query)
         
-        # Asegurarse de que el usuario actual tenga las listas necesarias
-        if not hasattr(current_user_fresh, 'following'):
-            current_user_fresh.following = []
-        if not hasattr(current_user_fresh, 'followers'):
-            current_user_fresh.followers = []
-        
-        # Buscar usuarios que coincidan con la query
-        all_users = sirope.find_all(User)
-        users = []
-        
-        for user in all_users:
-            try:
-                if not user or not user.id or not user.username:
-                    continue
-                
-                numeric_id = sirope._extract_numeric_id(user.id)
-                str_numeric_id = str(numeric_id)
-                
-                # Evitar mostrar al usuario actual
-                if str_numeric_id == str(current_numeric_id):
-                    continue
-            
-                # Buscar coincidencia en username
-                if query in user.username.lower():
-                    # Asegurar atributos necesarios
-                    if not hasattr(user, 'following'):
-                        user.following = []
-                        sirope.save(user)
-                    if not hasattr(user, 'followers'):
-                        user.followers = []
-                        sirope.save(user)
-                    if not hasattr(user, 'bio'):
-                        user.bio = ""
-                    if not hasattr(user, 'artworks'):
-                        user.artworks = []
-                    
-                    users.append(user)
-                    logger.info(f"Usuario {user.username} añadido a resultados")
-            
-            except Exception as user_error:
-                logger.error(f"Error procesando usuario durante búsqueda: {str(user_error)}")
-                continue
-        
-        # Ordenar por nombre de usuario
-        users.sort(key=lambda x: x.username.lower())
+        # Primero los nombres que empiezan por la consulta (en orden alfabético) y
+        # después los parecidos según el índice de trigramas, para tolerar erratas
+        user_ids = []
+        for user_id in usernames.search_prefix(query, SEARCH_RESULTS + 1) + \
+                fuzzy_search.search('users', query, SEARCH_RESULTS + 1):
+            if user_id != str(current_numeric_id) and user_id not in user_ids:
+                user_ids.append(user_id)
+        user_ids = user_ids[:SEARCH_RESULTS]
+        users = sirope.find_many_by_ids(user_ids, User)
+        for user in users:
+            if not hasattr(user, 'bio'):
+                user.bio = ""
+            if not hasattr(user, 'artworks'):
+                user.artworks = []
         
         return render_template('social/search.html',
                              users=users,
@@ -194,6 +149,32 @@ def search():
         flash('Ha ocurrido un error al buscar usuarios.')
         return render_template('social/search.html', users=[], query=query)
 
+@bp.route('/search/autocomplete')
+@login_required
+def autocomplete():
+    """
+    Sugerencias de nombres de usuario para el buscador
+
+    Query params:
+        q (str): Prefijo escrito por el usuario
+
+    Returns:
+        Response: JSON con una lista de usuarios (id, username, avatar y url del perfil)
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify([])
+    users = sirope.find_many_by_ids(usernames.search_prefix(query, AUTOCOMPLETE_RESULTS), User)
+    return jsonify([
+        {
+            'id': str(user.id),
+            'username': user.username,
+            'avatar': avatar_url(user, 32),
+            'url': url_for('auth.user_profile', username=user.username)
+        }
+        for user in users
+    ])
+
 @bp.route('/chat/<user_id>')
 @login_required
 def chat(user_id):
@@ -215,27 +196,22 @@ def chat(user_id):
             return redirect(url_for('social.index'))
         
         # Verificar si hay seguimiento mutuo (amistad)
-        user_follows_current = str(current_numeric_id) in other_user.following
-        current_follows_user = str(numeric_id) in current_user_fresh.following
+        current_follows_user, user_follows_current = follow_graph.relation(current_numeric_id, numeric_id)
         is_friend = user_follows_current and current_follows_user
         
-        # Obtener mensajes si son amigos
+        # Obtener mensajes si son amigos, ya ordenados por el índice de la conversación
+        # Obtener solo la última página de mensajes; el resto se carga al hacer scroll
         messages = []
+        has_more = False
         if is_friend:
-            messages = sirope.find_all(
-                Message,
-                lambda m: (
-                    (sirope._extract_numeric_id(m.sender_id) == current_numeric_id and 
-                      sirope._extract_numeric_id(m.receiver_id) == numeric_id) or
-                     (sirope._extract_numeric_id(m.sender_id) == numeric_id and 
-                     sirope._extract_numeric_id(m.receiver_id) == current_numeric_id)
-                )
-            )
-            messages = sorted(messages, key=lambda m: m.created_at)
+            messages = conversations_index.messages(current_numeric_id, numeric_id, limit=CHAT_PAGE_SIZE)
+            has_more = conversations_index.message_count(current_numeric_id, numeric_id) > len(messages)
+            conversations_index.mark_read(current_numeric_id, numeric_id)
         
         return render_template('social/chat.html', 
                              other_user=other_user,
                              messages=messages, 
+                             has_more=has_more,
                              is_friend=is_friend,
                              is_following=current_follows_user,
                              is_followed_by=user_follows_current)
@@ -278,7 +254,9 @@ def follow_user(user_id):
         
         # Intentar seguir al usuario
         if current_user_fresh.follow(user_to_follow):
-            # Guardar ambos usuarios
+            suggestions.on_follow_change(current_numeric_id, numeric_id)
+
+            # Guardar ambos usuarios para invalidar sus fragmentos cacheados
             sirope.save(current_user_fresh)
             sirope.save(user_to_follow)
             
@@ -293,8 +271,8 @@ def follow_user(user_id):
                 'message': 'Usuario seguido correctamente',
                 'is_mutual': is_mutual,
                 'is_followed_by': is_followed_by,
-                'followers_count': len(user_to_follow.followers),
-                'following_count': len(current_user_fresh.following)
+                'followers_count': user_to_follow.followers_count,
+                'following_count': current_user_fresh.following_count
             })
         else:
             logger.warning(f"Usuario {current_numeric_id} ya sigue a {numeric_id}")
@@ -332,7 +310,9 @@ def unfollow_user(user_id):
         
         # Intentar dejar de seguir al usuario
         if current_user_fresh.unfollow(user_to_unfollow):
-            # Guardar ambos usuarios
+            suggestions.on_follow_change(current_numeric_id, numeric_id)
+
+            # Guardar ambos usuarios para invalidar sus fragmentos cacheados
             sirope.save(current_user_fresh)
             sirope.save(user_to_unfollow)
             
@@ -341,15 +321,14 @@ def unfollow_user(user_id):
             is_followed_by = user_to_unfollow.is_following(current_user_fresh)
             
             logger.info(f"Unfollow exitoso: {current_numeric_id} -> {numeric_id} (mutual: {is_mutual}, followed_by: {is_followed_by})")
-            logger.info(f"Contadores después de unfollow - Usuario {numeric_id}: followers={len(user_to_unfollow.followers)}, Usuario {current_numeric_id}: following={len(current_user_fresh.following)}")
             
             return jsonify({
                 'success': True,
                 'message': 'Usuario dejado de seguir correctamente',
                 'is_mutual': is_mutual,
                 'is_followed_by': is_followed_by,
-                'followers_count': len(user_to_unfollow.followers),  # Seguidores del usuario que dejamos de seguir
-                'following_count': len(current_user_fresh.following)  # Seguidos del usuario actual
+                'followers_count': user_to_unfollow.followers_count,  # Seguidores del usuario que dejamos de seguir
+                'following_count': current_user_fresh.following_count  # Seguidos del usuario actual
             })
         else:
             logger.warning(f"Usuario {current_numeric_id} no sigue a {numeric_id}")
@@ -406,82 +385,170 @@ def send_message(user_id):
         if not current_user_fresh:
             return jsonify({'error': 'Error al verificar la relación de amistad'}), 500
         
-        user_follows_current = str(current_numeric_id) in other_user.following
-        current_follows_user = str(numeric_id) in current_user_fresh.following
+        current_follows_user, user_follows_current = follow_graph.relation(current_numeric_id, numeric_id)
         
         if not (user_follows_current and current_follows_user):
             return jsonify({'error': 'No puedes enviar mensajes a este usuario'}), 403
         
         # Crear y guardar el mensaje
-        now = datetime.now()
         message = Message(
             sender_id=current_user.id,
             receiver_id=other_user.id,
-            content=content
+            content=content,
+            created_at=datetime.utcnow()
         )
-        message.created_at = now
-        message.read = False
         sirope.save(message)
+        conversations_index.add_message(message)
+
+        # Entregar el mensaje en tiempo real a los streams abiertos de la conversación
+        payload = message_payload(message)
+        chat_stream.publish(current_numeric_id, numeric_id, message.id, payload)
         
         return jsonify({
             'success': True,
-            'message': {
-                'content': message.content,
-                'created_at': now.strftime('%Y-%m-%d %H:%M:%S'),
-                'sender_id': message.sender_id,
-                'receiver_id': message.receiver_id
-            }
+            'message': payload
         })
     
     except Exception as e:
         logger.error(f"Error al enviar mensaje: {str(e)}")
         return jsonify({'error': 'Error al enviar el mensaje'}), 500
 
-def get_recent_conversations(user_id):
+@bp.route('/chat/<user_id>/history')
+@login_required
+def chat_history(user_id):
+    """
+    Página de mensajes anteriores de una conversación
+
+    Args:
+        user_id (str): ID del otro participante
+
+    Query params:
+        before (str): ID del mensaje más antiguo ya mostrado
+
+    Returns:
+        Response: JSON con messages (orden cronológico) y has_more
+    """
+    numeric_id = sirope._extract_numeric_id(user_id)
+    current_numeric_id = sirope._extract_numeric_id(current_user.id)
+
+    current_follows_user, user_follows_current = follow_graph.relation(current_numeric_id, numeric_id)
+    if not (current_follows_user and user_follows_current):
+        return jsonify({'error': 'No puedes ver los mensajes de esta conversación'}), 403
+
+    before = request.args.get('before', '').strip()
+    if not before:
+        return jsonify({'error': 'Falta el parámetro before'}), 400
+
+    ids, has_more = conversations_index.message_ids_before(current_numeric_id, numeric_id, before, CHAT_PAGE_SIZE)
+    messages = sirope.find_many_by_ids(ids, Message)
+    return jsonify({
+        'messages': [message_payload(message) for message in messages],
+        'has_more': has_more
+    })
+
+@bp.route('/chat/<user_id>/read', methods=['POST'])
+@login_required
+def chat_read(user_id):
+    """
+    Marca como leída una conversación abierta al recibir mensajes en directo
+
+    Args:
+        user_id (str): ID del otro participante
+
+    Returns:
+        Response: JSON con el resultado
+    """
+    numeric_id = sirope._extract_numeric_id(user_id)
+    current_numeric_id = sirope._extract_numeric_id(current_user.id)
+    conversations_index.mark_read(current_numeric_id, numeric_id)
+    return jsonify({'success': True})
+
+@bp.route('/chat/<user_id>/stream')
+@login_required
+def chat_stream_events(user_id):
+    """
+    Stream de Server-Sent Events con los mensajes nuevos de una conversación
+
+    Args:
+        user_id (str): ID del otro participante
+
+    Returns:
+        Response: Stream text/event-stream
+
+    Note:
+        Al reconectar, el navegador envía Last-Event-ID con el último mensaje
+        recibido y se le reenvían los posteriores antes de seguir en directo
+    """
+    numeric_id = sirope._extract_numeric_id(user_id)
+    current_numeric_id = sirope._extract_numeric_id(current_user.id)
+
+    current_follows_user, user_follows_current = follow_graph.relation(current_numeric_id, numeric_id)
+    if not (current_follows_user and user_follows_current):
+        return jsonify({'error': 'No puedes ver los mensajes de esta conversación'}), 403
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('after')
+
+    def backlog():
+        if not last_event_id:
+            return []
+        ids = conversations_index.message_ids_after(current_numeric_id, numeric_id, last_event_id)
+        return [(message.id, message_payload(message)) for message in sirope.find_many_by_ids(ids, Message)]
+
+    return Response(chat_stream.events(current_numeric_id, numeric_id, backlog),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def message_payload(message):
+    """
+    Serializa un mensaje para las respuestas JSON y los eventos del chat
+
+    Args:
+        message (Message): Mensaje guardado
+
+    Returns:
+        dict: Datos del mensaje, con la fecha ya formateada para mostrar
+    """
+    return {
+        'id': str(message.id),
+        'content': message.content,
+        'created_at': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'created_at_display': format_datetime(message.created_at),
+        'sender_id': message.sender_id,
+        'receiver_id': message.receiver_id
+    }
+
+def get_recent_conversations(user_id, limit=RECENT_CONVERSATIONS):
+    """
+    Obtiene las conversaciones recientes de un usuario desde su bandeja de entrada
+
+    Args:
+        user_id (str): ID numérico del usuario
+        limit (int): Número máximo de conversaciones
+
+    Returns:
+        list: Diccionarios con user, last_message y unread, de la más reciente a la más antigua
+    """
     try:
-        # Obtener todos los mensajes donde el usuario es sender o receiver
-        all_messages = sirope.find_all(
-            Message,
-            lambda m: (
-                sirope._extract_numeric_id(m.sender_id) == user_id or
-                sirope._extract_numeric_id(m.receiver_id) == user_id
-            )
-        )
-        
-        # Agrupar por conversación
-        conversations = {}
-        for message in all_messages:
-            other_id = (sirope._extract_numeric_id(message.receiver_id) 
-                       if sirope._extract_numeric_id(message.sender_id) == user_id 
-                       else sirope._extract_numeric_id(message.sender_id))
-            
-            if other_id not in conversations:
-                other_user = sirope.find_by_id(other_id, User)
-                if other_user:
-                    conversations[other_id] = {
-                        'user': other_user,
-                        'last_message': message
-                    }
-            else:
-                if message.created_at > conversations[other_id]['last_message'].created_at:
-                    conversations[other_id]['last_message'] = message
-        
-        # Convertir a lista y ordenar por fecha del último mensaje
-        conv_list = list(conversations.values())
-        conv_list.sort(key=lambda x: x['last_message'].created_at, reverse=True)
-        
+        recent = conversations_index.recent(user_id, limit)
+        if not recent:
+            return []
+
+        users = {str(user.id): user for user in sirope.find_many_by_ids([other_id for other_id, _, _ in recent], User)}
+        messages = {str(message.id): message
+                    for message in sirope.find_many_by_ids([message_id for _, message_id, _ in recent if message_id], Message)}
+
+        conv_list = []
+        for other_id, message_id, unread in recent:
+            other_user = users.get(other_id)
+            last_message = messages.get(message_id)
+            if other_user and last_message:
+                conv_list.append({
+                    'user': other_user,
+                    'last_message': last_message,
+                    'unread': unread
+                })
         return conv_list
     
     except Exception as e:
         logger.error(f"Error al obtener conversaciones recientes: {str(e)}")
         return []
-
-def mark_messages_as_read(messages, user_id):
-    try:
-        for message in messages:
-            if (sirope._extract_numeric_id(message.receiver_id) == user_id and 
-                not message.read):
-                message.read = True
-                sirope.save(message)
-    except Exception as e:
-        logger.error(f"Error al marcar mensajes como leídos: {str(e)}") 
\ No newline at end of file
@@ -49,4 +49,193 @@ document.addEventListener('DOMContentLoaded', function() {
             .catch(error => console.error('Error:', error));
         });
     });
+
+    // Scroll infinito en explorar: carga páginas de /api/explore por cursor
+    const exploreGrid = document.getElementById('explore-grid');
+    const exploreSentinel = document.getElementById('explore-sentinel');
+    if (exploreGrid && exploreSentinel && 'IntersectionObserver' in window) {
+        const pagination = document.getElementById('explore-pagination');
+        if (pagination) {
+            pagination.classList.add('d-none');
+        }
+
+        let nextCursor = exploreSentinel.dataset.nextCursor;
+        let loading = false;
+
+        // Crea un elemento con clases y texto opcional (sin interpretar HTML)
+        function el(tag, className, text) {
+            const node = document.createElement(tag);
+            if (className) node.className = className;
+            if (text !== undefined) node.textContent = text;
+            return node;
+        }
+
+        function counter(icon, value, extraClass) {
+            const small = el('small', 'text-muted' + (extraClass ? ' ' + extraClass : ''));
+            small.appendChild(el('i', icon));
+            small.appendChild(document.createTextNode(' ' + value));
+            return small;
+        }
+
+        // Misma estructura que templates/artwork/_card_explore.html
+        function buildCard(item) {
+            const col = el('div', 'col');
+            const card = el('div', 'card artwork-card');
+
+            const imageContainer = el('div', 'artwork-image-container');
+            const img = el('img', 'artwork-image');
+            img.src = item.image_url;
+            img.alt = item.title;
+            img.loading = 'lazy';
+            if (item.width && item.height) {
+                img.width = item.width;
+                img.height = item.height;
+            }
+            if (item.placeholder_style) {
+                img.style.cssText = item.placeholder_style;
+            }
+            imageContainer.appendChild(img);
+            card.appendChild(imageContainer);
+
+            const body = el('div', 'card-body');
+            const header = el('div', 'd-flex justify-content-between align-items-start mb-2');
+            header.appendChild(el('h5', 'card-title mb-0', item.title));
+            const authorLink = el('a', 'text-decoration-none');
+            authorLink.href = item.author_url;
+            const author = el('small', 'text-muted');
+            author.appendChild(el('i', 'fas fa-user'));
+            author.appendChild(document.createTextNode(' ' + item.author));
+            authorLink.appendChild(author);
+            header.appendChild(authorLink);
+            body.appendChild(header);
+
+            body.appendChild(el('p', 'card-text', item.description));
+
+            if (item.tags && item.tags.length) {
+                const tags = el('div', 'mb-3');
+                item.tags.forEach(tag => {
+                    const badge = el('a', 'badge bg-secondary text-decoration-none me-1', tag);
+                    badge.href = '/explore?search_type=tags&q=' + encodeURIComponent(tag);
+                    tags.appendChild(badge);
+                });
+                body.appendChild(tags);
+            }
+
+            const stats = el('div', 'd-flex justify-content-between align-items-center');
+            const counts = el('div');
+            counts.appendChild(counter('fas fa-eye', item.views));
+            counts.appendChild(counter('fas fa-heart', item.likes, 'ms-2'));
+            counts.appendChild(counter('fas fa-comment', item.comments, 'ms-2'));
+            stats.appendChild(counts);
+            stats.appendChild(counter('fas fa-coins text-warning', item.points));
+            body.appendChild(stats);
+            card.appendChild(body);
+
+            const footer = el('div', 'card-footer');
+            const link = el('a', 'btn btn-primary btn-sm w-100', 'Ver más');
+            link.href = item.url;
+            footer.appendChild(link);
+            card.appendChild(footer);
+
+            col.appendChild(card);
+            return col;
+        }
+
+        const observer = new IntersectionObserver(entries => {
+            if (!entries.some(entry => entry.isIntersecting) || loading || !nextCursor) {
+                return;
+            }
+            loading = true;
+
+            const url = new URL(exploreSentinel.dataset.apiUrl, window.location.origin);
+            url.searchParams.set('cursor', nextCursor);
+            fetch(url, { credentials: 'same-origin' })
+                .then(response => response.json())
+                .then(data => {
+                    data.items.forEach(item => exploreGrid.appendChild(buildCard(item)));
+                    nextCursor = data.next_cursor;
+                    if (!nextCursor) {
+                        observer.disconnect();
+                        exploreSentinel.remove();
+                    } else {
+                        // Volver a observar por si el centinela sigue visible tras añadir las tarjetas
+                        observer.unobserve(exploreSentinel);
+                        observer.observe(exploreSentinel);
+                    }
+                })
+                .catch(error => {
+                    console.error('Error:', error);
+                    // Volver a la paginación clásica si la API falla
+                    observer.disconnect();
+                    exploreSentinel.remove();
+                    if (pagination) {
+                        pagination.classList.remove('d-none');
+                    }
+                })
+                .finally(() => {
+                    loading = false;
+                });
+        }, { rootMargin: '600px 0px' });
+        observer.observe(exploreSentinel);
+    }
+
+    // Autocompletado de nombres de usuario en los buscadores
+    document.querySelectorAll('input[data-autocomplete-url]').forEach(input => {
+        const menu = document.createElement('div');
+        menu.className = 'dropdown-menu w-100';
+        menu.style.top = '100%';
+        input.insertAdjacentElement('afterend', menu);
+        let timer = null;
+        let lastQuery = '';
+
+        function hideMenu() {
+            menu.classList.remove('show');
+        }
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = this.value.trim();
+            if (!query) {
+                hideMenu();
+                return;
+            }
+            timer = setTimeout(() => {
+                lastQuery = query;
+                fetch(`${input.dataset.autocompleteUrl}?q=${encodeURIComponent(query)}`, { credentials: 'same-origin' })
+                    .then(response => response.json())
+                    .then(users => {
+                        // Ignorar respuestas de consultas ya superadas
+                        if (query !== lastQuery) return;
+                        menu.replaceChildren();
+                        users.forEach(user => {
+                            const link = document.createElement('a');
+                            link.className = 'dropdown-item d-flex align-items-center';
+                            link.href = user.url;
+                            const img = document.createElement('img');
+                            img.src = user.avatar;
+                            img.alt = '';
+                            img.width = 24;
+                            img.height = 24;
+                            img.className = 'rounded-circle me-2';
+                            link.appendChild(img);
+                            link.appendChild(document.createTextNode(user.username));
+                            menu.appendChild(link);
+                        });
+                        menu.classList.toggle('show', users.length > 0);
+                    })
+                    .catch(error => console.error('Error:', error));
+            }, 150);
+        });
+
+        input.addEventListener('keydown', function(e) {
+            if (e.key === 'Escape') {
+                hideMenu();
+            }
+        });
+        document.addEventListener('click', function(e) {
+            if (e.target !== input && !menu.contains(e.target)) {
+                hideMenu();
+            }
+        });
+    });
 }); 
\ No newline at end of file
@@ -0,0 +1,84 @@
+import logging
+import mimetypes
+import os
+import stat
+from urllib.parse import quote
+from flask import current_app, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # Un año, para archivos que nunca cambian de contenido
+
+def serve_file(directory, filename, max_age=None, immutable=False):
+    """
+    Sirve un archivo de una carpeta con cabeceras de caché
+
+    Esta función centraliza el envío de imágenes y estáticos:
+    - Resuelve la ruta de forma segura y hace un único stat
+    - Con FILE_ACCEL_REDIRECT delega el envío en el proxy (X-Accel-Redirect)
+    - Con USE_X_SENDFILE Flask responde con X-Sendfile sin leer el archivo
+    - Si no, Werkzeug lo envía con ETag, Last-Modified y soporte de Range
+
+    Args:
+        directory (str): Carpeta desde la que servir
+        filename (str): Ruta relativa del archivo (puede contener '/')
+        max_age (int, optional): Segundos de caché para el navegador y el proxy
+        immutable (bool): Si el archivo nunca cambia (direccionado por contenido)
+
+    Returns:
+        Response: Respuesta con el archivo o su redirección interna
+
+    Raises:
+        NotFound: Si la ruta no es válida o el archivo no existe
+    """
+    path = safe_join(os.path.abspath(directory), filename)
+    if path is None:
+        raise NotFound()
+    try:
+        file_stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise NotFound()
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise NotFound()
+
+    if immutable:
+        max_age = IMMUTABLE_MAX_AGE
+
+    accel_prefix = current_app.config.get('FILE_ACCEL_REDIRECT')
+    if accel_prefix:
+        response = _accel_redirect(path, accel_prefix)
+    else:
+        response = send_file(path, conditional=True, etag=True, max_age=max_age)
+
+    response.cache_control.public = True
+    if max_age is not None:
+        response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+def _accel_redirect(path, accel_prefix):
+    """
+    Construye una respuesta vacía que indica al proxy qué archivo enviar
+
+    Args:
+        path (str): Ruta absoluta del archivo
+        accel_prefix (str): Location interna del proxy que apunta a BASE_DIR
+
+    Returns:
+        Response: Respuesta con X-Accel-Redirect
+
+    Note:
+        El proxy genera ETag y Last-Modified y atiende Range y las
+        peticiones condicionales. Ejemplo para nginx con
+        FILE_ACCEL_REDIRECT='/_protected':
+
+            location /_protected/ { internal; alias /ruta/al/proyecto/; }
+    """
+    relative = os.path.relpath(path, current_app.config['BASE_DIR']).replace(os.sep, '/')
+    response = current_app.response_class()
+    response.headers['X-Accel-Redirect'] = quote(f"{accel_prefix.rstrip('/')}/{relative}")
+    response.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    return response
@@ -1,4 +1,6 @@
+from flask import current_app
 from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError, NumberRange
+from .image_header import read_image_header
 
 class CustomDataRequired(DataRequired):
     """
@@ -152,4 +154,54 @@ class CustomNumberRange(NumberRange):
             super().__call__(form, field)
         except ValidationError:
             field.errors[:] = []  # Limpiar errores previos
-            raise ValidationError(self.message) 
\ No newline at end of file
+            raise ValidationError(self.message)
+
+class CustomImageFile:
+    """
+    Validador de imágenes subidas que lee solo su cabecera
+
+    Este validador comprueba el contenido real del archivo, no su extensión:
+    - Identifica el formato por su firma (magic bytes)
+    - Lee ancho y alto de la cabecera sin decodificar los píxeles
+    - Rechaza imágenes con lados o píxeles totales por encima de los límites
+
+    Args:
+        formats (iterable, optional): Formatos admitidos ('png', 'jpeg', 'gif')
+        message (str, optional): Mensaje de error para archivos no válidos
+
+    Note:
+        Los límites se leen de MAX_IMAGE_SIDE y MAX_IMAGE_PIXELS
+        Deja la cabecera leída en field.image_header para guardar las
+        dimensiones sin volver a abrir la imagen
+        Los campos vacíos se aceptan (usar FileRequired si es obligatoria)
+    """
+
+    def __init__(self, formats=('png', 'jpeg', 'gif'), message=None):
+        self.formats = set(formats)
+        if message is None:
+            message = 'El archivo no es una imagen válida.'
+        self.message = message
+
+    def __call__(self, form, field):
+        field.image_header = None
+        if not field.data or not hasattr(field.data, 'stream'):
+            return
+
+        header = read_image_header(field.data.stream)
+        if header is None or header.format not in self.formats or not header.width or not header.height:
+            field.errors[:] = []  # Limpiar errores previos
+            raise ValidationError(self.message)
+
+        max_side = current_app.config['MAX_IMAGE_SIDE']
+        if header.width > max_side or header.height > max_side:
+            field.errors[:] = []  # Limpiar errores previos
+            raise ValidationError(f'La imagen mide {header.width}x{header.height} píxeles; '
+                                  f'el máximo es {max_side} píxeles por lado.')
+
+        max_pixels = current_app.config['MAX_IMAGE_PIXELS']
+        if header.width * header.height > max_pixels:
+            field.errors[:] = []  # Limpiar errores previos
+            raise ValidationError(f'La imagen tiene demasiados píxeles; '
+                                  f'el máximo es {max_pixels // 1000000} megapíxeles.')
+
+        field.image_header = header
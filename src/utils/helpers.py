@@ -1,14 +1,18 @@
 import os
-import uuid
-from PIL import Image
+from PIL import Image, ImageOps
 from flask import current_app, send_from_directory
-from werkzeug.utils import secure_filename
 import logging
+import warnings
 from datetime import datetime
-import time
+from ..config import Config
 
 logger = logging.getLogger(__name__)
 
+# Protección frente a bombas de descompresión: Pillow rechaza (en lugar de
+# solo avisar) cualquier imagen con más píxeles que el límite de subida
+Image.MAX_IMAGE_PIXELS = Config.MAX_IMAGE_PIXELS
+warnings.simplefilter('error', Image.DecompressionBombWarning)
+
 def allowed_file(filename):
     """
     Verifica si la extensión del archivo está permitida
@@ -30,40 +34,162 @@ def save_image(file, upload_folder='uploads'):
     Guarda una imagen en el sistema de archivos
     
     Esta función maneja el proceso de guardado de imágenes:
-    - Genera un nombre único basado en timestamp
-    - Crea el directorio si no existe
-    - Guarda el archivo de forma segura
+    - Nombra el archivo por el SHA-256 de su contenido
+    - Lo guarda en subdirectorios por prefijo del hash (ab/cd/<hash>.ext)
+    - Reutiliza el archivo existente si la imagen ya se había subido
     
     Args:
         file: Objeto de archivo subido
         upload_folder (str): Ruta donde guardar el archivo
         
     Returns:
-        str|None: Nombre del archivo guardado o None si hay error
+        str|None: Ruta relativa del archivo guardado o None si hay error
         
     Note:
-        Usa secure_filename para sanitizar el nombre del archivo
-        Registra errores en el log
+        Cada llamada suma una referencia al archivo; debe liberarse con
+        ImageStorageService.release al eliminar o sustituir la imagen
     """
     if file:
-        try:
-            filename = secure_filename(file.filename)
-            # Crear un nombre único para el archivo
-            base, ext = os.path.splitext(filename)
-            unique_filename = f"{base}_{str(int(time.time()))}{ext}"
-            
-            # Asegurarse de que el directorio existe
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            file_path = os.path.join(upload_folder, unique_filename)
-            file.save(file_path)
-            
-            return unique_filename
-        except Exception as e:
-            logger.error(f"Error al guardar la imagen: {e}")
-            return None
+        from ..services.storage_service import ImageStorageService
+        return ImageStorageService().store(file, upload_folder)
     return None
 
+def image_file_path(filename, upload_folder):
+    """
+    Obtiene la ruta en disco de una imagen guardada
+
+    Args:
+        filename (str): Nombre o ruta relativa con '/' (ab/cd/<hash>.jpg)
+        upload_folder (str): Carpeta raíz de las imágenes
+
+    Returns:
+        str: Ruta absoluta o relativa al directorio de trabajo
+    """
+    return os.path.join(upload_folder, *filename.split('/'))
+
+def open_image(filename, upload_folder, min_side=None):
+    """
+    Abre y decodifica una imagen aplicando su orientación EXIF
+
+    Args:
+        filename (str): Nombre del archivo
+        upload_folder (str): Carpeta donde está el archivo
+        min_side (int, optional): Lado mínimo necesario; los JPEG se
+            decodifican ya reducidos (draft) a la menor escala que lo cubre
+
+    Returns:
+        tuple: (imagen decodificada, (ancho, alto) del original orientado)
+    """
+    with Image.open(image_file_path(filename, upload_folder)) as original:
+        width, height = original.size
+        if min_side:
+            # Se usa un cuadrado para cubrir el lado pedido aunque EXIF rote la imagen
+            original.draft('RGB', (min_side, min_side))
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    # La rotación EXIF intercambia ancho y alto del original
+    if (image.width > image.height) != (width > height):
+        width, height = height, width
+    return image, (width, height)
+
+def generate_thumbnails(filename, upload_folder, sizes=None, quality=None, image=None):
+    """
+    Genera las miniaturas de una imagen en WebP y JPEG
+
+    Esta función crea, junto al original, una copia por cada ancho:
+    - <nombre>_<ancho>.webp
+    - <nombre>_<ancho>.jpg
+
+    Args:
+        filename (str): Nombre del archivo original
+        upload_folder (str): Carpeta donde está el original
+        sizes (tuple, optional): Anchos a generar (por defecto THUMBNAIL_SIZES)
+        quality (int, optional): Calidad de compresión (por defecto THUMBNAIL_QUALITY)
+        image (PIL.Image.Image, optional): Imagen ya abierta con open_image
+
+    Returns:
+        dict: Miniaturas generadas ('320' -> {'webp': archivo, 'jpeg': archivo})
+
+    Note:
+        No se amplían imágenes: se omiten los anchos mayores que el original
+        y, si alguno lo es, se añade una miniatura a su tamaño para que los
+        navegadores con más resolución no se queden con la menor.
+        Las imágenes animadas usan su primer fotograma.
+        Los JPEG se decodifican ya reducidos (draft) al tamaño más pequeño
+        que cubre la miniatura mayor
+    """
+    if not filename:
+        return {}
+    sizes = sizes or current_app.config['THUMBNAIL_SIZES']
+    quality = quality or current_app.config['THUMBNAIL_QUALITY']
+
+    thumbnails = {}
+    try:
+        base = os.path.splitext(filename)[0]
+        if image is None:
+            image, _ = open_image(filename, upload_folder, min_side=max(sizes))
+
+        # JPEG no admite transparencia: se compone sobre fondo blanco
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        widths = sorted(size for size in sizes if size <= image.width)
+        if image.width < max(sizes) and image.width not in widths:
+            widths.append(image.width)
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+            # Los derivados de un original direccionado por contenido son
+            # deterministas: si ya existen (imagen duplicada) no se recodifican
+            webp_name = f"{base}_{width}.webp"
+            webp_path = image_file_path(webp_name, upload_folder)
+            if not os.path.exists(webp_path):
+                resized.save(webp_path, 'WEBP', quality=quality, method=4)
+
+            jpeg_name = f"{base}_{width}.jpg"
+            jpeg_path = image_file_path(jpeg_name, upload_folder)
+            if not os.path.exists(jpeg_path):
+                if has_alpha:
+                    background = Image.new('RGB', resized.size, (255, 255, 255))
+                    background.paste(resized, mask=resized.getchannel('A'))
+                    resized = background
+                resized.save(jpeg_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+
+            thumbnails[str(width)] = {'webp': webp_name, 'jpeg': jpeg_name}
+        return thumbnails
+    except Exception as e:
+        logger.error(f"Error al generar miniaturas de {filename}: {e}")
+        return {}
+
+def delete_image_files(filename, upload_folder, thumbnails=None):
+    """
+    Elimina una imagen y sus miniaturas del sistema de archivos
+
+    Args:
+        filename (str|None): Nombre del archivo original
+        upload_folder (str): Carpeta de las imágenes
+        thumbnails (dict, optional): Miniaturas registradas en el artwork
+
+    Returns:
+        int: Número de archivos eliminados
+    """
+    names = [filename] if filename else []
+    for variants in (thumbnails or {}).values():
+        names.extend(variants.values())
+
+    removed = 0
+    for name in names:
+        try:
+            path = image_file_path(name, upload_folder)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        except OSError as e:
+            logger.error(f"Error al eliminar el archivo {name}: {e}")
+    return removed
+
 def get_uploaded_file(filename):
     """
     Obtiene un archivo subido desde la carpeta de uploads
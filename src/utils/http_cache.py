@@ -0,0 +1,125 @@
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+from flask import request, session, make_response, current_app
+from flask_login import current_user
+from ..services.sirope_service import SiropeService
+
+logger = logging.getLogger(__name__)
+
+def make_etag(*parts) -> str:
+    """
+    Calcula el valor de un ETag débil a partir de versiones y fechas
+
+    Args:
+        *parts: Valores de los que depende la respuesta
+
+    Returns:
+        str: Hash corto de las partes (sin comillas ni prefijo W/)
+    """
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+def version_etag(*objects, extra=()) -> Optional[str]:
+    """
+    Calcula un ETag débil a partir de las versiones de los objetos mostrados
+
+    Args:
+        *objects: Objetos o claves de versión (SiropeService.version_key)
+        extra (tuple, optional): Valores adicionales, como fechas de modificación
+
+    Returns:
+        str|None: ETag o None si no se pudieron consultar las versiones
+
+    Note:
+        Incluye al visitante y la versión de su usuario, porque sus puntos y
+        su nombre aparecen en la barra de navegación de todas las páginas
+    """
+    sirope = SiropeService()
+    keys = [obj if isinstance(obj, str) else sirope.version_key(obj) for obj in objects if obj is not None]
+    viewer = 'anon'
+    if current_user.is_authenticated:
+        viewer = sirope.version_key(current_user._get_current_object())
+        keys.append(viewer)
+    versions = sirope.get_versions(keys)
+    if any(version < 0 for version in versions):
+        return None
+    return make_etag(viewer, *zip(keys, versions), *extra)
+
+def _to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convierte una fecha UTC naive en aware, sin microsegundos (precisión HTTP)"""
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+def is_not_modified(etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Comprueba las cabeceras condicionales de la petición
+
+    Args:
+        etag (str): ETag actual del recurso
+        last_modified (datetime, optional): Fecha de última modificación
+
+    Returns:
+        bool: True si el cliente ya tiene la versión actual
+
+    Note:
+        If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110).
+        Nunca se responde 304 con mensajes flash pendientes de mostrar
+    """
+    if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    last_modified = _to_utc(last_modified)
+    if last_modified and request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+def with_validators(response, etag: str, last_modified: Optional[datetime] = None):
+    """
+    Añade ETag, Last-Modified y Cache-Control a una respuesta
+
+    Args:
+        response: Respuesta, HTML o datos aceptados por make_response
+        etag (str): ETag calculado con make_etag
+        last_modified (datetime, optional): Fecha de última modificación
+
+    Returns:
+        Response: Respuesta con las cabeceras de validación
+
+    Note:
+        Para anónimos la respuesta es pública y cacheable durante
+        HTTP_CACHE_MAX_AGE segundos por un proxy; para usuarios
+        autenticados es privada y se revalida en cada visita
+    """
+    response = make_response(response)
+    response.set_etag(etag, weak=True)
+    last_modified = _to_utc(last_modified)
+    if last_modified:
+        response.last_modified = last_modified
+
+    if current_user.is_authenticated:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['HTTP_CACHE_MAX_AGE']
+    response.vary.add('Cookie')
+    return response
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None):
+    """
+    Construye la respuesta 304 con las mismas cabeceras de validación
+
+    Args:
+        etag (str): ETag actual del recurso
+        last_modified (datetime, optional): Fecha de última modificación
+
+    Returns:
+        Response: Respuesta 304 sin cuerpo
+    """
+    return with_validators(('', 304), etag, last_modified)
@@ -0,0 +1,104 @@
+import logging
+import struct
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+ImageHeader = namedtuple('ImageHeader', ['format', 'width', 'height'])
+
+# Marcadores JPEG Start Of Frame que contienen las dimensiones (C4, C8 y CC no lo son)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Marcadores JPEG sin segmento de longitud
+JPEG_STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+# Límite de bytes a recorrer buscando el SOF (cabeceras EXIF/ICC incluidas)
+JPEG_MAX_SCAN = 1024 * 1024
+
+def _read_png(stream):
+    """Lee el chunk IHDR, que siempre es el primero tras la firma"""
+    data = stream.read(16)
+    if len(data) < 16 or data[4:8] != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', data[8:16])
+    return ImageHeader('png', width, height)
+
+def _read_gif(stream):
+    """Lee el Logical Screen Descriptor que sigue a la firma"""
+    data = stream.read(4)
+    if len(data) < 4:
+        return None
+    width, height = struct.unpack('<HH', data)
+    return ImageHeader('gif', width, height)
+
+def _read_jpeg(stream):
+    """Recorre los segmentos saltando su contenido hasta encontrar un SOF"""
+    while stream.tell() < JPEG_MAX_SCAN:
+        byte = stream.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            return None
+        marker = stream.read(1)
+        # Los 0xFF repetidos son relleno permitido antes de un marcador
+        while marker == b'\xff':
+            marker = stream.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):  # EOI o inicio de datos sin haber visto un SOF
+            return None
+
+        length_bytes = stream.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if length < 2:
+            return None
+        if marker in JPEG_SOF_MARKERS:
+            data = stream.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return ImageHeader('jpeg', width, height)
+        stream.seek(length - 2, 1)
+    return None
+
+SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', _read_png),
+    (b'GIF87a', _read_gif),
+    (b'GIF89a', _read_gif),
+    (b'\xff\xd8', _read_jpeg),
+)
+
+def read_image_header(stream):
+    """
+    Identifica el formato real de una imagen y sus dimensiones sin decodificarla
+
+    Esta función solo lee la firma (magic bytes) y la cabecera:
+    - PNG: chunk IHDR
+    - GIF: Logical Screen Descriptor
+    - JPEG: primer segmento SOF, saltando los demás con seek
+
+    Args:
+        stream: Archivo abierto en modo binario y con seek (p. ej. FileStorage.stream)
+
+    Returns:
+        ImageHeader|None: (formato, ancho, alto) o None si no es una imagen reconocida
+
+    Note:
+        Deja el stream en la posición inicial para poder guardarlo después
+    """
+    start = stream.tell()
+    try:
+        head = stream.read(8)
+        for signature, reader in SIGNATURES:
+            if head.startswith(signature):
+                stream.seek(start + len(signature))
+                return reader(stream)
+        return None
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Error al leer la cabecera de la imagen: {e}")
+        return None
+    finally:
+        stream.seek(start)
@@ -0,0 +1,122 @@
+import base64
+import io
+import logging
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Lado de la muestra sobre la que se agrupan los colores (64x64 = 4096 píxeles)
+SAMPLE_SIDE = 64
+# Número de colores dominantes que se guardan por imagen
+DOMINANT_COLORS = 5
+KMEANS_ITERATIONS = 12
+# Lado del placeholder LQIP; el navegador lo escala suavizado hasta cargar la imagen
+PLACEHOLDER_SIDE = 16
+PLACEHOLDER_QUALITY = 50
+
+def _flatten(image):
+    """Convierte una imagen a RGB componiendo la transparencia sobre blanco"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+def dominant_colors(image, count=DOMINANT_COLORS, iterations=KMEANS_ITERATIONS):
+    """
+    Calcula los colores dominantes de una imagen con k-means
+
+    Esta función trabaja sobre una muestra reducida:
+    - Reduce la imagen a SAMPLE_SIDE píxeles de lado
+    - Inicializa los centros con píxeles repartidos por luminancia (determinista)
+    - Asigna y recalcula los centros de forma vectorizada con NumPy
+
+    Args:
+        image (PIL.Image.Image): Imagen ya decodificada
+        count (int): Número de colores a obtener
+        iterations (int): Máximo de iteraciones de k-means
+
+    Returns:
+        list: Colores en hexadecimal ('#rrggbb') ordenados por número de píxeles
+    """
+    sample = _flatten(image)
+    sample.thumbnail((SAMPLE_SIDE, SAMPLE_SIDE), Image.BILINEAR)
+    pixels = np.asarray(sample, dtype=np.float32).reshape(-1, 3)
+    if not len(pixels):
+        return []
+
+    count = min(count, len(pixels))
+    luminance = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    seeds = np.argsort(luminance)[np.linspace(0, len(pixels) - 1, count).astype(int)]
+    centers = pixels[seeds]
+
+    for _ in range(iterations):
+        # Distancia de cada píxel a cada centro: matriz (píxeles x centros)
+        distances = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        sizes = np.bincount(labels, minlength=count)
+        sums = np.stack([np.bincount(labels, weights=pixels[:, channel], minlength=count)
+                         for channel in range(3)], axis=1)
+        # Los centros que se quedan sin píxeles conservan su posición
+        updated = np.where(sizes[:, None] > 0, sums / np.maximum(sizes, 1)[:, None], centers)
+        if np.abs(updated - centers).max() < 1:
+            centers = updated
+            break
+        centers = updated
+
+    colors = []
+    for index in np.argsort(-sizes):
+        if not sizes[index]:
+            continue
+        red, green, blue = (int(value) for value in np.clip(np.rint(centers[index]), 0, 255))
+        color = f'#{red:02x}{green:02x}{blue:02x}'
+        if color not in colors:
+            colors.append(color)
+    return colors
+
+def placeholder_data_uri(image, side=PLACEHOLDER_SIDE, quality=PLACEHOLDER_QUALITY):
+    """
+    Genera un placeholder LQIP de la imagen como data URI
+
+    Args:
+        image (PIL.Image.Image): Imagen ya decodificada
+        side (int): Lado máximo del placeholder en píxeles
+        quality (int): Calidad JPEG del placeholder
+
+    Returns:
+        str: data URI JPEG de unos cientos de bytes
+    """
+    tiny = _flatten(image)
+    tiny.thumbnail((side, side), Image.BILINEAR)
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=quality)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+def extract_image_metadata(image, size):
+    """
+    Obtiene los metadatos de presentación de una imagen
+
+    Args:
+        image (PIL.Image.Image): Imagen ya decodificada y orientada
+        size (tuple): (ancho, alto) del original orientado
+
+    Returns:
+        dict: width, height, dominant_colors y placeholder, o {} si falla
+
+    Note:
+        La imagen puede venir reducida (draft): los colores y el placeholder
+        no necesitan la resolución completa
+    """
+    try:
+        width, height = size
+        return {
+            'width': width,
+            'height': height,
+            'dominant_colors': dominant_colors(image),
+            'placeholder': placeholder_data_uri(image)
+        }
+    except Exception as e:
+        logger.error(f"Error al extraer los metadatos de la imagen: {e}")
+        return {}